@@ -0,0 +1,313 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Hashable, Optional
+from uuid import UUID
+
+from app.core.config import settings
+from app.core.metrics import register_stats
+
+logger = logging.getLogger(__name__)
+
+# every node drops its local copy of keys published here
+INVALIDATE_CHANNEL = "cache:invalidate"
+
+Handler = Callable[[Any], Awaitable[None]]
+
+
+class TTLCache:
+    """
+    Bounded in-process cache: entries expire after their TTL and the least
+    recently used entry is evicted once max_entries is reached.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl_seconds if ttl is None else ttl
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, UUID):
+        return {"__uuid__": str(value)}
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"__decimal__": str(value)}
+    raise TypeError(f"cannot cache {type(value).__name__}")
+
+
+def _decode(obj: dict) -> Any:
+    if "__uuid__" in obj:
+        return UUID(obj["__uuid__"])
+    if "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    if "__decimal__" in obj:
+        return Decimal(obj["__decimal__"])
+    return obj
+
+
+def dumps(value: Any) -> str:
+    return json.dumps(value, default=_encode)
+
+
+def loads(raw) -> Any:
+    return json.loads(raw, object_hook=_decode)
+
+
+class CacheBackend:
+    """
+    Async key/value cache with pub/sub. Values must be JSON-able (plus UUID,
+    datetime and Decimal) so every backend can store them.
+    """
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        raise NotImplementedError
+
+    async def delete(self, *keys: str) -> None:
+        """Remove keys everywhere, including other nodes' local copies."""
+        raise NotImplementedError
+
+    async def publish(self, channel: str, message: Any) -> None:
+        raise NotImplementedError
+
+    async def subscribe(self, channel: str, handler: Handler) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {}
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Single-process backend; also the in-memory fake for tests and local dev."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self.local = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self._handlers: dict[str, list[Handler]] = defaultdict(list)
+
+    async def get(self, key: str) -> Optional[Any]:
+        return self.local.get(key)
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        self.local.set(key, value, ttl=ttl)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self.local.delete(key)
+
+    async def publish(self, channel: str, message: Any) -> None:
+        # round-trip through JSON so handlers see what Redis would deliver
+        message = loads(dumps(message))
+        for handler in list(self._handlers[channel]):
+            await handler(message)
+
+    async def subscribe(self, channel: str, handler: Handler) -> None:
+        self._handlers[channel].append(handler)
+
+    def stats(self) -> dict:
+        return self.local.stats()
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Shared Redis (or any RESP-compatible server) behind a short-lived local
+    near-cache. Deletes are published on INVALIDATE_CHANNEL so every node
+    evicts its near-cache copy immediately instead of waiting out the TTL.
+    """
+
+    def __init__(self, url: str, local_max_entries: int, local_ttl_seconds: float) -> None:
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package") from exc
+        self.redis = redis.from_url(url)
+        self.local = TTLCache(max_entries=local_max_entries, ttl_seconds=local_ttl_seconds)
+        self._handlers: dict[str, list[Handler]] = defaultdict(list)
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        await self.subscribe(INVALIDATE_CHANNEL, self._on_invalidate)
+
+    async def close(self) -> None:
+        if self._listener:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+        if self._pubsub:
+            await self._pubsub.aclose()
+        await self.redis.aclose()
+
+    async def _on_invalidate(self, keys: list) -> None:
+        for key in keys:
+            self.local.delete(key)
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = self.local.get(key)
+        if value is not None:
+            return value
+        raw = await self.redis.get(key)
+        if raw is None:
+            return None
+        value = loads(raw)
+        self.local.set(key, value)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        await self.redis.set(key, dumps(value), px=max(1, int(ttl * 1000)))
+        self.local.set(key, value, ttl=min(ttl, self.local.ttl_seconds))
+
+    async def delete(self, *keys: str) -> None:
+        if not keys:
+            return
+        for key in keys:
+            self.local.delete(key)
+        await self.redis.delete(*keys)
+        await self.publish(INVALIDATE_CHANNEL, list(keys))
+
+    async def publish(self, channel: str, message: Any) -> None:
+        await self.redis.publish(channel, dumps(message))
+
+    async def subscribe(self, channel: str, handler: Handler) -> None:
+        if self._pubsub is None:
+            self._pubsub = self.redis.pubsub()
+        self._handlers[channel].append(handler)
+        await self._pubsub.subscribe(channel)
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    channel = message["channel"].decode()
+                    payload = loads(message["data"])
+                    for handler in list(self._handlers[channel]):
+                        await handler(payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # lost the connection: near-cache entries may be stale, drop them
+                logger.exception("cache pub/sub listener failed, reconnecting")
+                self.local.clear()
+                await asyncio.sleep(1)
+
+    def stats(self) -> dict:
+        return self.local.stats()
+
+
+_cache: Optional[CacheBackend] = None
+
+
+def get_cache() -> CacheBackend:
+    global _cache
+    if _cache is None:
+        if settings.CACHE_BACKEND == "redis":
+            _cache = RedisCacheBackend(
+                settings.REDIS_URL,
+                local_max_entries=settings.CACHE_LOCAL_MAX_ENTRIES,
+                local_ttl_seconds=settings.CACHE_LOCAL_TTL_SECONDS,
+            )
+        else:
+            _cache = MemoryCacheBackend(
+                max_entries=settings.CACHE_LOCAL_MAX_ENTRIES,
+                ttl_seconds=settings.CACHE_LOCAL_TTL_SECONDS,
+            )
+    return _cache
+
+
+register_stats("cache", lambda: _cache.stats() if _cache is not None else {})
+
+
+def _check_backend() -> None:
+    if settings.CACHE_BACKEND != "memory":
+        return
+    # Fly sets FLY_APP_NAME on every machine of the app
+    if os.environ.get("FLY_APP_NAME"):
+        logger.warning(
+            "CACHE_BACKEND=memory on Fly: with more than one machine, balances cached on one "
+            "can be stale on the others for up to CACHE_LOCAL_TTL_SECONDS; set CACHE_BACKEND=redis"
+        )
+    if settings.DATABASE_REPLICA_URLS:
+        logger.warning(
+            "CACHE_BACKEND=memory with read replicas: the recently-written marker that keeps "
+            "reads after a write off lagging replicas stays on the machine that wrote; "
+            "set CACHE_BACKEND=redis when running more than one machine"
+        )
+
+
+async def start_cache() -> None:
+    _check_backend()
+    await get_cache().start()
+
+
+async def close_cache() -> None:
+    global _cache
+    if _cache is not None:
+        await _cache.close()
+        _cache = None
@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import AnyUrl
-from typing import Literal
+from typing import Literal, Optional
 
 
 class Settings(BaseSettings):
@@ -10,21 +10,165 @@ class Settings(BaseSettings):
 
     # DB
     DATABASE_URL: AnyUrl
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 10.0
+    # recycle connections before server/proxy idle timeouts close them (-1 disables)
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    # pre-ping costs a round-trip per checkout; with recycle below the server's
+    # idle timeout it can usually be turned off
+    DB_POOL_PRE_PING: bool = True
+    # reuse the most recently returned connection so surplus ones idle out
+    DB_POOL_USE_LIFO: bool = True
+    # create missing tables on startup (local dev). Deployments apply
+    # `alembic upgrade head` as a release step and turn this off, so a boot
+    # runs no DDL
+    DB_CREATE_ALL: bool = True
+    # Postgres lock_timeout for migrations, so blocked DDL fails fast
+    # instead of holding up writes queued behind it
+    MIGRATION_LOCK_TIMEOUT_SECONDS: float = 5.0
+
+    # Read replicas for `read` endpoints, as a JSON list of URLs; a replica is
+    # only used while its replay lag is below REPLICA_MAX_LAG_SECONDS
+    DATABASE_REPLICA_URLS: list[AnyUrl] = []
+    REPLICA_MAX_LAG_SECONDS: float = 2.0
+    REPLICA_CHECK_INTERVAL_SECONDS: float = 1.0
 
     # JWT
     JWT_SECRET_KEY: str
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRES_MINUTES: int = 60 * 24 * 7  # 7 days
 
+    # expired API keys are marked revoked in batches, off the active-key indexes
+    API_KEY_SWEEP_INTERVAL_SECONDS: float = 60.0
+    API_KEY_SWEEP_BATCH_SIZE: int = 1000
+
+    # Cache: "memory" is per process, "redis" is shared across machines with
+    # pub/sub invalidation of each node's local near-cache
+    CACHE_BACKEND: Literal["memory", "redis"] = "memory"
+    REDIS_URL: Optional[str] = None
+    CACHE_LOCAL_MAX_ENTRIES: int = 10_000
+    CACHE_LOCAL_TTL_SECONDS: float = 5.0
+    # per-kind TTLs (0 disables caching of that kind)
+    AUTH_CACHE_TTL_SECONDS: int = 60
+    # API keys that failed to resolve, remembered per process
+    AUTH_NEGATIVE_CACHE_TTL_SECONDS: int = 30
+    BALANCE_CACHE_TTL_SECONDS: int = 5
+    WALLET_LOOKUP_CACHE_TTL_SECONDS: int = 3600
+
+    # GET /wallet/stats: longest start..end range, and the default when start is omitted
+    WALLET_STATS_MAX_DAYS: int = 1830
+    WALLET_STATS_DEFAULT_DAYS: int = 30
+
+    # GET /wallet/events: events fan out over the cache backend's pub/sub
+    EVENTS_HEARTBEAT_SECONDS: float = 15.0
+    # per connection; a client further behind than this is told to resync
+    EVENTS_QUEUE_SIZE: int = 100
+
+    # Transfers: retries on serialization failures / deadlocks
+    TRANSFER_MAX_RETRIES: int = 3
+    TRANSFER_RETRY_BACKOFF_SECONDS: float = 0.02
+    # group commit: single transfers arriving within this many ms of each other
+    # share one transaction and commit; 0 commits every transfer on its own
+    TRANSFER_GROUP_COMMIT_MS: float = 0
+    TRANSFER_GROUP_COMMIT_MAX: int = 100
+
+    # wallet numbers reserved per database round-trip; unused ones are skipped on restart
+    WALLET_NUMBER_BLOCK_SIZE: int = 100
+    # numbers issued before check digits are 12 random digits that mostly fail
+    # the Luhn check; while any are in use, recipients are only checked for shape
+    WALLET_NUMBER_ACCEPT_LEGACY: bool = False
+
+    # Idempotency-Key: stored responses for /wallet/transfer and /wallet/deposit
+    IDEMPOTENCY_TTL_SECONDS: int = 24 * 3600
+    # how long a duplicate waits for the first request to finish elsewhere
+    IDEMPOTENCY_WAIT_SECONDS: float = 10.0
+    IDEMPOTENCY_SWEEP_INTERVAL_SECONDS: float = 300.0
+
+    # transactions is partitioned by month on Postgres: partitions are kept
+    # this many months ahead. With TRANSACTIONS_ARCHIVE_AFTER_MONTHS > 0,
+    # months that much older than the current one are exported to Parquet
+    # files under TRANSACTIONS_ARCHIVE_DIR (needs pyarrow) and dropped
+    TRANSACTIONS_PARTITION_MONTHS_AHEAD: int = 3
+    TRANSACTIONS_PARTITION_INTERVAL_SECONDS: float = 3600.0
+    TRANSACTIONS_ARCHIVE_AFTER_MONTHS: int = 0
+    TRANSACTIONS_ARCHIVE_DIR: str = "archive/transactions"
+
+    # Double-entry ledger: entries are written alongside Wallet.balance and
+    # balances are read as snapshot + entries since the snapshot
+    LEDGER_ENABLED: bool = False
+    LEDGER_JOB_INTERVAL_SECONDS: float = 60.0
+    LEDGER_JOB_BATCH_SIZE: int = 50_000
+    # how long a run waits for open transactions that may still hold entry ids
+    LEDGER_WATERMARK_TIMEOUT_SECONDS: float = 5.0
+
+    # Token-bucket rate limits per API key / JWT user and permission class;
+    # "redis" shares buckets across machines (uses REDIS_URL)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: Literal["memory", "redis"] = "memory"
+    RATE_LIMIT_READ_PER_MINUTE: int = 600
+    RATE_LIMIT_TRANSFER_PER_MINUTE: int = 60
+    RATE_LIMIT_DEPOSIT_PER_MINUTE: int = 30
+    # database lookups for API keys not yet cached, per client address; set
+    # the header when a proxy in front of the app sets the client's address
+    RATE_LIMIT_KEY_LOOKUP_PER_MINUTE: int = 120
+    RATE_LIMIT_CLIENT_IP_HEADER: Optional[str] = None
+
+    # Transfer limits per sender wallet (0 = none); API keys can add their own
+    # at creation. "redis" shares the counters across machines (uses REDIS_URL),
+    # "memory" only holds within one process
+    TRANSFER_LIMITS_BACKEND: Literal["memory", "redis"] = "memory"
+    TRANSFER_LIMIT_DAILY_AMOUNT: int = 0
+    TRANSFER_LIMIT_PER_MINUTE: int = 0
+    TRANSFER_LIMIT_DAILY_RECIPIENTS: int = 0
+
     # # Google OAuth
     GOOGLE_CLIENT_ID: str
     GOOGLE_CLIENT_SECRET: str
     GOOGLE_REDIRECT_URI: str
+    GOOGLE_AUTH_URL: str = "https://accounts.google.com/o/oauth2/v2/auth"
+    GOOGLE_TOKEN_URL: str = "https://oauth2.googleapis.com/token"
+    GOOGLE_USERINFO_URL: str = "https://openidconnect.googleapis.com/v1/userinfo"
 
     # Paystack
     PAYSTACK_SECRET_KEY: str
     PAYSTACK_PUBLIC_KEY: str
     PAYSTACK_BASE_URL: str = "https://api.paystack.co"
+    # "inline" credits inside the webhook request, "queue" persists to the inbox and acks
+    PAYSTACK_WEBHOOK_MODE: Literal["inline", "queue"] = "inline"
+    WEBHOOK_WORKERS: int = 2
+    WEBHOOK_BATCH_SIZE: int = 50
+    WEBHOOK_POLL_INTERVAL_SECONDS: float = 0.5
+    WEBHOOK_MAX_ATTEMPTS: int = 5
+    # Reconciler for lost webhooks: pending deposits older than MIN_AGE are
+    # settled from Paystack's list/verify APIs; ones Paystack still hasn't
+    # seen paid after MAX_AGE are marked failed. Every machine that runs it
+    # calls Paystack, so enable it on one process group when scaled out
+    PAYSTACK_RECONCILE_ENABLED: bool = True
+    PAYSTACK_RECONCILE_INTERVAL_SECONDS: float = 60.0
+    PAYSTACK_RECONCILE_MIN_AGE_SECONDS: float = 300.0
+    PAYSTACK_RECONCILE_MAX_AGE_SECONDS: float = 24 * 3600.0
+    PAYSTACK_RECONCILE_BATCH_SIZE: int = 200
+    PAYSTACK_RECONCILE_CONCURRENCY: int = 4
+
+    # Outbound HTTP (shared pooled clients for Paystack / Google)
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    HTTP_TIMEOUT_SECONDS: float = 10.0
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    HTTP2_ENABLED: bool = False
+    HTTP_RETRY_ATTEMPTS: int = 2
+    HTTP_RETRY_BACKOFF_SECONDS: float = 0.1
+
+    # Observability
+    METRICS_ENABLED: bool = True
+    # bearer token for GET /metrics; the endpoint returns 404 while unset
+    METRICS_TOKEN: Optional[str] = None
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: Literal["json", "text"] = "json"
+    # fraction of INFO/DEBUG records kept; warnings and errors are never dropped
+    LOG_SAMPLE_RATE: float = 1.0
 
     # Environment
     ENV: Literal["local", "dev", "prod"] = "local"
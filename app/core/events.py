@@ -0,0 +1,120 @@
+"""
+Pub/sub hub for pushing events to streaming clients (GET /wallet/events).
+
+Events travel over the cache backend's pub/sub on EVENTS_CHANNEL. With
+CACHE_BACKEND=redis every node receives every event and hands it to its own
+subscribers; the memory backend keeps it in-process. Each node holds one
+backend subscription however many clients are connected, and each client
+gets a bounded queue: a client that falls behind is told to resync instead
+of holding events in memory.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Optional
+
+from app.core.cache import get_cache
+from app.core.config import settings
+from app.core.metrics import register_stats
+
+logger = logging.getLogger(__name__)
+
+EVENTS_CHANNEL = "events"
+RESYNC = {"type": "resync"}
+
+
+class Subscription:
+    def __init__(self, hub: "EventHub", topic: str, max_queue: int) -> None:
+        self.hub = hub
+        self.topic = topic
+        self.queue: asyncio.Queue = asyncio.Queue(max_queue)
+        self.lagged = False
+
+    def deliver(self, event: dict) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.lagged = True
+            self.hub.dropped += 1
+
+    async def get(self, timeout: float) -> Optional[dict]:
+        """The next event, RESYNC after events were dropped, or None on timeout."""
+        if self.lagged:
+            # what's queued is already stale; the client refetches state instead
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.lagged = False
+            return RESYNC
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        self.hub.unsubscribe(self)
+
+
+class EventHub:
+    def __init__(self, max_queue: int = 100) -> None:
+        self.max_queue = max_queue
+        self._subscribers: dict[str, set[Subscription]] = defaultdict(set)
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    async def start(self) -> None:
+        await get_cache().subscribe(EVENTS_CHANNEL, self._on_message)
+
+    async def publish(self, items: list[tuple[str, dict]]) -> None:
+        """(topic, event) pairs from one commit go out as a single message."""
+        if not items:
+            return
+        self.published += len(items)
+        try:
+            await get_cache().publish(EVENTS_CHANNEL, [[topic, event] for topic, event in items])
+        except Exception as exc:
+            # best effort: the write has committed, clients catch up on their next resync
+            logger.warning("event publish failed", extra={"error": repr(exc)})
+
+    async def _on_message(self, items: list) -> None:
+        for topic, event in items:
+            for subscription in list(self._subscribers.get(topic, ())):
+                subscription.deliver(event)
+                self.delivered += 1
+
+    def subscribe(self, topic: str) -> Subscription:
+        subscription = Subscription(self, topic, self.max_queue)
+        self._subscribers[topic].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.topic)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.topic]
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": sum(len(s) for s in self._subscribers.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+
+event_hub: Optional[EventHub] = None
+
+
+def get_event_hub() -> EventHub:
+    global event_hub
+    if event_hub is None:
+        event_hub = EventHub(max_queue=settings.EVENTS_QUEUE_SIZE)
+    return event_hub
+
+
+register_stats("events", lambda: event_hub.stats() if event_hub is not None else {})
+
+
+async def start_events() -> None:
+    await get_event_hub().start()
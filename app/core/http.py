@@ -0,0 +1,95 @@
+import asyncio
+import random
+import ssl
+from functools import cache
+from typing import Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.metrics import http_client_hooks
+
+# one pooled client per upstream, created in app startup and closed in app shutdown;
+# get_http_client builds any that are missing (scripts, tests)
+UPSTREAMS = ("paystack", "google")
+RETRY_STATUSES = {502, 503, 504}
+
+_clients: dict[str, httpx.AsyncClient] = {}
+
+
+@cache
+def _ssl_context() -> ssl.SSLContext:
+    # loading the CA bundle is the slow part of building a client; share one
+    return httpx.create_ssl_context()
+
+
+def build_client(upstream: str = "other", **overrides) -> httpx.AsyncClient:
+    options = dict(
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        timeout=httpx.Timeout(
+            settings.HTTP_TIMEOUT_SECONDS,
+            connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS,
+        ),
+        http2=settings.HTTP2_ENABLED,
+        verify=_ssl_context(),
+        event_hooks=http_client_hooks(upstream),
+    )
+    options.update(overrides)
+    return httpx.AsyncClient(**options)
+
+
+async def start_http_clients(**overrides) -> None:
+    for name in UPSTREAMS:
+        if name not in _clients:
+            _clients[name] = build_client(name, **overrides)
+
+
+async def close_http_clients() -> None:
+    clients = list(_clients.values())
+    _clients.clear()
+    await asyncio.gather(*(client.aclose() for client in clients))
+
+
+def get_http_client(upstream: str) -> httpx.AsyncClient:
+    client = _clients.get(upstream)
+    if client is None:
+        client = _clients[upstream] = build_client(upstream)
+    return client
+
+
+def _backoff(attempt: int) -> float:
+    # full jitter
+    return random.uniform(0, settings.HTTP_RETRY_BACKOFF_SECONDS * (2 ** attempt))
+
+
+async def request_with_retry(
+    client: httpx.AsyncClient,
+    method: str,
+    url: str,
+    *,
+    idempotent: bool = True,
+    retries: Optional[int] = None,
+    **kwargs,
+) -> httpx.Response:
+    """
+    Idempotent calls are retried on transport errors and 502/503/504.
+    Non-idempotent calls are only retried when the connection could not be
+    opened, i.e. the request provably never reached the upstream.
+    """
+    retries = settings.HTTP_RETRY_ATTEMPTS if retries is None else retries
+    retryable = httpx.TransportError if idempotent else (httpx.ConnectError, httpx.ConnectTimeout)
+
+    for attempt in range(retries + 1):
+        try:
+            resp = await client.request(method, url, **kwargs)
+        except retryable:
+            if attempt == retries:
+                raise
+        else:
+            if not idempotent or resp.status_code not in RETRY_STATUSES or attempt == retries:
+                return resp
+        await asyncio.sleep(_backoff(attempt))
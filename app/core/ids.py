@@ -0,0 +1,93 @@
+"""
+Time-ordered identifiers.
+
+uuid7() follows RFC 9562 UUIDv7: 48-bit Unix milliseconds, then a 12-bit
+counter that keeps IDs from one process strictly increasing within a
+millisecond, then 62 random bits. new_reference() encodes the same 128 bits
+as a 26-character Crockford base32 string (ULID layout), so references sort
+by creation time as well. New rows therefore land at the right-hand edge of
+the primary key and reference B-tree indexes instead of on random pages.
+
+Wallet numbers are 11 digits plus a Luhn check digit, derived from a
+sequence value by a bijection so consecutive signups don't get adjacent
+numbers.
+"""
+import os
+import threading
+import time
+import uuid
+
+_CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+
+def uuid7() -> uuid.UUID:
+    global _last_ms, _counter
+    with _lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _last_ms:
+            _last_ms = ms
+            # random start leaves room to count up within the millisecond
+            _counter = int.from_bytes(os.urandom(2), "big") & 0x7FF
+        else:
+            # same millisecond (or the clock stepped back): keep counting
+            _counter += 1
+            if _counter > 0xFFF:
+                _last_ms += 1
+                _counter = 0
+            ms = _last_ms
+        counter = _counter
+
+    rand_b = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    value = (ms & ((1 << 48) - 1)) << 80 | 0x7 << 76 | counter << 64 | 0b10 << 62 | rand_b
+    return uuid.UUID(int=value)
+
+
+def ulid_string(value: uuid.UUID) -> str:
+    n = value.int
+    return "".join(_CROCKFORD[(n >> shift) & 0x1F] for shift in range(125, -1, -5))
+
+
+def new_reference(prefix: str) -> str:
+    """e.g. DEP_01JAB3K2Q8X1T9V7M4C5D6E7F8; unique and time-sortable per prefix."""
+    return f"{prefix}_{ulid_string(uuid7())}"
+
+
+WALLET_NUMBER_BODY_DIGITS = 11
+_BODY_SPACE = 10 ** WALLET_NUMBER_BODY_DIGITS
+# coprime with 10**11, so seq -> body is a bijection on [0, 10**11)
+_SCRAMBLE_MULTIPLIER = 48_271_979_113
+_SCRAMBLE_OFFSET = 31_415_926_535
+
+
+def luhn_check_digit(digits: str) -> str:
+    total = 0
+    # double every second digit counting from the right of the final number,
+    # i.e. starting with the rightmost digit of the body
+    for i, ch in enumerate(reversed(digits)):
+        d = int(ch)
+        if i % 2 == 0:
+            d *= 2
+            if d > 9:
+                d -= 9
+        total += d
+    return str((10 - total % 10) % 10)
+
+
+def is_wallet_number_shape(number: str) -> bool:
+    return len(number) == WALLET_NUMBER_BODY_DIGITS + 1 and number.isdigit()
+
+
+def is_valid_wallet_number(number: str) -> bool:
+    return is_wallet_number_shape(number) and luhn_check_digit(number[:-1]) == number[-1]
+
+
+def wallet_number_from_sequence(seq: int) -> str:
+    if not 0 <= seq < _BODY_SPACE:
+        raise ValueError("wallet number sequence exhausted")
+    body = (seq * _SCRAMBLE_MULTIPLIER + _SCRAMBLE_OFFSET) % _BODY_SPACE
+    digits = f"{body:0{WALLET_NUMBER_BODY_DIGITS}d}"
+    return digits + luhn_check_digit(digits)
@@ -0,0 +1,278 @@
+"""
+Counters behind the transfer limits (app.services.transfer_limits).
+
+Every scope (a wallet, an API key) has, per UTC day, the amount sent and the
+set of recipients paid, plus a sliding one-minute transfer count estimated
+from two fixed minute buckets. reserve() checks and bumps every scope of a
+transfer in one atomic step, so a check costs the same however busy the
+wallet is. Day counters start out unhydrated: the caller loads that day's
+usage from the database once and hydrate() adds it, only if nobody beat it
+to it. "memory" counts per process; "redis" shares counters across machines.
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from typing import Optional
+
+from app.core.config import settings
+
+DAY_TTL_SECONDS = 26 * 3600
+
+
+@dataclass
+class LimitCheck:
+    scope: str
+    # limits, 0 = no limit
+    daily_amount: int
+    per_minute: int
+    daily_recipients: int
+    # what this transfer adds
+    amount: int
+    count: int
+    recipients: list[str]
+
+
+@dataclass
+class ReserveResult:
+    allowed: bool
+    exceeded: Optional[str] = None          # name of the limit that refused
+    unhydrated: list[str] = field(default_factory=list)  # scopes to hydrate first
+
+
+def _minute(now: float) -> tuple[int, float]:
+    """Current minute bucket and how far into it `now` is (0..1)."""
+    index = int(now // 60)
+    return index, now / 60 - index
+
+
+class LimitCounters:
+    async def reserve(self, checks: list[LimitCheck], day: date, now: float) -> ReserveResult:
+        raise NotImplementedError
+
+    async def hydrate(self, scope: str, day: date, amount: int, recipients: list[str]) -> None:
+        raise NotImplementedError
+
+    async def release(self, checks: list[LimitCheck], day: date) -> None:
+        """Give back the amount of a reservation whose transfer failed."""
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class _Day:
+    __slots__ = ("amount", "recipients", "hydrated")
+
+    def __init__(self) -> None:
+        self.amount = 0
+        self.recipients: set[str] = set()
+        self.hydrated = False
+
+
+class MemoryLimitCounters(LimitCounters):
+    def __init__(self, max_scopes: int = 100_000) -> None:
+        self.max_scopes = max_scopes
+        self._days: "OrderedDict[tuple[str, date], _Day]" = OrderedDict()
+        # scope -> [minute index, count in it, count in the minute before]
+        self._minutes: "OrderedDict[str, list[int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _day(self, scope: str, day: date) -> _Day:
+        state = self._days.get((scope, day))
+        if state is None:
+            state = self._days[(scope, day)] = _Day()
+            # an evicted day is simply hydrated again
+            while len(self._days) > self.max_scopes:
+                self._days.popitem(last=False)
+        self._days.move_to_end((scope, day))
+        return state
+
+    def _window(self, scope: str, index: int) -> list[int]:
+        window = self._minutes.get(scope)
+        if window is None or window[0] < index - 1:
+            window = [index, 0, 0]
+        elif window[0] == index - 1:
+            window = [index, 0, window[1]]
+        self._minutes[scope] = window
+        self._minutes.move_to_end(scope)
+        while len(self._minutes) > self.max_scopes:
+            self._minutes.popitem(last=False)
+        return window
+
+    async def reserve(self, checks: list[LimitCheck], day: date, now: float) -> ReserveResult:
+        index, elapsed = _minute(now)
+        with self._lock:
+            days = [self._day(check.scope, day) for check in checks]
+            unhydrated = [check.scope for check, state in zip(checks, days) if not state.hydrated]
+            if unhydrated:
+                return ReserveResult(allowed=False, unhydrated=unhydrated)
+
+            windows = [self._window(check.scope, index) for check in checks]
+            for check, state, (_, current, previous) in zip(checks, days, windows):
+                if check.daily_amount and state.amount + check.amount > check.daily_amount:
+                    return ReserveResult(allowed=False, exceeded="daily_amount")
+                if check.per_minute and previous * (1 - elapsed) + current + check.count > check.per_minute:
+                    return ReserveResult(allowed=False, exceeded="per_minute")
+                if check.daily_recipients and len(state.recipients | set(check.recipients)) > check.daily_recipients:
+                    return ReserveResult(allowed=False, exceeded="daily_recipients")
+
+            for check, state, window in zip(checks, days, windows):
+                state.amount += check.amount
+                state.recipients.update(check.recipients)
+                window[1] += check.count
+        return ReserveResult(allowed=True)
+
+    async def hydrate(self, scope: str, day: date, amount: int, recipients: list[str]) -> None:
+        with self._lock:
+            state = self._day(scope, day)
+            if not state.hydrated:
+                state.amount += amount
+                state.recipients.update(recipients)
+                state.hydrated = True
+
+    async def release(self, checks: list[LimitCheck], day: date) -> None:
+        with self._lock:
+            for check in checks:
+                state = self._days.get((check.scope, day))
+                if state is not None:
+                    state.amount -= check.amount
+
+
+# KEYS: per check [day hash, recipients set, this minute, previous minute]
+# ARGV: elapsed fraction of the minute, day ttl, then per check
+#       daily_amount, per_minute, daily_recipients, amount, count, n, <n recipients>
+_RESERVE_LUA = """
+local elapsed = tonumber(ARGV[1])
+local day_ttl = tonumber(ARGV[2])
+local checks, unhydrated = {}, {}
+local a = 3
+for i = 1, #KEYS / 4 do
+  local k = (i - 1) * 4
+  local n = tonumber(ARGV[a + 5])
+  local c = {
+    day = KEYS[k + 1], rcpt = KEYS[k + 2], cur = KEYS[k + 3], prev = KEYS[k + 4],
+    daily_amount = tonumber(ARGV[a]), per_minute = tonumber(ARGV[a + 1]),
+    daily_recipients = tonumber(ARGV[a + 2]), amount = tonumber(ARGV[a + 3]),
+    count = tonumber(ARGV[a + 4]), recipients = {},
+  }
+  for j = 1, n do c.recipients[j] = ARGV[a + 5 + j] end
+  a = a + 6 + n
+  checks[i] = c
+  if redis.call('HEXISTS', c.day, 'hydrated') == 0 then table.insert(unhydrated, i) end
+end
+if #unhydrated > 0 then return {'hydrate', unpack(unhydrated)} end
+
+for _, c in ipairs(checks) do
+  if c.daily_amount > 0 then
+    local used = tonumber(redis.call('HGET', c.day, 'amount') or '0')
+    if used + c.amount > c.daily_amount then return {'exceeded', 'daily_amount'} end
+  end
+  if c.per_minute > 0 then
+    local cur = tonumber(redis.call('GET', c.cur) or '0')
+    local prev = tonumber(redis.call('GET', c.prev) or '0')
+    if prev * (1 - elapsed) + cur + c.count > c.per_minute then return {'exceeded', 'per_minute'} end
+  end
+  if c.daily_recipients > 0 then
+    local total = redis.call('SCARD', c.rcpt)
+    for _, r in ipairs(c.recipients) do
+      if redis.call('SISMEMBER', c.rcpt, r) == 0 then total = total + 1 end
+    end
+    if total > c.daily_recipients then return {'exceeded', 'daily_recipients'} end
+  end
+end
+
+for _, c in ipairs(checks) do
+  redis.call('HINCRBY', c.day, 'amount', c.amount)
+  redis.call('INCRBY', c.cur, c.count)
+  redis.call('EXPIRE', c.cur, 120)
+  if #c.recipients > 0 then
+    redis.call('SADD', c.rcpt, unpack(c.recipients))
+    redis.call('EXPIRE', c.rcpt, day_ttl)
+  end
+end
+return {'ok'}
+"""
+
+# KEYS: day hash, recipients set; ARGV: day ttl, amount, <recipients>
+_HYDRATE_LUA = """
+if redis.call('HSETNX', KEYS[1], 'hydrated', 1) == 1 then
+  redis.call('HINCRBY', KEYS[1], 'amount', ARGV[2])
+  redis.call('EXPIRE', KEYS[1], ARGV[1])
+  if #ARGV > 2 then
+    redis.call('SADD', KEYS[2], unpack(ARGV, 3))
+    redis.call('EXPIRE', KEYS[2], ARGV[1])
+  end
+end
+return 1
+"""
+
+
+class RedisLimitCounters(LimitCounters):
+    def __init__(self, url: str) -> None:
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError("TRANSFER_LIMITS_BACKEND=redis requires the 'redis' package") from exc
+        self.redis = redis.from_url(url)
+        self._reserve = self.redis.register_script(_RESERVE_LUA)
+        self._hydrate = self.redis.register_script(_HYDRATE_LUA)
+
+    @staticmethod
+    def _day_keys(scope: str, day: date) -> list[str]:
+        return [f"lim:{scope}:d:{day.isoformat()}", f"lim:{scope}:r:{day.isoformat()}"]
+
+    async def reserve(self, checks: list[LimitCheck], day: date, now: float) -> ReserveResult:
+        index, elapsed = _minute(now)
+        keys, args = [], [elapsed, DAY_TTL_SECONDS]
+        for check in checks:
+            keys += self._day_keys(check.scope, day)
+            keys += [f"lim:{check.scope}:m:{index}", f"lim:{check.scope}:m:{index - 1}"]
+            args += [
+                check.daily_amount, check.per_minute, check.daily_recipients,
+                check.amount, check.count, len(check.recipients), *check.recipients,
+            ]
+        verdict, *rest = await self._reserve(keys=keys, args=args)
+        verdict = verdict.decode() if isinstance(verdict, bytes) else verdict
+        if verdict == "hydrate":
+            return ReserveResult(allowed=False, unhydrated=[checks[int(i) - 1].scope for i in rest])
+        if verdict == "exceeded":
+            exceeded = rest[0].decode() if isinstance(rest[0], bytes) else rest[0]
+            return ReserveResult(allowed=False, exceeded=exceeded)
+        return ReserveResult(allowed=True)
+
+    async def hydrate(self, scope: str, day: date, amount: int, recipients: list[str]) -> None:
+        await self._hydrate(keys=self._day_keys(scope, day), args=[DAY_TTL_SECONDS, amount, *recipients])
+
+    async def release(self, checks: list[LimitCheck], day: date) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for check in checks:
+                pipe.hincrby(self._day_keys(check.scope, day)[0], "amount", -check.amount)
+            await pipe.execute()
+
+    async def close(self) -> None:
+        await self.redis.aclose()
+
+
+_counters: Optional[LimitCounters] = None
+
+
+def get_limit_counters() -> LimitCounters:
+    global _counters
+    if _counters is None:
+        if settings.TRANSFER_LIMITS_BACKEND == "redis":
+            _counters = RedisLimitCounters(settings.REDIS_URL)
+        else:
+            _counters = MemoryLimitCounters()
+    return _counters
+
+
+async def close_limit_counters() -> None:
+    global _counters
+    if _counters is not None:
+        await _counters.close()
+        _counters = None
+
+
+def utc_day(now: float) -> date:
+    return datetime.fromtimestamp(now, timezone.utc).date()
@@ -0,0 +1,186 @@
+"""
+Prometheus metrics, served at /metrics.
+
+Per-request SQL statement counts and time are collected through engine
+events into a context-local RequestStats, which MetricsMiddleware sets up
+and reports once the response is sent.
+"""
+import contextvars
+import time
+from typing import Callable
+
+import httpx
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "SQL statements executed per request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55),
+)
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds",
+    "Time spent executing SQL per request",
+    ["route"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_QUERIES = Counter("db_queries_total", "SQL statements executed", ["engine"])
+POOL_CHECKOUT = Histogram(
+    "db_pool_checkout_seconds",
+    "Time a pooled DB connection stays checked out",
+    ["engine"],
+    buckets=LATENCY_BUCKETS,
+)
+POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Pooled DB connections currently checked out", ["engine"])
+UPSTREAM_LATENCY = Histogram(
+    "http_client_request_duration_seconds",
+    "Outbound request latency by upstream",
+    ["upstream", "method", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+WEBHOOK_LAG = Histogram(
+    "paystack_webhook_lag_seconds",
+    "Delay between a Paystack event and the wallet being credited",
+    ["mode"],
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0),
+)
+AUTH_OUTCOMES = Counter("auth_requests_total", "Authentication outcomes", ["via", "outcome"])
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+_request_stats: contextvars.ContextVar[RequestStats | None] = contextvars.ContextVar(
+    "request_stats", default=None
+)
+
+
+def instrument_engine(engine: Engine, name: str) -> None:
+    """Count and time SQL statements and pooled connection checkouts. Pass a sync Engine (AsyncEngine.sync_engine)."""
+    queries = DB_QUERIES.labels(name)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        queries.inc()
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += time.perf_counter() - context._metrics_started
+
+    held = POOL_CHECKOUT.labels(name)
+    checked_out = POOL_CHECKED_OUT.labels(name)
+
+    # pool events registered on the engine carry over to the pool engine.dispose() rebuilds
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection, record, proxy):
+        record.info["metrics_checkout"] = time.perf_counter()
+        checked_out.inc()
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_connection, record):
+        started = record.info.pop("metrics_checkout", None)
+        if started is not None:
+            held.observe(time.perf_counter() - started)
+            checked_out.dec()
+
+
+def http_client_hooks(upstream: str) -> dict:
+    """httpx event hooks recording latency for one upstream."""
+
+    async def on_request(request: httpx.Request) -> None:
+        request.extensions["metrics_started"] = time.perf_counter()
+
+    async def on_response(response: httpx.Response) -> None:
+        started = response.request.extensions.get("metrics_started")
+        if started is not None:
+            UPSTREAM_LATENCY.labels(upstream, response.request.method, str(response.status_code)).observe(
+                time.perf_counter() - started
+            )
+
+    return {"request": [on_request], "response": [on_response]}
+
+
+def observe_webhook_lag(mode: str, seconds: float) -> None:
+    WEBHOOK_LAG.labels(mode).observe(max(seconds, 0.0))
+
+
+def record_auth(via: str, outcome: str) -> None:
+    AUTH_OUTCOMES.labels(via, outcome).inc()
+
+
+class _StatsCollector:
+    """Exposes the in-process stats dicts (inbox, ledger jobs, caches) as gauges at scrape time."""
+
+    def __init__(self) -> None:
+        self.sources: dict[str, Callable[[], dict]] = {}
+
+    def collect(self):
+        for prefix, source in self.sources.items():
+            for key, value in source().items():
+                if isinstance(value, (int, float)):
+                    yield GaugeMetricFamily(f"{prefix}_{key}", f"{prefix} {key}", value=value)
+
+
+_stats = _StatsCollector()
+REGISTRY.register(_stats)
+
+
+def register_stats(prefix: str, source: Callable[[], dict]) -> None:
+    _stats.sources[prefix] = source
+
+
+class MetricsMiddleware:
+    """Plain ASGI middleware, so streaming responses and contextvars are left alone."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status = "500"
+
+        async def _send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            _request_stats.reset(token)
+            # the router has stored the matched route in the scope by now
+            route = scope.get("route")
+            template = getattr(route, "path", "unmatched")
+            REQUEST_LATENCY.labels(scope["method"], template, status).observe(time.perf_counter() - started)
+            REQUEST_DB_QUERIES.labels(template).observe(stats.queries)
+            REQUEST_DB_SECONDS.labels(template).observe(stats.db_seconds)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
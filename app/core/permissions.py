@@ -0,0 +1,73 @@
+"""
+API key permissions as bits of ApiKey.permission_mask.
+
+Adding a permission is a new flag plus a name below; the column is a plain
+integer so no schema change is needed. Never reuse or renumber a bit.
+"""
+from enum import IntFlag
+from functools import reduce
+from typing import Iterable
+
+
+class Permission(IntFlag):
+    DEPOSIT = 1 << 0
+    TRANSFER = 1 << 1
+    READ = 1 << 2
+    TRANSFER_BATCH = 1 << 3
+    EXPORT = 1 << 4
+
+
+# public names, as used in /keys requests
+PERMISSION_NAMES: dict[str, Permission] = {
+    "deposit": Permission.DEPOSIT,
+    "transfer": Permission.TRANSFER,
+    "read": Permission.READ,
+    "transfer:batch": Permission.TRANSFER_BATCH,
+    "export": Permission.EXPORT,
+}
+_LABELS = {flag: name for name, flag in PERMISSION_NAMES.items()}
+
+ALL_PERMISSIONS = reduce(lambda a, b: a | b, Permission, Permission(0))
+
+# what the old comma-string keys could do: "transfer" covered /transfer/batch
+# and "read" covered /transactions/export
+LEGACY_IMPLIED = {
+    "transfer": Permission.TRANSFER | Permission.TRANSFER_BATCH,
+    "read": Permission.READ | Permission.EXPORT,
+}
+
+# rate-limit bucket each permission draws from
+RATE_CLASSES = {
+    Permission.DEPOSIT: "deposit",
+    Permission.TRANSFER: "transfer",
+    Permission.TRANSFER_BATCH: "transfer",
+    Permission.READ: "read",
+    Permission.EXPORT: "read",
+}
+
+
+def parse_permissions(names: Iterable[str]) -> Permission:
+    mask = Permission(0)
+    for name in names:
+        if name not in PERMISSION_NAMES:
+            raise ValueError(f"Invalid permission: {name}")
+        mask |= PERMISSION_NAMES[name]
+    return mask
+
+
+def parse_legacy_permissions(value: str) -> Permission:
+    """The old "deposit,transfer,read" column format."""
+    mask = Permission(0)
+    for name in (p.strip() for p in value.split(",")):
+        if name:
+            mask |= LEGACY_IMPLIED.get(name, PERMISSION_NAMES.get(name, Permission(0)))
+    return mask
+
+
+def permission_names(mask: int) -> list[str]:
+    return [name for name, flag in PERMISSION_NAMES.items() if mask & flag]
+
+
+def permission_label(permission: Permission) -> str:
+    return _LABELS[permission]
+
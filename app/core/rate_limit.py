@@ -0,0 +1,141 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from app.core.config import settings
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float  # seconds until the bucket is full again
+    retry_after: float  # seconds until the next request would be allowed
+
+    def headers(self) -> dict:
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(math.ceil(self.reset_after)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+def _result(allowed: bool, tokens: float, capacity: int, rate: float, cost: int) -> RateLimitResult:
+    return RateLimitResult(
+        allowed=allowed,
+        limit=capacity,
+        remaining=int(tokens),
+        reset_after=(capacity - tokens) / rate,
+        retry_after=0.0 if allowed else (cost - tokens) / rate,
+    )
+
+
+class RateLimiter:
+    """Token bucket: `capacity` tokens, refilled at `rate` tokens per second."""
+
+    async def hit(self, key: str, capacity: int, rate: float, cost: int = 1) -> RateLimitResult:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryRateLimiter(RateLimiter):
+    def __init__(self, max_keys: int = 100_000) -> None:
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def hit(self, key: str, capacity: int, rate: float, cost: int = 1) -> RateLimitResult:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            # an evicted bucket just starts full again
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return _result(allowed, tokens, capacity, rate, cost)
+
+
+# refill + take in one round-trip, on the server's clock so machines agree
+_TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisRateLimiter(RateLimiter):
+    def __init__(self, url: str) -> None:
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the 'redis' package") from exc
+        self.redis = redis.from_url(url)
+        self._script = self.redis.register_script(_TOKEN_BUCKET_LUA)
+
+    async def hit(self, key: str, capacity: int, rate: float, cost: int = 1) -> RateLimitResult:
+        allowed, tokens = await self._script(keys=[key], args=[capacity, rate, cost])
+        return _result(bool(allowed), float(tokens), capacity, rate, cost)
+
+    async def close(self) -> None:
+        await self.redis.aclose()
+
+
+_limiter: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    global _limiter
+    if _limiter is None:
+        if settings.RATE_LIMIT_BACKEND == "redis":
+            _limiter = RedisRateLimiter(settings.REDIS_URL)
+        else:
+            _limiter = MemoryRateLimiter()
+    return _limiter
+
+
+async def close_rate_limiter() -> None:
+    global _limiter
+    if _limiter is not None:
+        await _limiter.close()
+        _limiter = None
+
+
+def limit_for(rate_class: str) -> int:
+    """
+    Requests per minute for a rate class (see app.core.permissions.RATE_CLASSES);
+    "key_lookup" is the per-address bucket API keys draw from until they resolve.
+    """
+    return {
+        "read": settings.RATE_LIMIT_READ_PER_MINUTE,
+        "transfer": settings.RATE_LIMIT_TRANSFER_PER_MINUTE,
+        "deposit": settings.RATE_LIMIT_DEPOSIT_PER_MINUTE,
+        "key_lookup": settings.RATE_LIMIT_KEY_LOOKUP_PER_MINUTE,
+    }.get(rate_class, settings.RATE_LIMIT_READ_PER_MINUTE)
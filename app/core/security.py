@@ -2,17 +2,24 @@ import hashlib
 import secrets
 from datetime import datetime, timedelta, UTC
 from typing import Dict
-from jose import jwt
 from app.core.config import settings
 
 
+# jose (with its RSA/EC backends) is imported on first use: API-key and
+# webhook traffic never needs it, so it stays off the cold-start path
+
+
 def create_access_token(subject: str) -> str:
+    from jose import jwt
+
     expire = datetime.now(UTC) + timedelta(minutes=settings.JWT_EXPIRES_MINUTES)
     to_encode: Dict[str, str] = {"sub": subject, "exp": expire}
     return jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
 
 
 def decode_access_token(token: str) -> dict:
+    from jose import jwt
+
     return jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
 
 
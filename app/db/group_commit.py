@@ -0,0 +1,105 @@
+"""
+Group commit: small writes submitted within a few milliseconds of each
+other are handed to run() together, which applies them in one transaction
+and commits once. Callers wait for their own outcome. A write whose caller
+gave up before its group started is dropped; once handed to run() it
+commits or fails on its own, so its caller gets that outcome even if it is
+cancelled in the meantime.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class GroupCommitter:
+    def __init__(
+        self,
+        run: Callable[[list], Awaitable[list]],
+        window: float,
+        max_size: int,
+    ) -> None:
+        """
+        run(items) returns one outcome per item: a result, or an exception
+        to raise in that item's caller.
+        """
+        self.run = run
+        self.window = window
+        self.max_size = max_size
+        self._pending: list[tuple[object, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set[asyncio.Task] = set()
+        self.groups = 0
+        self.items = 0
+        self.largest = 0
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+
+        swallowed = 0
+        while True:
+            try:
+                outcome = await asyncio.shield(future)
+                break
+            except asyncio.CancelledError:
+                if self._withdraw(future):
+                    raise
+                swallowed += 1
+        task = asyncio.current_task()
+        for _ in range(swallowed):
+            task.uncancel()
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    def _withdraw(self, future: asyncio.Future) -> bool:
+        """Drop a write that has not been handed to run() yet; False once it has."""
+        for index, (_, pending) in enumerate(self._pending):
+            if pending is future:
+                del self._pending[index]
+                future.cancel()
+                return True
+        return False
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        group, self._pending = self._pending, []
+        if group:
+            task = asyncio.get_running_loop().create_task(self._commit(group))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _commit(self, group: list) -> None:
+        self.groups += 1
+        self.items += len(group)
+        self.largest = max(self.largest, len(group))
+        outcomes = None
+        try:
+            outcomes = await self.run([item for item, _ in group])
+        except Exception as exc:
+            logger.exception("group commit failed")
+            outcomes = [exc] * len(group)
+        finally:
+            if outcomes is None:
+                # interrupted (shutdown); the group may or may not have committed
+                outcomes = [RuntimeError("group commit interrupted")] * len(group)
+            for (_, future), outcome in zip(group, outcomes):
+                if not future.done():
+                    future.set_result(outcome)
+
+    def stats(self) -> dict:
+        return {
+            "groups": self.groups,
+            "items": self.items,
+            "largest": self.largest,
+            "pending": len(self._pending),
+        }
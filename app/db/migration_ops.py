@@ -0,0 +1,70 @@
+"""
+Helpers for Alembic revisions that touch hot tables.
+
+On Postgres, indexes are built with CREATE INDEX CONCURRENTLY, which doesn't
+block writes but can't run inside a transaction, so these step out of the
+migration transaction (autocommit_block). Keep concurrent index changes in
+their own revision, after any transactional DDL. Other dialects get a plain
+CREATE / DROP INDEX.
+"""
+from typing import Optional, Sequence, Union
+
+from alembic import context, op
+from sqlalchemy import inspect, text
+from sqlalchemy.sql.elements import ColumnElement, TextClause
+
+
+def is_postgres() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def has_table(name: str) -> bool:
+    if context.is_offline_mode():
+        # --sql output assumes the database is at the previous revision
+        return False
+    return inspect(op.get_bind()).has_table(name)
+
+
+def has_column(table: str, column: str) -> bool:
+    return any(c["name"] == column for c in inspect(op.get_bind()).get_columns(table))
+
+
+def create_index_concurrently(
+    name: str,
+    table: str,
+    columns: Sequence[Union[str, TextClause, ColumnElement]],
+    *,
+    unique: bool = False,
+    where: Optional[TextClause] = None,
+) -> None:
+    """Safe to re-run: an existing valid index is kept, one left invalid by a failed build is rebuilt."""
+    if not is_postgres():
+        op.create_index(name, table, columns, unique=unique, if_not_exists=True, sqlite_where=where)
+        return
+
+    context = op.get_context()
+    with context.autocommit_block():
+        # offline (--sql) runs have no database to ask
+        invalid = not context.as_sql and op.get_bind().scalar(
+            text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+            {"name": name},
+        )
+        if invalid:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+        op.create_index(
+            name,
+            table,
+            columns,
+            unique=unique,
+            if_not_exists=True,
+            postgresql_concurrently=True,
+            postgresql_where=where,
+        )
+
+
+def drop_index_concurrently(name: str, table: str) -> None:
+    if not is_postgres():
+        op.drop_index(name, table_name=table, if_exists=True)
+        return
+    with op.get_context().autocommit_block():
+        op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
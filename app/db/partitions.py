@@ -0,0 +1,110 @@
+"""
+Monthly range partitions on Postgres.
+
+A partitioned table `t` has one child per calendar month, named
+t_pYYYY_MM and covering [first of the month, first of the next). A table
+that was partitioned in place keeps its old rows in t_legacy, the first
+partition, covering everything before some month; monthly partitions start
+there. Helpers take a sync Connection, so they run from Alembic revisions as they are and
+from async code through `await conn.run_sync(...)`. Partitions are created
+ahead of time: an insert whose created_at falls in a month that has no
+partition fails.
+"""
+import re
+from datetime import date, datetime
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month.year:04d}_{month.month:02d}"
+
+
+def legacy_partition_name(table: str) -> str:
+    return f"{table}_legacy"
+
+
+def create_partition_sql(table: str, month: date) -> str:
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+
+
+def is_partitioned(conn: Connection, table: str) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.scalar(
+        text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))"),
+        {"table": table},
+    ))
+
+
+def legacy_partition_end(conn: Connection, table: str) -> date | None:
+    """The month t_legacy ends at, or None if there is no such partition."""
+    bound = conn.scalar(
+        text("SELECT pg_get_expr(relpartbound, oid) FROM pg_class WHERE oid = to_regclass(:name) AND relispartition"),
+        {"name": legacy_partition_name(table)},
+    )
+    if bound is None:
+        return None
+    # FOR VALUES FROM (MINVALUE) TO ('2026-12-01 00:00:00')
+    return date.fromisoformat(re.search(r"TO \('(\d{4}-\d{2}-\d{2})", bound)[1])
+
+
+def list_partitions(conn: Connection, table: str) -> list[date]:
+    """Months that have a partition of their own, oldest first; t_legacy is not one."""
+    names = conn.scalars(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:table)"
+        ),
+        {"table": table},
+    )
+    pattern = re.compile(rf"^{re.escape(table)}_p(\d{{4}})_(\d{{2}})$")
+    months = []
+    for name in names:
+        match = pattern.match(name)
+        if match:
+            months.append(date(int(match[1]), int(match[2]), 1))
+    return sorted(months)
+
+
+def lock_partitions(conn: Connection, table: str) -> None:
+    """Transaction-scoped lock so machines don't create or drop partitions at the same time."""
+    conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": f"partitions:{table}"})
+
+
+def ensure_partitions(conn: Connection, table: str, months_ahead: int, since: date | None = None) -> list[date]:
+    """
+    Create the partitions from `since` (default: this month) through
+    `months_ahead` months after this one, skipping months t_legacy covers;
+    returns the months created. A no-op unless `table` is partitioned.
+    """
+    if not is_partitioned(conn, table):
+        return []
+    lock_partitions(conn, table)
+    existing = set(list_partitions(conn, table))
+    this_month = month_start(datetime.utcnow().date())
+    month = month_start(since or this_month)
+    legacy_end = legacy_partition_end(conn, table)
+    if legacy_end is not None:
+        month = max(month, legacy_end)
+    last = add_months(this_month, months_ahead)
+    created = []
+    while month <= last:
+        if month not in existing:
+            conn.execute(text(create_partition_sql(table, month)))
+            created.append(month)
+        month = add_months(month, 1)
+    return created
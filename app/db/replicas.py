@@ -0,0 +1,117 @@
+"""
+Read-replica routing for `read` endpoints.
+
+Each replica's replay lag is polled in the background; a replica only takes
+reads while its lag is known and below REPLICA_MAX_LAG_SECONDS, otherwise
+reads fall back to the primary. Writes always use get_db (the primary).
+Sessions opened on a replica carry info["replica"] = True.
+"""
+import asyncio
+import logging
+import random
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+from app.core.metrics import instrument_engine, register_stats
+from app.db.session import AsyncSessionLocal, engine_options, to_async_url
+from app.workers.base import BackgroundWorker
+
+logger = logging.getLogger(__name__)
+
+# 0 while the replica has replayed everything it received, so an idle primary
+# doesn't read as lag
+PG_REPLAY_LAG_SQL = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+class Replica:
+    def __init__(self, name: str, url: str) -> None:
+        self.name = name
+        self.engine: AsyncEngine = create_async_engine(to_async_url(url), **engine_options(url))
+        self.sessionmaker = async_sessionmaker(
+            bind=self.engine,
+            class_=AsyncSession,
+            autoflush=False,
+            expire_on_commit=False,
+            info={"replica": True},
+        )
+        self.lag: Optional[float] = None  # unknown until the first check
+
+    @property
+    def usable(self) -> bool:
+        return self.lag is not None and self.lag <= settings.REPLICA_MAX_LAG_SECONDS
+
+    async def check_lag(self) -> None:
+        try:
+            async with self.engine.connect() as conn:
+                if self.engine.dialect.name == "postgresql":
+                    lag = await asyncio.wait_for(conn.scalar(PG_REPLAY_LAG_SQL), settings.REPLICA_MAX_LAG_SECONDS)
+                else:
+                    await conn.execute(text("SELECT 1"))
+                    lag = 0
+            self.lag = float(lag or 0)
+        except Exception as exc:
+            if self.lag is not None:
+                logger.warning("replica unavailable", extra={"replica": self.name, "error": repr(exc)})
+            self.lag = None
+
+
+class ReplicaRouter:
+    def __init__(self, urls: list[str]) -> None:
+        self.replicas = [Replica(f"replica{i}", url) for i, url in enumerate(urls)]
+        if settings.METRICS_ENABLED:
+            for replica in self.replicas:
+                instrument_engine(replica.engine.sync_engine, replica.name)
+        register_stats("db_replica", self.stats)
+
+    def sessionmaker(self) -> async_sessionmaker:
+        usable = [r for r in self.replicas if r.usable]
+        return random.choice(usable).sessionmaker if usable else AsyncSessionLocal
+
+    async def check(self) -> None:
+        await asyncio.gather(*(replica.check_lag() for replica in self.replicas))
+
+    async def dispose(self) -> None:
+        await asyncio.gather(*(replica.engine.dispose() for replica in self.replicas))
+
+    def stats(self) -> dict:
+        stats = {}
+        for replica in self.replicas:
+            stats[f"{replica.name}_usable"] = int(replica.usable)
+            if replica.lag is not None:
+                stats[f"{replica.name}_lag_seconds"] = replica.lag
+        return stats
+
+
+replica_router = ReplicaRouter([url.unicode_string() for url in settings.DATABASE_REPLICA_URLS])
+
+
+def read_session() -> AsyncSession:
+    """A session on a usable replica, or on the primary when none is."""
+    return replica_router.sessionmaker()()
+
+
+async def get_read_db():
+    async with read_session() as db:
+        yield db
+
+
+def is_replica(db: AsyncSession) -> bool:
+    return db.info.get("replica", False)
+
+
+async def _check_replicas() -> None:
+    await replica_router.check()
+
+
+def build_replica_monitor() -> BackgroundWorker:
+    return BackgroundWorker(
+        name="replica-lag",
+        job=_check_replicas,
+        interval=settings.REPLICA_CHECK_INTERVAL_SECONDS,
+    )
@@ -0,0 +1,15 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def dialect_insert(db: AsyncSession, model):
+    """
+    INSERT construct for the session's dialect, so callers can use
+    on_conflict_do_nothing / on_conflict_do_update on Postgres and SQLite alike.
+    """
+    name = db.get_bind().dialect.name
+    if name not in _INSERTS:
+        raise NotImplementedError(f"upserts are not supported on {name}")
+    return _INSERTS[name](model)
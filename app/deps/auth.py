@@ -1,14 +1,28 @@
-from fastapi import Depends, Header, HTTPException, status
-from typing import Optional, List
-from sqlalchemy.orm import Session
+from fastapi import Depends, Header, HTTPException, Request, Response, status
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 from datetime import datetime
 
+from app.core.cache import TTLCache, get_cache
+from app.core.config import settings
+from app.core.metrics import record_auth
+from app.core.permissions import ALL_PERMISSIONS, RATE_CLASSES, Permission, permission_label
+from app.core.rate_limit import get_rate_limiter, limit_for
 from app.core.security import decode_access_token, hash_api_key
 from app.db.session import get_db
 from app.models.user import User
 from app.models.api_key import ApiKey
 
+# hashes of API keys that did not resolve -> "invalid" / "expired"
+_rejected_keys = TTLCache(max_entries=10_000, ttl_seconds=settings.AUTH_NEGATIVE_CACHE_TTL_SECONDS)
+
+
+class _ExpiredApiKey(HTTPException):
+    def __init__(self) -> None:
+        super().__init__(status_code=401, detail="Expired API key")
+
 
 class AuthContext:
     def __init__(self, user: User, via: str, api_key: Optional[ApiKey] = None,) -> None:
@@ -17,37 +31,125 @@ class AuthContext:
         self.api_key = api_key
 
     @property
-    def permissions(self) -> List[str]:
+    def permissions(self) -> Permission:
         if not self.api_key:
             # JWT user: full access
-            return ["deposit", "transfer", "read"]
-        return self.api_key.permissions_list
+            return ALL_PERMISSIONS
+        return self.api_key.permissions
 
 
-async def get_auth_context(
-    db: Session = Depends(get_db),
-    authorization: Optional[str] = Header(default=None),
-    x_api_key: Optional[str] = Header(default=None, convert_underscores=False),
-) -> AuthContext:
-    if x_api_key:
-        # API key auth
-        key_hash = hash_api_key(x_api_key)
-        api_key = (
-            db.query(ApiKey)
-            .filter(ApiKey.key_hash == key_hash, ApiKey.revoked == False)
-            .first()
+# resolved principals are cached under "auth:api_key:v3:<hash>" / "auth:user:<sub>";
+# only plain column snapshots are stored so entries never hold on to a session
+def _user_snapshot(user: User) -> dict:
+    return {
+        "id": user.id,
+        "google_sub": user.google_sub,
+        "email": user.email,
+        "full_name": user.full_name,
+        "created_at": user.created_at,
+    }
+
+
+def _api_key_snapshot(api_key: ApiKey) -> dict:
+    return {
+        "id": api_key.id,
+        "user_id": api_key.user_id,
+        "name": api_key.name,
+        "key_hash": api_key.key_hash,
+        "permission_mask": api_key.permission_mask,
+        "limits": api_key.limits,
+        "expires_at": api_key.expires_at,
+        "revoked": api_key.revoked,
+        "created_at": api_key.created_at,
+    }
+
+
+async def invalidate_api_key(key_hash: str) -> None:
+    """Drop a cached API key principal on every node, e.g. after revocation or rollover."""
+    await get_cache().delete(f"auth:api_key:v3:{key_hash}")
+
+
+async def invalidate_user(user_id) -> None:
+    await get_cache().delete(f"auth:user:{user_id}")
+
+
+def _client_address(request: Request) -> str:
+    if settings.RATE_LIMIT_CLIENT_IP_HEADER:
+        address = request.headers.get(settings.RATE_LIMIT_CLIENT_IP_HEADER)
+        if address:
+            return address
+    return request.client.host if request.client else "unknown"
+
+
+async def _resolve_api_key(db: AsyncSession, x_api_key: str, request: Request, response: Response) -> AuthContext:
+    key_hash = hash_api_key(x_api_key)
+    cache_key = f"auth:api_key:v3:{key_hash}"
+
+    cache = get_cache()
+    cached = await cache.get(cache_key)
+    if cached is None:
+        rejected = _rejected_keys.get(key_hash)
+        if rejected == "expired":
+            raise _ExpiredApiKey()
+        if rejected is not None:
+            raise HTTPException(status_code=401, detail="Invalid API key")
+        # lookups are throttled per client address until the key resolves, so
+        # one caller sending random keys can't flood the database or lock
+        # other clients out of theirs
+        await _enforce_rate_limit(response, "key_lookup", f"ip:{_client_address(request)}")
+        api_key = await db.scalar(
+            select(ApiKey).where(ApiKey.key_hash == key_hash, ApiKey.revoked == False)
         )
         if not api_key:
+            _rejected_keys.set(key_hash, "invalid")
             raise HTTPException(status_code=401, detail="Invalid API key")
 
         if api_key.expires_at <= datetime.utcnow():
-            raise HTTPException(status_code=401, detail="Expired API key")
+            _rejected_keys.set(key_hash, "expired")
+            raise _ExpiredApiKey()
 
-        user = db.query(User).filter(User.id == api_key.user_id).first()
+        user = await db.get(User, api_key.user_id)
         if not user:
             raise HTTPException(status_code=401, detail="User not found for API key")
 
-        return AuthContext(user=user, via="api_key", api_key=api_key)
+        cached = {"user": _user_snapshot(user), "api_key": _api_key_snapshot(api_key)}
+        # never serve a key from cache past its expiry
+        ttl = (api_key.expires_at - datetime.utcnow()).total_seconds()
+        await cache.set(cache_key, cached, ttl=min(ttl, settings.AUTH_CACHE_TTL_SECONDS))
+
+    if cached["api_key"]["expires_at"] <= datetime.utcnow():
+        await cache.delete(cache_key)
+        raise _ExpiredApiKey()
+
+    return AuthContext(
+        user=User(**cached["user"]),
+        via="api_key",
+        api_key=ApiKey(**cached["api_key"]),
+    )
+
+
+async def _resolve_jwt(db: AsyncSession, payload: dict) -> AuthContext:
+    sub = payload.get("sub")
+    cache_key = f"auth:user:{sub}"
+    cache = get_cache()
+    cached = await cache.get(cache_key)
+    if cached is None:
+        user = await db.get(User, UUID(sub))
+        if not user:
+            raise HTTPException(status_code=401, detail="User not found")
+        cached = _user_snapshot(user)
+        await cache.set(cache_key, cached, ttl=settings.AUTH_CACHE_TTL_SECONDS)
+
+    return AuthContext(user=User(**cached), via="jwt")
+
+
+def _identify(authorization: Optional[str], x_api_key: Optional[str]) -> tuple[str, object]:
+    """
+    Work out who is calling without touching the database:
+    ("api_key", <plain key>) or ("jwt", <decoded payload>).
+    """
+    if x_api_key:
+        return "api_key", x_api_key
 
     if authorization and authorization.lower().startswith("bearer "):
         token = authorization.split(" ", 1)[1]
@@ -56,28 +158,102 @@ async def get_auth_context(
         except Exception:
             raise HTTPException(status_code=401, detail="Invalid JWT")
 
-        sub = payload.get("sub")
-        if not sub:
+        if not payload.get("sub"):
             raise HTTPException(status_code=401, detail="Invalid JWT payload")
+        return "jwt", payload
 
-        user = db.query(User).filter(User.id == UUID(sub)).first()
-        if not user:
-            raise HTTPException(status_code=401, detail="User not found")
+    raise HTTPException(status_code=401, detail="Authentication required")
 
-        return AuthContext(user=user, via="jwt")
 
-    raise HTTPException(status_code=401, detail="Authentication required")
+async def _resolve(db: AsyncSession, via: str, credential, request: Request, response: Response) -> AuthContext:
+    if via == "api_key":
+        # API key auth
+        return await _resolve_api_key(db, credential, request, response)
+    return await _resolve_jwt(db, credential)
+
+
+def _failure_outcome(exc: HTTPException) -> str:
+    if isinstance(exc, _ExpiredApiKey):
+        return "expired"
+    return {401: "unauthenticated", 403: "forbidden", 429: "rate_limited"}.get(exc.status_code, "error")
+
+
+async def _authenticate(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    authorization: Optional[str] = Header(default=None),
+    x_api_key: Optional[str] = Header(default=None, alias="x-api-key"),
+) -> AuthContext:
+    """The caller, resolved; failures are recorded here, success by the dependency built on it."""
+    via = "none"
+    try:
+        via, credential = _identify(authorization, x_api_key)
+        return await _resolve(db, via, credential, request, response)
+    except HTTPException as exc:
+        record_auth(via, _failure_outcome(exc))
+        raise
+
+
+async def get_auth_context(auth: AuthContext = Depends(_authenticate)) -> AuthContext:
+    record_auth(auth.via, "ok")
+    return auth
+
+
+async def _enforce_rate_limit(response: Response, rate_class: str, principal: str, cost: int = 1) -> None:
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    per_minute = limit_for(rate_class)
+    if cost > per_minute:
+        # a full bucket could never pay for it
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Rate limit exceeded: at most {per_minute} per minute",
+        )
+    result = await get_rate_limiter().hit(
+        f"rl:{principal}:{rate_class}", capacity=per_minute, rate=per_minute / 60, cost=cost
+    )
+    if not result.allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded",
+            headers=result.headers(),
+        )
+    response.headers.update(result.headers())
 
 
-def require_permission(permission: str):
-    async def _inner(auth: AuthContext = Depends(get_auth_context)) -> AuthContext:
-        # JWT user has full permissions by spec
-        if auth.via == "api_key" and permission not in auth.permissions:
-            from fastapi import HTTPException, status
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail=f"Missing permission: {permission}",
-            )
+def _principal(auth: AuthContext) -> str:
+    # buckets are keyed by resolved API key or by user, per rate class
+    if auth.api_key is not None:
+        return f"key:{auth.api_key.id}"
+    return f"user:{auth.user.id}"
+
+
+async def charge_rate_limit(response: Response, auth: AuthContext, permission: Permission, cost: int) -> None:
+    """For routes whose cost depends on the request, e.g. one token per transfer in a batch."""
+    await _enforce_rate_limit(response, RATE_CLASSES[permission], _principal(auth), cost)
+
+
+def require_permission(permission: Permission, charge: bool = True):
+    """
+    charge=False leaves the rate limit to the route, which must call
+    charge_rate_limit() before doing any work.
+    """
+    async def _inner(response: Response, auth: AuthContext = Depends(_authenticate)) -> AuthContext:
+        try:
+            if charge:
+                await charge_rate_limit(response, auth, permission, 1)
+
+            # JWT user has full permissions by spec
+            if not auth.permissions & permission:
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail=f"Missing permission: {permission_label(permission)}",
+                )
+        except HTTPException as exc:
+            record_auth(auth.via, _failure_outcome(exc))
+            raise
+        record_auth(auth.via, "ok")
         return auth
 
-    return _inner
\ No newline at end of file
+    return _inner
@@ -0,0 +1,84 @@
+"""
+Application factory. Nothing here touches the database or the network at
+import time. Workers that are off by default (webhook inbox, reconciler,
+ledger, partition upkeep) are only imported when their setting turns them
+on, and read replicas and Redis are only connected when configured; route
+modules and the services behind them are imported up front.
+"""
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+
+from app.core.cache import close_cache, start_cache
+from app.core.config import settings
+from app.core.events import start_events
+from app.core.http import close_http_clients, start_http_clients
+from app.core.limits import close_limit_counters
+from app.core.logs import configure_logging
+from app.core.metrics import MetricsMiddleware
+from app.core.rate_limit import close_rate_limiter
+from app.db.base import Base
+from app.db.partitions import ensure_partitions
+from app.db.replicas import build_replica_monitor, replica_router
+from app.db.session import async_engine
+from app.routes import auth, keys, metrics, wallet
+from app.workers.api_keys import build_api_key_sweeper
+from app.workers.idempotency import build_idempotency_sweeper
+
+
+def build_workers() -> list:
+    workers = [build_idempotency_sweeper(), build_api_key_sweeper()]
+    if replica_router.replicas:
+        workers.append(build_replica_monitor())
+    if settings.PAYSTACK_WEBHOOK_MODE == "queue":
+        from app.workers.webhook_inbox import build_inbox_worker
+        workers.append(build_inbox_worker())
+    if settings.PAYSTACK_RECONCILE_ENABLED:
+        from app.workers.paystack_reconcile import build_reconciler
+        workers.append(build_reconciler())
+    if settings.LEDGER_ENABLED:
+        from app.workers.ledger import build_ledger_worker
+        workers.append(build_ledger_worker())
+    if async_engine.dialect.name == "postgresql":
+        from app.workers.transaction_partitions import build_partition_worker
+        workers.append(build_partition_worker())
+    return workers
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.DB_CREATE_ALL:
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            # a fresh partitioned table has no partitions to insert into yet
+            await conn.run_sync(ensure_partitions, "transactions", settings.TRANSACTIONS_PARTITION_MONTHS_AHEAD)
+    # builds the shared upstream clients; no connection is opened yet
+    await start_http_clients()
+    await start_cache()
+    await start_events()
+    if replica_router.replicas:
+        await replica_router.check()
+    workers = build_workers()
+    for worker in workers:
+        worker.start()
+    yield
+    for worker in workers:
+        await worker.stop()
+    await close_cache()
+    await close_rate_limiter()
+    await close_limit_counters()
+    await close_http_clients()
+    await replica_router.dispose()
+
+
+def create_app() -> FastAPI:
+    configure_logging()
+    app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan)
+    if settings.METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+        app.include_router(metrics.router)
+
+    app.include_router(auth.router)
+    app.include_router(keys.router)
+    app.include_router(wallet.router)
+    return app
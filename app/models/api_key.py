@@ -1,26 +1,56 @@
+import enum
 import uuid
-from datetime import datetime, UTC
-from sqlalchemy import Column, String, DateTime, Boolean, ForeignKey
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, Boolean, ForeignKey, Integer, Index, Enum, JSON, text
 from sqlalchemy.dialects.postgresql import UUID
+from app.core.permissions import Permission
 from app.db.base import Base
 
 
+class ApiKeyRevokedReason(str, enum.Enum):
+    revoked = "revoked"          # by the owner
+    expired = "expired"          # by the expiry sweeper
+    rolled_over = "rolled_over"  # replaced through /keys/rollover
+
+
+# partial indexes only cover live keys, so they stay small however many
+# expired and revoked keys pile up
+ACTIVE = text("revoked = false")
+
+
 class ApiKey(Base):
     __tablename__ = "api_keys"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     name = Column(String(128), nullable=False)
 
     key_hash = Column(String(128), nullable=False, unique=True)   # sha256(api_key)
-    permissions = Column(String(256), nullable=False)  # "deposit,transfer,read"
+    permission_mask = Column(Integer, nullable=False, default=0)  # Permission bits
+    # transfer limits ({"daily_amount", "per_minute", "daily_recipients"}), see app.services.transfer_limits
+    limits = Column(JSON(none_as_null=True), nullable=True)
     expires_at = Column(DateTime, nullable=False)
 
     revoked = Column(Boolean, default=False, nullable=False)
+    revoked_reason = Column(Enum(ApiKeyRevokedReason), nullable=True)
 
-    created_at = Column(DateTime, default=datetime.now(UTC), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     revoked_at = Column(DateTime, nullable=True)
 
+    __table_args__ = (
+        # also serves user_id lookups (key listing)
+        Index("ix_api_keys_user_permission_mask", user_id, permission_mask),
+        # quota count
+        Index("ix_api_keys_active_user", user_id, postgresql_where=ACTIVE, sqlite_where=ACTIVE),
+        # expiry sweeper
+        Index("ix_api_keys_active_expires_at", expires_at, postgresql_where=ACTIVE, sqlite_where=ACTIVE),
+    )
+
     @property
-    def permissions_list(self) -> list[str]:
-        return [p.strip() for p in self.permissions.split(",") if p.strip()]
\ No newline at end of file
+    def permissions(self) -> Permission:
+        return Permission(self.permission_mask)
+
+    @classmethod
+    def having(cls, permission: Permission):
+        """Filter for keys that hold `permission`; callers scope it by user_id first."""
+        return cls.permission_mask.op("&")(int(permission)) != 0
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, String, BigInteger
+from app.db.base import Base
+
+
+class IdSequence(Base):
+    """
+    Portable counters (SQLite has no sequences). Callers reserve a block of
+    values per round-trip and hand them out from memory.
+    """
+
+    __tablename__ = "id_sequences"
+
+    name = Column(String(64), primary_key=True)
+    next_value = Column(BigInteger, nullable=False, default=0)
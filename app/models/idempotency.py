@@ -0,0 +1,29 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, Integer, JSON, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from app.db.base import Base
+
+
+class IdempotencyRecord(Base):
+    """
+    Stored outcome of a request sent with an Idempotency-Key. status_code is
+    NULL while the first request is still running.
+    """
+
+    __tablename__ = "idempotency_keys"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    scope = Column(String(128), nullable=False)  # "<user_id>:<endpoint>"
+    key = Column(String(255), nullable=False)
+    request_hash = Column(String(64), nullable=False)
+
+    status_code = Column(Integer, nullable=True)
+    response_body = Column(JSON, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    __table_args__ = (
+        UniqueConstraint("scope", "key", name="uq_idempotency_keys_scope_key"),
+    )
@@ -0,0 +1,66 @@
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, Numeric, ForeignKey, Enum, BigInteger, Integer, Index, event
+from sqlalchemy.dialects.postgresql import UUID
+from app.db.base import Base
+import enum
+
+# BIGSERIAL on Postgres; SQLite only autoincrements INTEGER PRIMARY KEY
+EntryId = BigInteger().with_variant(Integer, "sqlite")
+
+
+class LedgerAccount(str, enum.Enum):
+    wallet = "wallet"
+    paystack_clearing = "paystack_clearing"
+    opening_balance = "opening_balance"
+
+
+class LedgerEntry(Base):
+    """
+    Immutable double-entry line. Every posting writes entries that sum to
+    zero; wallet balances are the sum of their `wallet` account entries.
+    """
+
+    __tablename__ = "ledger_entries"
+
+    id = Column(EntryId, primary_key=True, autoincrement=True)
+    account = Column(Enum(LedgerAccount), nullable=False, default=LedgerAccount.wallet)
+    wallet_id = Column(UUID(as_uuid=True), ForeignKey("wallets.id"), nullable=True)
+    # no foreign key: transactions is partitioned, so its id alone is not unique-constrained
+    transaction_id = Column(UUID(as_uuid=True), nullable=True)
+    amount = Column(Numeric(18, 2), nullable=False)  # signed: credit > 0, debit < 0
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # snapshot + tail: SUM(amount) WHERE wallet_id = ? AND id > ?
+        Index("ix_ledger_entries_wallet_id_id", wallet_id, id),
+    )
+
+
+@event.listens_for(LedgerEntry, "before_update")
+@event.listens_for(LedgerEntry, "before_delete")
+def _ledger_is_append_only(mapper, connection, target):
+    raise RuntimeError("ledger entries are immutable")
+
+
+class BalanceSnapshot(Base):
+    """Wallet balance folded from every ledger entry with id <= last_entry_id."""
+
+    __tablename__ = "balance_snapshots"
+
+    wallet_id = Column(UUID(as_uuid=True), ForeignKey("wallets.id"), primary_key=True)
+    balance = Column(Numeric(18, 2), nullable=False, default=0)
+    last_entry_id = Column(EntryId, nullable=False, default=0)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class LedgerCheckpoint(Base):
+    """How far (by entry id) an incremental ledger job has scanned."""
+
+    __tablename__ = "ledger_checkpoints"
+
+    name = Column(String(64), primary_key=True)
+    last_entry_id = Column(EntryId, nullable=False, default=0)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,42 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, Integer, Enum, JSON, Index
+from sqlalchemy.dialects.postgresql import UUID
+from app.db.base import Base
+import enum
+
+
+class PaystackEventStatus(str, enum.Enum):
+    pending = "pending"
+    processed = "processed"
+    failed = "failed"
+
+
+class PaystackEvent(Base):
+    """Inbox row for a verified Paystack webhook, applied later by the inbox workers."""
+
+    __tablename__ = "paystack_events"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    event_key = Column(String(255), unique=True, nullable=False)  # "<event>:<reference>"
+    event = Column(String(64), nullable=True)
+    reference = Column(String(128), nullable=True, index=True)
+    payload = Column(JSON, nullable=False)
+
+    status = Column(Enum(PaystackEventStatus), nullable=False, default=PaystackEventStatus.pending)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String(512), nullable=True)
+
+    received_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    available_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    processed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # workers only ever scan the pending tail
+        Index(
+            "ix_paystack_events_pending",
+            available_at,
+            postgresql_where=status == PaystackEventStatus.pending,
+            sqlite_where=status == PaystackEventStatus.pending,
+        ),
+    )
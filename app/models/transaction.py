@@ -1,7 +1,7 @@
-import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, Numeric, ForeignKey, Enum, JSON, UniqueConstraint
+from sqlalchemy import Column, String, DateTime, Numeric, ForeignKey, Enum, JSON, UniqueConstraint, Index, select, text
 from sqlalchemy.dialects.postgresql import UUID
+from app.core.ids import uuid7
 from app.db.base import Base
 import enum
 
@@ -18,21 +18,73 @@ class TransactionStatus(str, enum.Enum):
     failed = "failed"
 
 
+# deposits waiting on Paystack; a small slice of the table
+PENDING_DEPOSIT = text("status = 'pending' AND type = 'deposit'")
+
+
 class Transaction(Base):
+    """
+    On Postgres, range-partitioned by month of created_at (app.db.partitions),
+    so the partition key is part of the primary key and of every unique
+    constraint. Months older than TRANSACTIONS_ARCHIVE_AFTER_MONTHS can be
+    moved to Parquet files (app.workers.transaction_partitions).
+    """
+
     __tablename__ = "transactions"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     wallet_id = Column(UUID(as_uuid=True), ForeignKey("wallets.id"), nullable=False)
     type = Column(Enum(TransactionType), nullable=False)
     status = Column(Enum(TransactionStatus), nullable=False, default=TransactionStatus.pending)
 
     amount = Column(Numeric(18, 2), nullable=False)
-    reference = Column(String(128), unique=True, index=True, nullable=False)
-    meta = Column(JSON, nullable=True)
+    # globally unique through TransactionReference; the constraint below serves lookups
+    reference = Column(String(128), nullable=False)
+    # transfer_out: {"api_key_id": ...} when an API key made the transfer
+    meta = Column(JSON(none_as_null=True), nullable=True)
 
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, primary_key=True, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     __table_args__ = (
-        UniqueConstraint("reference", name="uq_transactions_reference"),
-    )
\ No newline at end of file
+        UniqueConstraint("reference", "created_at", name="uq_transactions_reference_created_at"),
+        # history is read newest-first per wallet with (created_at, id) keyset cursors
+        Index("ix_transactions_wallet_created_id", wallet_id, created_at.desc(), id.desc()),
+        # deposit reconciler scans pending deposits oldest-first
+        Index(
+            "ix_transactions_pending_deposits",
+            created_at,
+            id,
+            postgresql_where=PENDING_DEPOSIT,
+            sqlite_where=PENDING_DEPOSIT,
+        ),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+    @classmethod
+    def with_reference(cls, reference: str):
+        """
+        Filter by reference. created_at comes from transaction_references, so
+        Postgres looks in one partition instead of every one.
+        """
+        created_at = (
+            select(TransactionReference.created_at)
+            .where(TransactionReference.reference == reference)
+            .scalar_subquery()
+        )
+        return (cls.reference == reference) & (cls.created_at == created_at)
+
+
+class TransactionReference(Base):
+    """
+    One row per transaction, written in the same database transaction. A
+    partitioned table can only enforce uniqueness together with created_at,
+    so this small unpartitioned table keeps references globally unique and
+    tells lookups which partition a reference lives in. Rows outlive their
+    transaction's archival, so archived references stay taken.
+    """
+
+    __tablename__ = "transaction_references"
+
+    reference = Column(String(128), primary_key=True)
+    created_at = Column(DateTime, nullable=False)
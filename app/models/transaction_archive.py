@@ -0,0 +1,21 @@
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, Integer
+from app.db.base import Base
+
+
+class TransactionArchive(Base):
+    """
+    A month of transactions moved out of Postgres into a Parquet file
+    (app.workers.transaction_partitions). History reads these only for
+    ranges older than the oldest live partition.
+    """
+
+    __tablename__ = "transaction_archives"
+
+    partition = Column(String(64), primary_key=True)
+    # [range_start, range_end) of created_at
+    range_start = Column(DateTime, nullable=False)
+    range_end = Column(DateTime, nullable=False, index=True)
+    path = Column(String(512), nullable=False)
+    row_count = Column(Integer, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
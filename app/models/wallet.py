@@ -4,6 +4,8 @@ from sqlalchemy import Column, String, DateTime, Numeric, ForeignKey, UniqueCons
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.db.base import Base
+# registers User for the relationship below when Wallet is imported on its own (CLI jobs)
+from app.models.user import User  # noqa: F401
 
 
 class Wallet(Base):
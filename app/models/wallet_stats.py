@@ -0,0 +1,29 @@
+from datetime import datetime
+from sqlalchemy import Column, Date, DateTime, ForeignKey, Integer, Numeric
+from sqlalchemy.dialects.postgresql import UUID
+from app.db.base import Base
+
+
+class WalletDailyStats(Base):
+    """
+    Per-wallet totals for one UTC day, keyed by the day each transaction was
+    created (the same day history shows it under). Written in the same
+    transaction as the change it counts, under that wallet's row lock.
+    """
+
+    __tablename__ = "wallet_daily_stats"
+
+    wallet_id = Column(UUID(as_uuid=True), ForeignKey("wallets.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+
+    deposited = Column(Numeric(18, 2), nullable=False, default=0)
+    deposit_count = Column(Integer, nullable=False, default=0)
+    sent = Column(Numeric(18, 2), nullable=False, default=0)
+    sent_count = Column(Integer, nullable=False, default=0)
+    received = Column(Numeric(18, 2), nullable=False, default=0)
+    received_count = Column(Integer, nullable=False, default=0)
+    # deposits Paystack reported as failed or abandoned
+    failed = Column(Numeric(18, 2), nullable=False, default=0)
+    failed_count = Column(Integer, nullable=False, default=0)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, Request
 from fastapi.responses import RedirectResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import uuid4
 
 from app.db.session import get_db
@@ -24,7 +24,7 @@ async def google_callback(
     code: str,
     state: str,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     jwt_token = await login_with_google(
         code=code,
@@ -32,5 +32,4 @@ async def google_callback(
         request=request,
         db=db,
     )
-    print('JWT_TOKEN', jwt_token)
     return JWTToken(access_token=jwt_token)
\ No newline at end of file
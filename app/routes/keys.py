@@ -1,12 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from datetime import datetime, UTC
+from typing import Optional
+from uuid import UUID
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
 
+from app.core.permissions import PERMISSION_NAMES, permission_names
 from app.db.session import get_db
-from app.schemas.api_key import ApiKeyCreateRequest, ApiKeyCreateResponse, ApiKeyRolloverRequest
-from app.deps.auth import AuthContext, get_auth_context
-from app.services.api_keys import create_api_key, compute_expires_at
-from app.models.api_key import ApiKey
+from app.schemas.api_key import (
+    ApiKeyCreateRequest,
+    ApiKeyCreateResponse,
+    ApiKeyItem,
+    ApiKeyRolloverRequest,
+    PermissionLiteral,
+)
+from app.deps.auth import AuthContext, get_auth_context, invalidate_api_key
+from app.services.api_keys import create_api_key, list_api_keys, revoke_api_key
+from app.models.api_key import ApiKey, ApiKeyRevokedReason
 
 router = APIRouter(prefix="/keys", tags=["api_keys"])
 
@@ -14,16 +24,17 @@ router = APIRouter(prefix="/keys", tags=["api_keys"])
 @router.post("/create", response_model=ApiKeyCreateResponse)
 async def create_key(
     body: ApiKeyCreateRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     auth: AuthContext = Depends(get_auth_context),
 ):
     try:
-        plain, api_key = create_api_key(
+        plain, api_key = await create_api_key(
             db=db,
             user_id=auth.user.id,
             name=body.name,
             permissions=body.permissions,
             expiry=body.expiry,
+            limits=body.limits.model_dump(exclude_none=True) if body.limits else None,
         )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -36,32 +47,84 @@ async def create_key(
 @router.post("/rollover", response_model=ApiKeyCreateResponse)
 async def rollover_key(
     body: ApiKeyRolloverRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     auth: AuthContext = Depends(get_auth_context),
 ):
-    api_key = (
-        db.query(ApiKey)
-        .filter(ApiKey.id == body.expired_key_id, ApiKey.user_id == auth.user.id)
-        .first()
+    api_key = await db.scalar(
+        select(ApiKey).where(ApiKey.id == body.expired_key_id, ApiKey.user_id == auth.user.id)
     )
     if not api_key:
         raise HTTPException(status_code=404, detail="API key not found")
 
-    if api_key.expires_at > datetime.now(UTC):
+    # expires_at is naive UTC
+    if api_key.expires_at > datetime.utcnow():
         raise HTTPException(status_code=400, detail="Key is not expired")
 
-    # reuse permissions
-    permissions = api_key.permissions_list
+    # the sweeper marks expired keys revoked; anything else can't be rolled over
+    if api_key.revoked and api_key.revoked_reason != ApiKeyRevokedReason.expired:
+        raise HTTPException(status_code=400, detail="Key was revoked or already rolled over")
+
+    # reuse permissions and limits
+    permissions = permission_names(api_key.permission_mask)
+    revoke_api_key(api_key, ApiKeyRevokedReason.rolled_over)
 
     try:
-        plain, new_key = create_api_key(
+        plain, new_key = await create_api_key(
             db=db,
             user_id=auth.user.id,
             name=api_key.name,
             permissions=permissions,
             expiry=body.expiry,
+            limits=api_key.limits,
         )
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    await invalidate_api_key(api_key.key_hash)
+
+    return ApiKeyCreateResponse(api_key=plain, expires_at=new_key.expires_at)
+
+
+def _key_item(api_key: ApiKey) -> ApiKeyItem:
+    return ApiKeyItem(
+        id=api_key.id,
+        name=api_key.name,
+        permissions=permission_names(api_key.permission_mask),
+        expires_at=api_key.expires_at,
+        revoked=api_key.revoked,
+        revoked_reason=api_key.revoked_reason.value if api_key.revoked_reason else None,
+        limits=api_key.limits,
+        created_at=api_key.created_at,
+    )
+
+
+@router.get("", response_model=list[ApiKeyItem])
+async def list_keys(
+    active: bool = False,
+    permission: Optional[PermissionLiteral] = None,
+    db: AsyncSession = Depends(get_db),
+    auth: AuthContext = Depends(get_auth_context),
+):
+    keys = await list_api_keys(
+        db,
+        auth.user.id,
+        active_only=active,
+        permission=PERMISSION_NAMES[permission] if permission else None,
+    )
+    return [_key_item(k) for k in keys]
+
+
+@router.post("/{key_id}/revoke", response_model=ApiKeyItem)
+async def revoke_key(
+    key_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    auth: AuthContext = Depends(get_auth_context),
+):
+    api_key = await db.scalar(select(ApiKey).where(ApiKey.id == key_id, ApiKey.user_id == auth.user.id))
+    if not api_key:
+        raise HTTPException(status_code=404, detail="API key not found")
 
-    return ApiKeyCreateResponse(api_key=plain, expires_at=new_key.expires_at)
\ No newline at end of file
+    if not api_key.revoked:
+        revoke_api_key(api_key, ApiKeyRevokedReason.revoked)
+        await db.commit()
+    await invalidate_api_key(api_key.key_hash)
+    return _key_item(api_key)
\ No newline at end of file
@@ -0,0 +1,23 @@
+import hmac
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+
+from app.core.config import settings
+from app.core.metrics import render_metrics
+
+router = APIRouter(tags=["metrics"])
+
+
+def _check_token(authorization: Optional[str] = Header(default=None)) -> None:
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
+
+
+@router.get("/metrics", include_in_schema=False, dependencies=[Depends(_check_token)])
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
@@ -1,10 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
-from datetime import datetime
+import json
+import logging
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date, datetime, timedelta
 from decimal import Decimal
-
-from app.db.session import get_db
-from app.deps.auth import require_permission, AuthContext
+from typing import Literal, Optional
+
+from app.core.config import settings
+from app.core.metrics import observe_webhook_lag
+from app.core.permissions import Permission
+from app.db.replicas import get_read_db
+from app.db.session import AsyncSessionLocal, get_db
+from app.deps.auth import charge_rate_limit, require_permission, AuthContext
 from app.schemas.wallet import (
     DepositRequest,
     DepositInitResponse,
@@ -12,85 +22,101 @@ from app.schemas.wallet import (
     TransferRequest,
     TransferResponse,
     DepositStatusResponse,
+    BatchTransferRequest,
+    BatchTransferResponse,
+    WalletStatsResponse,
 )
 from app.schemas.transaction import TransactionHistoryItem
-from app.services.wallet import get_or_create_wallet_for_user, get_wallet_balance, perform_transfer
-from app.services.paystack import initialize_deposit, verify_paystack_signature
-from app.models.transaction import Transaction, TransactionStatus
+from app.services.wallet import (
+    get_or_create_wallet_for_user,
+    get_wallet_balance,
+    invalidate_balances,
+    perform_transfer,
+    perform_batch_transfer,
+    resolve_wallet_id,
+    wallet_id_for_user,
+)
+from app.services.idempotency import IdempotencyClaim, request_fingerprint, run_idempotent
+from app.services.transactions import archived_history, history_query, encode_cursor, stream_export
+from app.services.paystack import (
+    apply_paystack_event,
+    initialize_deposit,
+    paystack_paid_at,
+    verify_paystack_signature,
+)
+from app.services.wallet_events import publish_wallet_events, stream_wallet_events, subscribe_wallet
+from app.services.wallet_stats import daily_stats, summarize
+from app.services.webhook_inbox import enqueue_paystack_event
+from app.models.transaction import Transaction, TransactionStatus, TransactionType
 from app.models.wallet import Wallet
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/wallet", tags=["wallet"])
 
 
 @router.post("/deposit", response_model=DepositInitResponse)
 async def deposit(
     body: DepositRequest,
-    db: Session = Depends(get_db),
-    auth: AuthContext = Depends(require_permission("deposit")),
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    auth: AuthContext = Depends(require_permission(Permission.DEPOSIT)),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key", max_length=255),
 ):
-    print('WALLET W')
-    wallet = get_or_create_wallet_for_user(db, auth.user.id)
-    ref, auth_url = await initialize_deposit(
-        db=db,
-        wallet=wallet,
-        amount=body.amount,
-        customer_email=auth.user.email,
+    async def _initialize(_claim: Optional[IdempotencyClaim]) -> dict:
+        # the response only exists once Paystack answers, after the deposit
+        # has committed, so run_idempotent stores it afterwards
+        wallet = await get_or_create_wallet_for_user(db, auth.user.id)
+        ref, auth_url = await initialize_deposit(
+            db=db,
+            wallet=wallet,
+            amount=body.amount,
+            customer_email=auth.user.email,
+        )
+        return {"reference": ref, "authorization_url": auth_url}
+
+    result, replayed = await run_idempotent(
+        db, idempotency_key, f"{auth.user.id}:deposit", request_fingerprint(body.model_dump()), _initialize
+    )
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    logger.info(
+        "deposit initialized",
+        extra={"user_id": str(auth.user.id), "reference": result["reference"], "amount": body.amount, "replayed": replayed},
     )
-    return DepositInitResponse(reference=ref, authorization_url=auth_url)
+    return DepositInitResponse(**result)
 
 
 @router.post("/paystack/webhook")
-async def paystack_webhook(request: Request, db: Session = Depends(get_db)):
-    print('PAYSTACK WEBHOOK')
+async def paystack_webhook(request: Request, db: AsyncSession = Depends(get_db)):
     body = await request.body()
 
     # 1. Validate signature
     verify_paystack_signature(request, body)
 
-    payload = await request.json()  # FastAPI will parse from body again
-    print('PAYSTACK WEBHOOK',payload)
-    event = payload.get("event")
-    data = payload.get("data", {})
-
-    reference = data.get("reference")
-    status_from_ps = data.get("status")  # "success", "failed", etc.
-    amount_kobo = data.get("amount", 0)
-
-    if not reference:
-        raise HTTPException(status_code=400, detail="Missing reference")
-
-    tx = db.query(Transaction).filter(Transaction.reference == reference).first()
-    if not tx:
-        # Optionally create a record or just ignore
-        raise HTTPException(status_code=404, detail="Transaction not found")
-
-    # Idempotency: if already success, just ack
-    if tx.status == TransactionStatus.success:
-        return {"status": True}
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    data = payload.get("data") or {}
+    logger.info(
+        "paystack webhook received",
+        extra={"event": payload.get("event"), "reference": data.get("reference"), "status": data.get("status")},
+    )
 
-    # Only credit on success (and maybe on specific event)
-    if status_from_ps != "success":
-        tx.status = TransactionStatus.failed
-        db.commit()
+    # 2. Queue mode: persist and ack, background workers credit the wallet
+    if settings.PAYSTACK_WEBHOOK_MODE == "queue":
+        await enqueue_paystack_event(db, payload)
         return {"status": True}
 
-    # Convert amount from kobo to base
-    amount = int(amount_kobo) // 100
-
-    # Sanity: ensure amount matches the original
-    if int(tx.amount) != amount:
-        # you might log this mismatch
-        pass
-
-    # Credit wallet atomically
-    wallet = db.query(Wallet).filter(Wallet.id == tx.wallet_id).with_for_update().first()
-    if not wallet:
-        raise HTTPException(status_code=404, detail="Wallet not found")
-
-    from decimal import Decimal
-    wallet.balance = wallet.balance + Decimal(amount)
-    tx.status = TransactionStatus.success
-    db.commit()
+    wallet_id = await apply_paystack_event(db, payload)
+    await db.commit()
+    await publish_wallet_events(db)
+    if wallet_id:
+        await invalidate_balances(wallet_id)
+        paid_at = paystack_paid_at(payload)
+        if paid_at:
+            observe_webhook_lag("inline", (datetime.utcnow() - paid_at).total_seconds())
 
     return {"status": True}
 
@@ -98,10 +124,10 @@ async def paystack_webhook(request: Request, db: Session = Depends(get_db)):
 @router.get("/deposit/{reference}/status", response_model=DepositStatusResponse)
 async def deposit_status(
     reference: str,
-    db: Session = Depends(get_db),
-    auth: AuthContext = Depends(require_permission("read")),
+    db: AsyncSession = Depends(get_read_db),
+    auth: AuthContext = Depends(require_permission(Permission.READ)),
 ):
-    tx = db.query(Transaction).filter(Transaction.reference == reference).first()
+    tx = await db.scalar(select(Transaction).where(Transaction.with_reference(reference)))
     if not tx:
         raise HTTPException(status_code=404, detail="Transaction not found")
 
@@ -114,68 +140,187 @@ async def deposit_status(
 
 @router.get("/balance", response_model=BalanceResponse)
 async def balance(
-    db: Session = Depends(get_db),
-    auth: AuthContext = Depends(require_permission("read")),
+    db: AsyncSession = Depends(get_read_db),
+    auth: AuthContext = Depends(require_permission(Permission.READ)),
 ):
-    from app.models.wallet import Wallet
-
-    wallet = db.query(Wallet).filter(Wallet.user_id == auth.user.id).first()
-    if not wallet:
+    wallet_id = await wallet_id_for_user(db, auth.user.id)
+    if not wallet_id:
         # should not normally happen
-        wallet = get_or_create_wallet_for_user(db, auth.user.id)
+        async with AsyncSessionLocal() as primary:
+            wallet_id = (await get_or_create_wallet_for_user(primary, auth.user.id)).id
+
+    return BalanceResponse(balance=await get_wallet_balance(db, wallet_id))
+
+
+@router.get("/stats", response_model=WalletStatsResponse)
+async def stats(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    group_by: Literal["day", "month", "total"] = "day",
+    db: AsyncSession = Depends(get_read_db),
+    auth: AuthContext = Depends(require_permission(Permission.READ)),
+):
+    """Totals per UTC day (by transaction creation), inclusive of both ends."""
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=settings.WALLET_STATS_DEFAULT_DAYS - 1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if (end - start).days >= settings.WALLET_STATS_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range is limited to {settings.WALLET_STATS_MAX_DAYS} days")
+
+    wallet_id = await wallet_id_for_user(db, auth.user.id)
+    if not wallet_id:
+        raise HTTPException(status_code=404, detail="Wallet not found")
 
-    return BalanceResponse(balance=int(wallet.balance))
+    totals, periods = summarize(await daily_stats(db, wallet_id, start, end), group_by)
+    return WalletStatsResponse(start=start, end=end, group_by=group_by, totals=totals, periods=periods)
+
+
+@router.get("/events")
+async def events(
+    db: AsyncSession = Depends(get_db),
+    auth: AuthContext = Depends(require_permission(Permission.READ)),
+):
+    wallet_id = await wallet_id_for_user(db, auth.user.id)
+    if not wallet_id:
+        raise HTTPException(status_code=404, detail="Wallet not found")
+
+    subscription = subscribe_wallet(wallet_id)
+    try:
+        balance = await get_wallet_balance(db, wallet_id)
+    except BaseException:
+        subscription.close()
+        raise
+    # the stream can stay open for hours; don't pin a connection for it
+    await db.close()
+
+    return StreamingResponse(
+        stream_wallet_events(subscription, balance),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.post("/transfer", response_model=TransferResponse)
 async def transfer(
     body: TransferRequest,
-    db: Session = Depends(get_db),
-    auth: AuthContext = Depends(require_permission("transfer")),
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    auth: AuthContext = Depends(require_permission(Permission.TRANSFER)),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key", max_length=255),
 ):
-    from app.models.wallet import Wallet
+    async def _transfer(claim: Optional[IdempotencyClaim]) -> dict:
+        sender_wallet_id = await wallet_id_for_user(db, auth.user.id)
+        if not sender_wallet_id:
+            raise HTTPException(status_code=400, detail="Sender wallet not found")
+
+        recipient_wallet_id = await resolve_wallet_id(db, body.wallet_number)
+        if not recipient_wallet_id:
+            raise HTTPException(status_code=404, detail="Recipient wallet not found")
+
+        result = {"status": "success", "message": "Transfer completed"}
+        await perform_transfer(
+            db, sender_wallet_id, recipient_wallet_id, body.amount, auth.api_key, (claim, result) if claim else None
+        )
+        return result
+
+    result, replayed = await run_idempotent(
+        db, idempotency_key, f"{auth.user.id}:transfer", request_fingerprint(body.model_dump()), _transfer
+    )
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return TransferResponse(**result)
+
 
-    sender_wallet = db.query(Wallet).filter(Wallet.user_id == auth.user.id).first()
-    if not sender_wallet:
+@router.post("/transfer/batch", response_model=BatchTransferResponse)
+async def transfer_batch(
+    body: BatchTransferRequest,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    auth: AuthContext = Depends(require_permission(Permission.TRANSFER_BATCH, charge=False)),
+):
+    # one token per transfer, as if each were sent on its own
+    await charge_rate_limit(response, auth, Permission.TRANSFER_BATCH, len(body.transfers))
+    sender_wallet_id = await wallet_id_for_user(db, auth.user.id)
+    if not sender_wallet_id:
         raise HTTPException(status_code=400, detail="Sender wallet not found")
 
-    recipient_wallet = (
-        db.query(Wallet).filter(Wallet.wallet_number == body.wallet_number).first()
+    results = await perform_batch_transfer(
+        db,
+        sender_wallet_id,
+        [(item.wallet_number, item.amount) for item in body.transfers],
+        auth.api_key,
     )
-    if not recipient_wallet:
-        raise HTTPException(status_code=404, detail="Recipient wallet not found")
 
-    perform_transfer(db, sender_wallet, recipient_wallet, body.amount)
-
-    return TransferResponse(status="success", message="Transfer completed")
+    return BatchTransferResponse(
+        status="success",
+        total_amount=sum(item.amount for item in body.transfers),
+        results=results,
+    )
 
 
 @router.get("/transactions", response_model=list[TransactionHistoryItem])
 async def transactions(
-    db: Session = Depends(get_db),
-    auth: AuthContext = Depends(require_permission("read")),
+    response: Response,
+    limit: int = Query(default=50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    type: Optional[TransactionType] = None,
+    status: Optional[TransactionStatus] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_read_db),
+    auth: AuthContext = Depends(require_permission(Permission.READ)),
 ):
-    from app.models.wallet import Wallet
-    from app.models.transaction import Transaction
-
-    wallet = db.query(Wallet).filter(Wallet.user_id == auth.user.id).first()
+    wallet = await db.scalar(select(Wallet).where(Wallet.user_id == auth.user.id))
     if not wallet:
         return []
 
-    txs = (
-        db.query(Transaction)
-        .filter(Transaction.wallet_id == wallet.id)
-        .order_by(Transaction.created_at.desc())
-        .all()
-    )
+    stmt = history_query(wallet.id, cursor=cursor, tx_type=type, tx_status=status, start=start, end=end)
+    txs = list(await db.scalars(stmt.limit(limit + 1)))
+    if len(txs) <= limit:
+        # the live partitions ran out; older months may have been archived
+        txs += await archived_history(
+            db, wallet, limit + 1 - len(txs), cursor=cursor, tx_type=type, tx_status=status, start=start, end=end
+        )
+
+    # one extra row tells us whether there is another page
+    if len(txs) > limit:
+        txs = txs[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(txs[-1])
 
     return [
         TransactionHistoryItem(
             type=tx.type.value,
             amount=tx.amount,
             status=tx.status.value,
+            reference=tx.reference,
+            created_at=tx.created_at,
         )
         for tx in txs
     ]
 
 
+@router.get("/transactions/export")
+async def transactions_export(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    type: Optional[TransactionType] = None,
+    status: Optional[TransactionStatus] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_read_db),
+    auth: AuthContext = Depends(require_permission(Permission.EXPORT)),
+):
+    wallet = await db.scalar(select(Wallet).where(Wallet.user_id == auth.user.id))
+    if not wallet:
+        raise HTTPException(status_code=404, detail="Wallet not found")
+
+    stmt = history_query(wallet.id, tx_type=type, tx_status=status, start=start, end=end)
+    # stream_export opens its own session; don't pin this connection for the whole download
+    await db.close()
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        stream_export(stmt, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="transactions.{format}"'},
+    )
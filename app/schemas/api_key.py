@@ -1,17 +1,25 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import List, Literal
+from typing import List, Literal, Optional
 from uuid import UUID
 
 
-PermissionLiteral = Literal["deposit", "transfer", "read"]
+PermissionLiteral = Literal["deposit", "transfer", "read", "transfer:batch", "export"]
 ExpiryLiteral = Literal["1H", "1D", "1M", "1Y"]
 
 
+class ApiKeyLimits(BaseModel):
+    """Transfer limits for calls made with the key; omitted means no limit."""
+    daily_amount: Optional[int] = Field(default=None, gt=0)      # total sent per UTC day
+    per_minute: Optional[int] = Field(default=None, gt=0)        # transfers in any 60 seconds
+    daily_recipients: Optional[int] = Field(default=None, gt=0)  # distinct recipients per UTC day
+
+
 class ApiKeyCreateRequest(BaseModel):
     name: str = Field(..., max_length=128)
     permissions: List[PermissionLiteral]
     expiry: ExpiryLiteral
+    limits: Optional[ApiKeyLimits] = None
 
 
 class ApiKeyCreateResponse(BaseModel):
@@ -21,4 +29,14 @@ class ApiKeyCreateResponse(BaseModel):
 
 class ApiKeyRolloverRequest(BaseModel):
     expired_key_id: UUID
-    expiry: ExpiryLiteral
\ No newline at end of file
+    expiry: ExpiryLiteral
+
+class ApiKeyItem(BaseModel):
+    id: UUID
+    name: str
+    permissions: List[PermissionLiteral]
+    expires_at: datetime
+    revoked: bool
+    revoked_reason: Optional[Literal["revoked", "expired", "rolled_over"]] = None
+    limits: Optional[ApiKeyLimits] = None
+    created_at: datetime
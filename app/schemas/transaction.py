@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from datetime import datetime
 from typing import Literal
 from decimal import Decimal
 
@@ -6,4 +7,6 @@ from decimal import Decimal
 class TransactionHistoryItem(BaseModel):
     type: Literal["deposit", "transfer_in", "transfer_out"]
     amount: Decimal
-    status: Literal["success", "failed", "pending"]
\ No newline at end of file
+    status: Literal["success", "failed", "pending"]
+    reference: str
+    created_at: datetime
\ No newline at end of file
@@ -1,8 +1,25 @@
-from pydantic import BaseModel, Field
-from datetime import datetime
-from typing import Literal
+from pydantic import AfterValidator, BaseModel, Field
+from datetime import date, datetime
+from typing import Annotated, List, Literal
 from uuid import UUID
 
+from app.core.config import settings
+from app.core.ids import is_valid_wallet_number, is_wallet_number_shape
+
+
+def _check_wallet_number(value: str) -> str:
+    # mistyped numbers fail here, before any cache or database lookup
+    if settings.WALLET_NUMBER_ACCEPT_LEGACY:
+        valid = is_wallet_number_shape(value)
+    else:
+        valid = is_valid_wallet_number(value)
+    if not valid:
+        raise ValueError("not a valid wallet number")
+    return value
+
+
+WalletNumber = Annotated[str, AfterValidator(_check_wallet_number)]
+
 
 class DepositRequest(BaseModel):
     amount: int = Field(..., gt=0)  # in base currency units (e.g. Naira)
@@ -24,10 +41,50 @@ class BalanceResponse(BaseModel):
 
 
 class TransferRequest(BaseModel):
-    wallet_number: str
+    wallet_number: WalletNumber
     amount: int = Field(..., gt=0)
 
 
 class TransferResponse(BaseModel):
     status: str
-    message: str
\ No newline at end of file
+    message: str
+
+
+class BatchTransferRequest(BaseModel):
+    transfers: List[TransferRequest] = Field(..., min_length=1, max_length=500)
+
+
+class BatchTransferItemResult(BaseModel):
+    wallet_number: str
+    amount: int
+    status: str
+    reference: str
+
+
+class BatchTransferResponse(BaseModel):
+    status: str
+    total_amount: int
+    results: List[BatchTransferItemResult]
+
+
+class WalletStats(BaseModel):
+    deposited: int
+    deposit_count: int
+    sent: int
+    sent_count: int
+    received: int
+    received_count: int
+    failed: int
+    failed_count: int
+
+
+class WalletStatsPeriod(WalletStats):
+    start: date
+
+
+class WalletStatsResponse(BaseModel):
+    start: date
+    end: date
+    group_by: Literal["day", "month", "total"]
+    totals: WalletStats
+    periods: List[WalletStatsPeriod]
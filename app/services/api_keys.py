@@ -1,12 +1,12 @@
 from datetime import datetime, timedelta, UTC
-from dateutil.relativedelta import relativedelta  # install python-dateutil
-from typing import List
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.api_key import ApiKey
+from app.models.api_key import ApiKey, ApiKeyRevokedReason
+from app.core.permissions import Permission, parse_permissions
 from app.core.security import generate_api_key
 
-VALID_PERMISSIONS = {"deposit", "transfer", "read"}
 VALID_EXPIRIES = {"1H", "1D", "1M", "1Y"}
 
 
@@ -16,6 +16,9 @@ def compute_expires_at(code: str) -> datetime:
         return now + timedelta(hours=1)
     if code == "1D":
         return now + timedelta(days=1)
+    # calendar months/years; dateutil is only loaded when a key is created
+    from dateutil.relativedelta import relativedelta  # install python-dateutil
+
     if code == "1M":
         return now + relativedelta(months=1)
     if code == "1Y":
@@ -23,39 +26,82 @@ def compute_expires_at(code: str) -> datetime:
     raise ValueError("Invalid expiry code")
 
 
-def create_api_key(db: Session, user_id, name: str, permissions: List[str], expiry: str) -> tuple[str, ApiKey]:
+async def create_api_key(
+    db: AsyncSession, user_id, name: str, permissions: List[str], expiry: str, limits: Optional[dict] = None
+) -> tuple[str, ApiKey]:
     # validate perms
-    if not set(permissions).issubset(VALID_PERMISSIONS):
-        raise ValueError("Invalid permissions")
+    mask = parse_permissions(permissions)
 
     # enforce max 5 active
-    from datetime import datetime
-    active_count = (
-        db.query(ApiKey)
-        .filter(
+    active_count = await db.scalar(
+        select(func.count())
+        .select_from(ApiKey)
+        .where(
             ApiKey.user_id == user_id,
             ApiKey.revoked == False,
             ApiKey.expires_at > datetime.utcnow(),
         )
-        .count()
     )
     if active_count >= 5:
         raise RuntimeError("Maximum number of active API keys reached")
 
-    expires_at = compute_expires_at(expiry)
+    # expires_at is a naive UTC column; asyncpg rejects aware datetimes for it
+    expires_at = compute_expires_at(expiry).replace(tzinfo=None)
     plain, key_hash = generate_api_key()
-    perms_str = ",".join(permissions)
 
     api_key = ApiKey(
         user_id=user_id,
         name=name,
         key_hash=key_hash,
-        permissions=perms_str,
+        permission_mask=int(mask),
+        limits=limits or None,
         expires_at=expires_at,
         revoked=False,
     )
     db.add(api_key)
-    db.commit()
-    db.refresh(api_key)
+    await db.commit()
+    await db.refresh(api_key)
+
+    return plain, api_key
+
+
+async def list_api_keys(
+    db: AsyncSession, user_id, active_only: bool = False, permission: Optional[Permission] = None
+) -> list[ApiKey]:
+    stmt = select(ApiKey).where(ApiKey.user_id == user_id)
+    if active_only:
+        stmt = stmt.where(ApiKey.revoked == False, ApiKey.expires_at > datetime.utcnow())
+    if permission is not None:
+        stmt = stmt.where(ApiKey.having(permission))
+    return list(await db.scalars(stmt.order_by(ApiKey.created_at.desc())))
+
 
-    return plain, api_key
\ No newline at end of file
+def revoke_api_key(api_key: ApiKey, reason: ApiKeyRevokedReason) -> None:
+    """Marks the key revoked; the caller commits and then invalidates the cached principal."""
+    api_key.revoked = True
+    api_key.revoked_reason = reason
+    api_key.revoked_at = datetime.utcnow()
+
+
+async def expire_api_keys(db: AsyncSession, batch_size: int) -> int:
+    """
+    Mark up to batch_size keys past their expiry as revoked, so they drop out
+    of the active-key partial indexes. Auth still checks expires_at itself,
+    so a key is never usable between expiry and the next sweep.
+    """
+    now = datetime.utcnow()
+    due = (
+        select(ApiKey.id)
+        .where(ApiKey.revoked == False, ApiKey.expires_at <= now)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        update(ApiKey)
+        .where(ApiKey.id.in_(due))
+        .values(revoked=True, revoked_at=now, revoked_reason=ApiKeyRevokedReason.expired)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
@@ -1,22 +1,23 @@
 from fastapi import HTTPException, Request
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 
 from app.core.security import create_access_token
 from app.models.user import User
-from app.models.wallet import Wallet
 from app.services.google_auth import (
     exchange_code_for_tokens,
     fetch_google_userinfo,
 )
-from app.services.wallet import generate_wallet_number
+from app.services.id_sequences import allocate_wallet_number
+from app.services.wallet import add_wallet
 
 
 async def login_with_google(
     code: str,
     state: str,
     request: Request,
-    db: Session,
+    db: AsyncSession,
 ) -> str:
     """
     Full Google login flow:
@@ -40,20 +41,19 @@ async def login_with_google(
     email = userinfo["email"]
     full_name = userinfo.get("name")
 
-    user = db.query(User).filter(User.google_sub == google_sub).first()
+    user = await db.scalar(select(User).where(User.google_sub == google_sub))
 
     if not user:
+        wallet_number = await allocate_wallet_number()
         user = User(google_sub=google_sub, email=email, full_name=full_name)
         db.add(user)
-        db.flush()  # get user.id
+        await db.flush()  # get user.id
 
-        wallet = Wallet(user_id=user.id, wallet_number=generate_wallet_number())
-        db.add(wallet)
+        await add_wallet(db, user.id, wallet_number)
 
-        db.commit()
-        db.refresh(user)
+        await db.commit()
     else:
-        db.commit()
+        await db.commit()
 
     jwt_token = create_access_token(str(user.id))
     return jwt_token
\ No newline at end of file
@@ -1,10 +1,8 @@
-import httpx
+import urllib.parse
+
 from fastapi import HTTPException
 from app.core.config import settings
-
-GOOGLE_AUTH_BASE = "https://accounts.google.com/o/oauth2/v2/auth"
-GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
-GOOGLE_USERINFO_URL = "https://openidconnect.googleapis.com/v1/userinfo"
+from app.core.http import get_http_client, request_with_retry
 
 
 def build_google_auth_url(state: str) -> str:
@@ -18,33 +16,36 @@ def build_google_auth_url(state: str) -> str:
         "state": state,
     }
 
-    import urllib.parse
-    return f"{GOOGLE_AUTH_BASE}?{urllib.parse.urlencode(params)}"
+    return f"{settings.GOOGLE_AUTH_URL}?{urllib.parse.urlencode(params)}"
 
 
 async def exchange_code_for_tokens(code: str):
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(
-            GOOGLE_TOKEN_URL,
-            data={
-                "code": code,
-                "client_id": settings.GOOGLE_CLIENT_ID,
-                "client_secret": settings.GOOGLE_CLIENT_SECRET,
-                "redirect_uri": settings.GOOGLE_REDIRECT_URI,
-                "grant_type": "authorization_code",
-            },
-        )
+    # authorization codes are single-use: not idempotent
+    resp = await request_with_retry(
+        get_http_client("google"),
+        "POST",
+        settings.GOOGLE_TOKEN_URL,
+        idempotent=False,
+        data={
+            "code": code,
+            "client_id": settings.GOOGLE_CLIENT_ID,
+            "client_secret": settings.GOOGLE_CLIENT_SECRET,
+            "redirect_uri": settings.GOOGLE_REDIRECT_URI,
+            "grant_type": "authorization_code",
+        },
+    )
     if resp.status_code != 200:
         raise HTTPException(status_code=400, detail="Failed to exchange code")
     return resp.json()
 
 
 async def fetch_google_userinfo(access_token: str):
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(
-            GOOGLE_USERINFO_URL,
-            headers={"Authorization": f"Bearer {access_token}"},
-        )
+    resp = await request_with_retry(
+        get_http_client("google"),
+        "GET",
+        settings.GOOGLE_USERINFO_URL,
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
     if resp.status_code != 200:
         raise HTTPException(status_code=400, detail="Failed to fetch user info")
     return resp.json()
\ No newline at end of file
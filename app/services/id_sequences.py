@@ -0,0 +1,66 @@
+import threading
+
+from sqlalchemy import update
+
+from app.core.config import settings
+from app.core.ids import wallet_number_from_sequence
+from app.db.session import AsyncSessionLocal
+from app.db.upsert import dialect_insert
+from app.models.id_sequence import IdSequence
+
+
+async def reserve_block(name: str, size: int) -> int:
+    """
+    Reserve [start, start + size) of a named sequence and return start. Runs
+    in its own short transaction so the row lock is never held for the
+    caller's transaction.
+    """
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            dialect_insert(db, IdSequence)
+            .values(name=name, next_value=0)
+            .on_conflict_do_nothing(index_elements=["name"])
+        )
+        end = await db.scalar(
+            update(IdSequence)
+            .where(IdSequence.name == name)
+            .values(next_value=IdSequence.next_value + size)
+            .returning(IdSequence.next_value)
+        )
+        await db.commit()
+    return end - size
+
+
+class BlockAllocator:
+    """Hands out values of a sequence from blocks reserved `block_size` at a time."""
+
+    def __init__(self, name: str, block_size: int) -> None:
+        self.name = name
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def _take(self):
+        with self._lock:
+            if self._next < self._end:
+                value = self._next
+                self._next += 1
+                return value
+            return None
+
+    async def next(self) -> int:
+        while (value := self._take()) is None:
+            start = await reserve_block(self.name, self.block_size)
+            with self._lock:
+                # a concurrent refill may have won; its block is used and ours is skipped
+                if self._next >= self._end:
+                    self._next, self._end = start, start + self.block_size
+        return value
+
+
+wallet_numbers = BlockAllocator("wallet_number", settings.WALLET_NUMBER_BLOCK_SIZE)
+
+
+async def allocate_wallet_number() -> str:
+    return wallet_number_from_sequence(await wallet_numbers.next())
@@ -0,0 +1,215 @@
+import asyncio
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.upsert import dialect_insert
+from app.models.idempotency import IdempotencyRecord
+
+# completed outcomes, so hot retries skip the database entirely
+_recent = TTLCache(max_entries=10_000, ttl_seconds=60)
+# first request per key in this process; concurrent duplicates await it
+_inflight: dict[str, asyncio.Future] = {}
+
+# client errors a retry would get again; any other failure (a 409 conflict,
+# a 429 limit, a 5xx) releases the key so the client can retry with it
+STORED_ERROR_STATUSES = {400, 403, 404, 422}
+
+
+class IdempotencyClaim:
+    """
+    An Idempotency-Key this request holds. A handler whose side effect commits
+    in one transaction calls store() inside that transaction, so the outcome
+    is recorded exactly when the side effect is: a failure after the commit
+    can no longer release the key, and a crash can no longer leave it in
+    progress with the money already moved.
+    """
+
+    def __init__(self, scope: str, key: str) -> None:
+        self.scope = scope
+        self.key = key
+        self.stored = False
+
+    async def store(self, db: AsyncSession, body: dict) -> None:
+        """Record a 200 outcome in db's open transaction; the caller commits."""
+        await db.execute(_outcome_update(self.scope, self.key, 200, body))
+        self.stored = True
+
+
+def request_fingerprint(body: dict) -> str:
+    return hashlib.sha256(json.dumps(body, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _replay(outcome: tuple[str, int, dict], request_hash: str) -> tuple[dict, bool]:
+    stored_hash, status_code, body = outcome
+    if stored_hash != request_hash:
+        raise HTTPException(status_code=422, detail="Idempotency-Key reused with a different request")
+    if status_code >= 400:
+        raise HTTPException(status_code=status_code, detail=body.get("detail"))
+    return body, True
+
+
+async def _claim(db: AsyncSession, scope: str, key: str, request_hash: str) -> bool:
+    now = datetime.utcnow()
+    # an expired record is as good as none; the sweeper may not have got to it yet
+    await db.execute(
+        delete(IdempotencyRecord).where(
+            IdempotencyRecord.scope == scope,
+            IdempotencyRecord.key == key,
+            IdempotencyRecord.expires_at <= now,
+        )
+    )
+    result = await db.execute(
+        dialect_insert(db, IdempotencyRecord)
+        .values(
+            scope=scope,
+            key=key,
+            request_hash=request_hash,
+            expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS),
+        )
+        .on_conflict_do_nothing(index_elements=["scope", "key"])
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+
+async def _wait_for_outcome(db: AsyncSession, scope: str, key: str) -> tuple[str, int, dict]:
+    """The first request is running on another machine: poll until it stores its outcome."""
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    delay = 0.05
+    while True:
+        row = (await db.execute(
+            select(
+                IdempotencyRecord.request_hash,
+                IdempotencyRecord.status_code,
+                IdempotencyRecord.response_body,
+            ).where(IdempotencyRecord.scope == scope, IdempotencyRecord.key == key)
+        )).one_or_none()
+        await db.rollback()
+        if row is None:
+            # the first attempt failed and released the key
+            raise HTTPException(status_code=409, detail="Original request failed, retry it")
+        if row.status_code is not None:
+            return row.request_hash, row.status_code, row.response_body
+        if time.monotonic() >= deadline:
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is in progress")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.5)
+
+
+def _outcome_update(scope: str, key: str, status_code: int, body: dict):
+    return (
+        update(IdempotencyRecord)
+        .where(
+            IdempotencyRecord.scope == scope,
+            IdempotencyRecord.key == key,
+            IdempotencyRecord.status_code.is_(None),
+        )
+        .values(status_code=status_code, response_body=body)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def _store(db: AsyncSession, scope: str, key: str, status_code: int, body: dict) -> bool:
+    """False if an outcome was already stored, by the handler's own transaction."""
+    result = await db.execute(_outcome_update(scope, key, status_code, body))
+    await db.commit()
+    return result.rowcount == 1
+
+
+async def _release(db: AsyncSession, scope: str, key: str) -> None:
+    # a key whose outcome committed with the side effect is never released
+    await db.rollback()
+    await db.execute(
+        delete(IdempotencyRecord).where(
+            IdempotencyRecord.scope == scope,
+            IdempotencyRecord.key == key,
+            IdempotencyRecord.status_code.is_(None),
+        )
+    )
+    await db.commit()
+
+
+async def run_idempotent(
+    db: AsyncSession,
+    key: Optional[str],
+    scope: str,
+    request_hash: str,
+    handler: Callable[[Optional[IdempotencyClaim]], Awaitable[dict]],
+) -> tuple[dict, bool]:
+    """
+    Run handler(claim) at most once per (scope, key) within
+    IDEMPOTENCY_TTL_SECONDS. Returns (response body, replayed). Final client
+    errors (STORED_ERROR_STATUSES) are stored and replayed like successes;
+    anything else releases the key so the client can retry, unless the
+    handler already stored its outcome with claim.store(). A handler that
+    does not is stored once it returns, in a transaction of its own.
+    """
+    if not key:
+        return await handler(None), False
+
+    cache_key = f"{scope}:{key}"
+    outcome = _recent.get(cache_key)
+    if outcome is not None:
+        return _replay(outcome, request_hash)
+
+    if cache_key in _inflight:
+        outcome = await asyncio.shield(_inflight[cache_key])
+        return _replay(outcome, request_hash)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[cache_key] = future
+    try:
+        if not await _claim(db, scope, key, request_hash):
+            outcome = await _wait_for_outcome(db, scope, key)
+        else:
+            claim = IdempotencyClaim(scope, key)
+            try:
+                body = await handler(claim)
+                outcome = (request_hash, 200, body)
+            except HTTPException as exc:
+                if exc.status_code not in STORED_ERROR_STATUSES:
+                    await _release(db, scope, key)
+                    raise
+                outcome = (request_hash, exc.status_code, {"detail": exc.detail})
+            except BaseException:
+                await _release(db, scope, key)
+                raise
+            if not claim.stored or outcome[1] != 200:
+                if not await _store(db, scope, key, outcome[1], outcome[2]):
+                    outcome = await _wait_for_outcome(db, scope, key)
+            _recent.set(cache_key, outcome)
+            future.set_result(outcome)
+            if outcome[1] >= 400:
+                return _replay(outcome, request_hash)
+            return outcome[2], False
+        future.set_result(outcome)
+        return _replay(outcome, request_hash)
+    except BaseException as exc:
+        if not future.done():
+            future.set_exception(exc)
+            # nobody may be waiting; don't log "exception never retrieved"
+            future.exception()
+        raise
+    finally:
+        _inflight.pop(cache_key, None)
+
+
+async def purge_expired_keys(db: AsyncSession, batch_size: int = 1000) -> int:
+    expired = (
+        select(IdempotencyRecord.id)
+        .where(IdempotencyRecord.expires_at <= datetime.utcnow())
+        .limit(batch_size)
+        .scalar_subquery()
+    )
+    result = await db.execute(delete(IdempotencyRecord).where(IdempotencyRecord.id.in_(expired)))
+    await db.commit()
+    return result.rowcount
@@ -0,0 +1,76 @@
+from decimal import Decimal
+from typing import Iterable
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.ledger import BalanceSnapshot, LedgerAccount, LedgerEntry
+from app.models.wallet import Wallet
+
+
+def transfer_entries(sender_wallet_id, recipient_wallet_id, amount, tx_out_id, tx_in_id) -> list[dict]:
+    amount = Decimal(amount)
+    return [
+        dict(account=LedgerAccount.wallet, wallet_id=sender_wallet_id, transaction_id=tx_out_id, amount=-amount),
+        dict(account=LedgerAccount.wallet, wallet_id=recipient_wallet_id, transaction_id=tx_in_id, amount=amount),
+    ]
+
+
+def deposit_entries(wallet_id, amount, tx_id) -> list[dict]:
+    amount = Decimal(amount)
+    return [
+        dict(account=LedgerAccount.paystack_clearing, wallet_id=None, transaction_id=tx_id, amount=-amount),
+        dict(account=LedgerAccount.wallet, wallet_id=wallet_id, transaction_id=tx_id, amount=amount),
+    ]
+
+
+async def post_entries(db: AsyncSession, rows: list[dict]) -> None:
+    """
+    Append entries in the caller's transaction. Flushes first so pending
+    Transaction rows exist before entries reference them.
+    """
+    if not settings.LEDGER_ENABLED or not rows:
+        return
+    assert sum(row["amount"] for row in rows) == 0, "unbalanced ledger posting"
+    await db.flush()
+    await db.execute(insert(LedgerEntry), rows)
+
+
+def _tail_sum(wallet_col, after_col):
+    return (
+        select(func.coalesce(func.sum(LedgerEntry.amount), 0))
+        .where(
+            LedgerEntry.wallet_id == wallet_col,
+            LedgerEntry.id > func.coalesce(after_col, 0),
+        )
+        .scalar_subquery()
+    )
+
+
+async def ledger_balance(db: AsyncSession, wallet_id) -> Decimal:
+    """Snapshot plus the entries after it: one PK lookup and one short index range."""
+    stmt = (
+        select(func.coalesce(BalanceSnapshot.balance, 0) + _tail_sum(Wallet.id, BalanceSnapshot.last_entry_id))
+        .select_from(Wallet)
+        .outerjoin(BalanceSnapshot, BalanceSnapshot.wallet_id == Wallet.id)
+        .where(Wallet.id == wallet_id)
+    )
+    return Decimal(await db.scalar(stmt) or 0)
+
+
+async def compare_balances(db: AsyncSession, wallet_ids: Iterable) -> list[tuple]:
+    """
+    (wallet_id, Wallet.balance, ledger balance) read in a single statement,
+    so both sides come from the same MVCC snapshot.
+    """
+    stmt = (
+        select(
+            Wallet.id,
+            Wallet.balance,
+            func.coalesce(BalanceSnapshot.balance, 0) + _tail_sum(Wallet.id, BalanceSnapshot.last_entry_id),
+        )
+        .outerjoin(BalanceSnapshot, BalanceSnapshot.wallet_id == Wallet.id)
+        .where(Wallet.id.in_(list(wallet_ids)))
+    )
+    return [tuple(row) for row in await db.execute(stmt)]
@@ -1,18 +1,32 @@
 import hmac
 import hashlib
-import httpx
+import logging
 from fastapi import HTTPException, Request
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from decimal import Decimal
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Optional
+from urllib.parse import quote
 
 from app.core.config import settings
+from app.core.ids import new_reference
+from app.core.http import get_http_client, request_with_retry
 from app.models.wallet import Wallet
-from app.models.transaction import Transaction, TransactionType, TransactionStatus
+from app.models.transaction import Transaction, TransactionReference, TransactionType, TransactionStatus
+from app.services.ledger import deposit_entries, post_entries
+from app.services.wallet_events import balance_event, queue_wallet_events, transaction_event
+from app.services.wallet_stats import record_stats, stats_delta
+
+logger = logging.getLogger(__name__)
+
+
+def _headers() -> dict:
+    return {"Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}"}
 
 
 async def initialize_deposit(
-    db: Session,
+    db: AsyncSession,
     wallet: Wallet,
     amount: int,
     customer_email: str,
@@ -20,19 +34,20 @@ async def initialize_deposit(
     """
     amount is in base unit (e.g. Naira). Paystack expects kobo.
     """
-    reference = f"DEP_{wallet.id.hex}_{int(datetime.utcnow().timestamp())}"
+    reference = new_reference("DEP")
 
     # Create pending transaction
+    now = datetime.utcnow()
     tx = Transaction(
         wallet_id=wallet.id,
         type=TransactionType.deposit,
         status=TransactionStatus.pending,
         amount=Decimal(amount),
         reference=reference,
+        created_at=now,
     )
-    db.add(tx)
-    db.commit()
-    db.refresh(tx)
+    db.add_all([TransactionReference(reference=reference, created_at=now), tx])
+    await db.commit()
 
     payload = {
         "email": customer_email,
@@ -41,10 +56,15 @@ async def initialize_deposit(
         "callback_url": "",  # optional
     }
 
-    headers = {"Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}"}
-
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(f"{settings.PAYSTACK_BASE_URL}/transaction/initialize", json=payload, headers=headers)
+    # Paystack rejects a reused reference, so only retry when the request never left
+    resp = await request_with_retry(
+        get_http_client("paystack"),
+        "POST",
+        f"{settings.PAYSTACK_BASE_URL}/transaction/initialize",
+        idempotent=False,
+        json=payload,
+        headers=_headers(),
+    )
 
     if resp.status_code != 200:
         raise HTTPException(status_code=400, detail="Failed to initialize Paystack transaction")
@@ -53,6 +73,139 @@ async def initialize_deposit(
     return reference, data["authorization_url"]
 
 
+async def verify_transaction(reference: str) -> Optional[dict]:
+    """Paystack's record of a charge, or None if Paystack has never seen the reference."""
+    resp = await request_with_retry(
+        get_http_client("paystack"),
+        "GET",
+        f"{settings.PAYSTACK_BASE_URL}/transaction/verify/{quote(reference, safe='')}",
+        headers=_headers(),
+    )
+    if resp.status_code in (400, 404):  # "Transaction reference not found"
+        return None
+    resp.raise_for_status()
+    return resp.json()["data"]
+
+
+def _paystack_time(value: datetime) -> str:
+    return value.replace(tzinfo=timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+async def list_transactions(
+    start: datetime,
+    end: datetime,
+    page: int = 1,
+    per_page: int = 100,
+) -> tuple[list[dict], int]:
+    """One page of charges created in [start, end] (naive UTC), and the page count."""
+    resp = await request_with_retry(
+        get_http_client("paystack"),
+        "GET",
+        f"{settings.PAYSTACK_BASE_URL}/transaction",
+        params={"from": _paystack_time(start), "to": _paystack_time(end), "page": page, "perPage": per_page},
+        headers=_headers(),
+    )
+    resp.raise_for_status()
+    body = resp.json()
+    return body["data"], (body.get("meta") or {}).get("pageCount") or page
+
+
+async def apply_paystack_charge(
+    db: AsyncSession,
+    reference: str,
+    status_from_ps: str,
+    amount_kobo: int,
+):
+    """
+    Settle a pending deposit from Paystack's view of the charge. Idempotent:
+    the transaction row is locked and a deposit already marked success is
+    never credited twice. Does not commit; returns the credited wallet id
+    (None if nothing was credited) so the caller can invalidate its cached
+    balance and publish_wallet_events once committed.
+    """
+    tx = await db.scalar(
+        select(Transaction).where(Transaction.with_reference(reference)).with_for_update()
+    )
+    if not tx:
+        # Optionally create a record or just ignore
+        raise HTTPException(status_code=404, detail="Transaction not found")
+
+    # Idempotency: if already success, just ack
+    if tx.status == TransactionStatus.success:
+        return None
+
+    # Only credit on success (and maybe on specific event)
+    if status_from_ps != "success":
+        if tx.status != TransactionStatus.failed:
+            # rollups are only written under the wallet's lock (see the stats backfill)
+            await db.execute(select(Wallet.id).where(Wallet.id == tx.wallet_id).with_for_update())
+            tx.status = TransactionStatus.failed
+            await record_stats(db, [stats_delta(tx.wallet_id, tx.created_at, tx.type, tx.status, tx.amount)])
+            await db.flush()
+            queue_wallet_events(db, transaction_event(tx.wallet_id, tx.reference, tx.type, tx.status, tx.amount))
+        return None
+
+    # Paystack must have charged exactly what was asked for; anything else
+    # stays pending for someone to look at rather than being credited
+    paid = Decimal(int(amount_kobo)) / 100
+    if paid != tx.amount:
+        logger.error(
+            "paystack amount mismatch",
+            extra={"reference": tx.reference, "expected": str(tx.amount), "paid": str(paid)},
+        )
+        raise HTTPException(status_code=409, detail="Amount does not match the deposit")
+
+    # Credit wallet atomically
+    wallet = await db.scalar(select(Wallet).where(Wallet.id == tx.wallet_id).with_for_update())
+    if not wallet:
+        raise HTTPException(status_code=404, detail="Wallet not found")
+
+    wallet.balance = wallet.balance + tx.amount
+    await record_stats(db, [
+        stats_delta(wallet.id, tx.created_at, tx.type, TransactionStatus.success, tx.amount),
+        # a deposit given up on can still be paid late
+        stats_delta(wallet.id, tx.created_at, tx.type, tx.status, tx.amount, count=-1)
+        if tx.status == TransactionStatus.failed else None,
+    ])
+    tx.status = TransactionStatus.success
+    await post_entries(db, deposit_entries(wallet.id, tx.amount, tx.id))
+    # flushed first: callers apply inside a savepoint and must not announce a write it rolls back
+    await db.flush()
+    queue_wallet_events(
+        db,
+        transaction_event(wallet.id, tx.reference, tx.type, tx.status, tx.amount),
+        balance_event(wallet.id, wallet.balance),
+    )
+    return wallet.id
+
+
+async def apply_paystack_event(db: AsyncSession, payload: dict):
+    data = payload.get("data", {})
+
+    reference = data.get("reference")
+    status_from_ps = data.get("status")  # "success", "failed", etc.
+    amount_kobo = data.get("amount", 0)
+
+    if not reference:
+        raise HTTPException(status_code=400, detail="Missing reference")
+
+    return await apply_paystack_charge(db, reference, status_from_ps, amount_kobo)
+
+
+def paystack_paid_at(payload: dict) -> Optional[datetime]:
+    """data.paid_at as naive UTC, if Paystack sent one."""
+    paid_at = (payload.get("data") or {}).get("paid_at")
+    if not paid_at:
+        return None
+    try:
+        parsed = datetime.fromisoformat(paid_at)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
 def verify_paystack_signature(request: Request, body: bytes) -> None:
     signature = request.headers.get("x-paystack-signature")
     if not signature:
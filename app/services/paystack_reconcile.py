@@ -0,0 +1,194 @@
+"""
+Settles deposits whose webhook never arrived.
+
+Pending deposits older than PAYSTACK_RECONCILE_MIN_AGE_SECONDS are read in
+batches (oldest first, keyset-paged) and looked up in bulk through Paystack's
+list endpoint for the batch's time window. References missing from the list
+are verified one by one. All Paystack calls run outside any database
+transaction, with at most PAYSTACK_RECONCILE_CONCURRENCY in flight. Outcomes
+are then applied through apply_paystack_charge, the webhook's idempotent
+path, so a webhook racing the reconciler can't credit twice.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import observe_webhook_lag, register_stats
+from app.models.transaction import PENDING_DEPOSIT, Transaction
+from app.services.paystack import apply_paystack_charge, list_transactions, paystack_paid_at, verify_transaction
+from app.services.wallet import invalidate_balances
+from app.services.wallet_events import publish_wallet_events
+
+logger = logging.getLogger(__name__)
+
+# Paystack statuses that settle a deposit either way
+FINAL_STATUSES = {"success", "failed", "reversed"}
+LIST_PAGE_SIZE = 100
+# Paystack stamps its createdAt a moment after our row is written
+LIST_WINDOW_SLACK = timedelta(minutes=5)
+
+reconcile_metrics = {
+    "checked": 0,
+    "credited": 0,
+    "failed": 0,
+    "unresolved": 0,
+    "list_calls": 0,
+    "verify_calls": 0,
+}
+register_stats("paystack_reconcile", lambda: reconcile_metrics)
+
+
+async def pending_deposits(
+    db: AsyncSession,
+    older_than: datetime,
+    after: Optional[tuple[datetime, object]],
+    limit: int,
+) -> list[Transaction]:
+    """Oldest first from ix_transactions_pending_deposits; `after` is the last (created_at, id) seen."""
+    stmt = (
+        select(Transaction)
+        # the index predicate verbatim: bound parameters can't prove a partial
+        # index applies once Postgres switches to a generic plan
+        .where(PENDING_DEPOSIT, Transaction.created_at < older_than)
+        .order_by(Transaction.created_at, Transaction.id)
+        .limit(limit)
+    )
+    if after is not None:
+        created_at, tx_id = after
+        stmt = stmt.where(
+            or_(
+                Transaction.created_at > created_at,
+                and_(Transaction.created_at == created_at, Transaction.id > tx_id),
+            )
+        )
+    return list(await db.scalars(stmt))
+
+
+async def fetch_outcomes(deposits: list[Transaction]) -> dict[str, Optional[dict]]:
+    """
+    reference -> Paystack's charge data (None: Paystack has no such reference).
+    References missing from the result could not be looked up this round.
+    """
+    wanted = {tx.reference for tx in deposits}
+    outcomes: dict[str, Optional[dict]] = {}
+    limiter = asyncio.Semaphore(settings.PAYSTACK_RECONCILE_CONCURRENCY)
+    start = min(tx.created_at for tx in deposits) - LIST_WINDOW_SLACK
+    end = max(tx.created_at for tx in deposits) + LIST_WINDOW_SLACK
+
+    def collect(charges: list[dict]) -> None:
+        for charge in charges:
+            if charge.get("reference") in wanted:
+                outcomes[charge["reference"]] = charge
+
+    async def list_page(page: int) -> tuple[list[dict], int]:
+        async with limiter:
+            reconcile_metrics["list_calls"] += 1
+            return await list_transactions(start, end, page, LIST_PAGE_SIZE)
+
+    async def verify(reference: str) -> None:
+        async with limiter:
+            reconcile_metrics["verify_calls"] += 1
+            try:
+                outcomes[reference] = await verify_transaction(reference)
+            except Exception as exc:
+                logger.warning("paystack verify failed", extra={"reference": reference, "error": repr(exc)})
+
+    try:
+        charges, pages = await list_page(1)
+        collect(charges)
+        # the window also holds charges that settled normally; only page
+        # through it while that costs fewer calls than verifying what's left
+        if 1 < pages <= len(wanted - outcomes.keys()):
+            for charges, _ in await asyncio.gather(*(list_page(p) for p in range(2, pages + 1))):
+                collect(charges)
+    except Exception as exc:
+        logger.warning("paystack list failed", extra={"error": repr(exc)})
+
+    await asyncio.gather(*(verify(reference) for reference in wanted - outcomes.keys()))
+    return outcomes
+
+
+async def apply_outcomes(
+    db: AsyncSession,
+    deposits: list[Transaction],
+    outcomes: dict[str, Optional[dict]],
+    give_up_before: datetime,
+) -> None:
+    credited = []
+    now = datetime.utcnow()
+    for tx in deposits:
+        if tx.reference not in outcomes:
+            reconcile_metrics["unresolved"] += 1
+            continue
+        charge = outcomes[tx.reference] or {}
+        status = charge.get("status")
+        if status not in FINAL_STATUSES:
+            if tx.created_at >= give_up_before:
+                # abandoned checkout (or never initialized): the customer may still pay
+                reconcile_metrics["unresolved"] += 1
+                continue
+            status = "abandoned"
+
+        try:
+            async with db.begin_nested():
+                wallet_id = await apply_paystack_charge(db, tx.reference, status, charge.get("amount", 0))
+        except HTTPException:
+            continue
+        if wallet_id:
+            credited.append(wallet_id)
+            reconcile_metrics["credited"] += 1
+            paid_at = paystack_paid_at({"data": charge})
+            if paid_at:
+                observe_webhook_lag("reconcile", (now - paid_at).total_seconds())
+        elif status != "success":
+            reconcile_metrics["failed"] += 1
+
+    await db.commit()
+    await invalidate_balances(*credited)
+    await publish_wallet_events(db)
+
+
+class DepositReconciler:
+    """Walks the pending deposits one batch per call; the cursor wraps when a pass ends."""
+
+    def __init__(self, session_factory, batch_size: int) -> None:
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.cursor: Optional[tuple[datetime, object]] = None
+
+    async def run_once(self) -> bool:
+        now = datetime.utcnow()
+        async with self.session_factory() as db:
+            deposits = await pending_deposits(
+                db,
+                older_than=now - timedelta(seconds=settings.PAYSTACK_RECONCILE_MIN_AGE_SECONDS),
+                after=self.cursor,
+                limit=self.batch_size,
+            )
+            # detached, so apply_paystack_charge re-reads each row under its
+            # lock; ending the read transaction frees the connection while
+            # Paystack answers
+            db.expunge_all()
+            await db.commit()
+            if not deposits:
+                self.cursor = None
+                return False
+
+            reconcile_metrics["checked"] += len(deposits)
+            outcomes = await fetch_outcomes(deposits)
+            await apply_outcomes(
+                db,
+                deposits,
+                outcomes,
+                give_up_before=now - timedelta(seconds=settings.PAYSTACK_RECONCILE_MAX_AGE_SECONDS),
+            )
+
+        full = len(deposits) == self.batch_size
+        self.cursor = (deposits[-1].created_at, deposits[-1].id) if full else None
+        return full
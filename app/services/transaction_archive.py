@@ -0,0 +1,98 @@
+"""
+Parquet files holding archived months of transactions (zstd-compressed,
+columnar). Rows are sorted by (wallet_id, created_at, id), so a read for one
+wallet skips most row groups on their min/max statistics. pyarrow is only
+imported when an archive is written or read.
+"""
+import json
+import os
+from decimal import Decimal
+from uuid import UUID
+
+from app.models.transaction import Transaction, TransactionStatus, TransactionType
+
+ROW_GROUP_SIZE = 50_000
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as exc:
+        raise RuntimeError("transaction archives require the 'pyarrow' package") from exc
+    return pyarrow, pyarrow.parquet
+
+
+def _schema(pa):
+    return pa.schema([
+        ("id", pa.string()),
+        ("wallet_id", pa.string()),
+        ("type", pa.string()),
+        ("status", pa.string()),
+        ("amount", pa.decimal128(18, 2)),
+        ("reference", pa.string()),
+        ("meta", pa.string()),  # JSON text
+        ("created_at", pa.timestamp("us")),
+        ("updated_at", pa.timestamp("us")),
+    ])
+
+
+class ArchiveWriter:
+    """Appends batches of transactions rows; the file only appears under `path` on close()."""
+
+    def __init__(self, path: str) -> None:
+        pa, pq = _pyarrow()
+        self.pa = pa
+        self.schema = _schema(pa)
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.writer = pq.ParquetWriter(self.tmp_path, self.schema, compression="zstd")
+        self.rows = 0
+
+    def write(self, rows) -> None:
+        columns = {name: [] for name in self.schema.names}
+        for row in rows:
+            columns["id"].append(str(row.id))
+            columns["wallet_id"].append(str(row.wallet_id))
+            columns["type"].append(row.type.value)
+            columns["status"].append(row.status.value)
+            columns["amount"].append(Decimal(row.amount))
+            columns["reference"].append(row.reference)
+            columns["meta"].append(json.dumps(row.meta) if row.meta is not None else None)
+            columns["created_at"].append(row.created_at)
+            columns["updated_at"].append(row.updated_at)
+        self.writer.write_table(self.pa.Table.from_pydict(columns, schema=self.schema), row_group_size=ROW_GROUP_SIZE)
+        self.rows += len(columns["id"])
+
+    def close(self) -> None:
+        self.writer.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self) -> None:
+        self.writer.close()
+        os.remove(self.tmp_path)
+
+
+def read_archive(path: str, filters: list, limit: int) -> list[Transaction]:
+    """
+    The newest `limit` rows matching `filters` (pyarrow DNF: a list of
+    AND-ed lists, OR-ed together), as detached Transaction objects.
+    """
+    _, pq = _pyarrow()
+    table = pq.read_table(path, filters=filters)
+    table = table.sort_by([("created_at", "descending"), ("id", "descending")]).slice(0, limit)
+    return [
+        Transaction(
+            id=UUID(row["id"]),
+            wallet_id=UUID(row["wallet_id"]),
+            type=TransactionType(row["type"]),
+            status=TransactionStatus(row["status"]),
+            amount=row["amount"],
+            reference=row["reference"],
+            meta=json.loads(row["meta"]) if row["meta"] is not None else None,
+            created_at=row["created_at"],
+            updated_at=row["updated_at"],
+        )
+        for row in table.to_pylist()
+    ]
@@ -0,0 +1,176 @@
+import asyncio
+import base64
+import csv
+import io
+import json
+import os
+from datetime import datetime, UTC
+from typing import AsyncIterator, Optional
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import select, Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.replicas import read_session
+from app.models.transaction import Transaction, TransactionType, TransactionStatus
+from app.models.transaction_archive import TransactionArchive
+from app.models.wallet import Wallet
+from app.services.transaction_archive import read_archive
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FIELDS = ["reference", "type", "status", "amount", "created_at"]
+
+
+def encode_cursor(tx: Transaction) -> str:
+    raw = f"{tx.created_at.isoformat()}|{tx.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, tx_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), UUID(tx_id)
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # created_at is stored as naive UTC
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(UTC).replace(tzinfo=None)
+
+
+def history_query(
+    wallet_id,
+    cursor: Optional[str] = None,
+    tx_type: Optional[TransactionType] = None,
+    tx_status: Optional[TransactionStatus] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> Select:
+    """
+    Newest-first history for one wallet. Served from
+    ix_transactions_wallet_created_id; the cursor is the (created_at, id) of
+    the last row already returned, compared as a row value so every page is
+    a single range scan of the index.
+    """
+    stmt = (
+        select(Transaction)
+        .where(Transaction.wallet_id == wallet_id)
+        .order_by(Transaction.created_at.desc(), Transaction.id.desc())
+    )
+    if tx_type is not None:
+        stmt = stmt.where(Transaction.type == tx_type)
+    if tx_status is not None:
+        stmt = stmt.where(Transaction.status == tx_status)
+    if start is not None:
+        stmt = stmt.where(Transaction.created_at >= _naive_utc(start))
+    if end is not None:
+        stmt = stmt.where(Transaction.created_at < _naive_utc(end))
+    if cursor:
+        created_at, tx_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(Transaction.created_at, Transaction.id) < tuple_(created_at, tx_id))
+    return stmt
+
+
+async def archived_history(
+    db: AsyncSession,
+    wallet: Wallet,
+    limit: int,
+    cursor: Optional[str] = None,
+    tx_type: Optional[TransactionType] = None,
+    tx_status: Optional[TransactionStatus] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> list[Transaction]:
+    """
+    Continue a history page into archived months, with the same filters as
+    history_query. Archived months are all older than the live partitions,
+    so call this only once the live query has run out of rows; it costs one
+    small catalog query, and reads files only for months that overlap the
+    range and the wallet's lifetime.
+    """
+    start, end = _naive_utc(start), _naive_utc(end)
+    before = decode_cursor(cursor) if cursor else None
+    # nothing of this wallet's predates the wallet
+    lower = max(start, wallet.created_at) if start is not None else wallet.created_at
+    stmt = (
+        select(TransactionArchive)
+        .where(TransactionArchive.range_end > lower)
+        .order_by(TransactionArchive.range_start.desc())
+    )
+    if end is not None:
+        stmt = stmt.where(TransactionArchive.range_start < end)
+    if before is not None:
+        stmt = stmt.where(TransactionArchive.range_start <= before[0])
+    archives = list(await db.scalars(stmt))
+    if not archives:
+        return []
+
+    common = [("wallet_id", "==", str(wallet.id))]
+    if tx_type is not None:
+        common.append(("type", "==", tx_type.value))
+    if tx_status is not None:
+        common.append(("status", "==", tx_status.value))
+    if start is not None:
+        common.append(("created_at", ">=", start))
+    if end is not None:
+        common.append(("created_at", "<", end))
+    if before is None:
+        filters = [common]
+    else:
+        created_at, tx_id = before
+        filters = [
+            common + [("created_at", "<", created_at)],
+            common + [("created_at", "==", created_at), ("id", "<", str(tx_id))],
+        ]
+
+    txs: list[Transaction] = []
+    for archive in archives:
+        if not os.path.exists(archive.path):
+            raise HTTPException(status_code=503, detail="Archived transactions are not available")
+        txs += await asyncio.to_thread(read_archive, archive.path, filters, limit - len(txs))
+        if len(txs) >= limit:
+            break
+    return txs
+
+
+def _export_row(tx: Transaction) -> dict:
+    return {
+        "reference": tx.reference,
+        "type": tx.type.value,
+        "status": tx.status.value,
+        "amount": str(tx.amount),
+        "created_at": tx.created_at.isoformat(),
+    }
+
+
+async def stream_export(stmt: Select, fmt: str) -> AsyncIterator[str]:
+    """
+    Server-side cursor over the whole history, yield_per rows at a time.
+    Uses its own session so the request's session can be released while the
+    response is still streaming.
+    """
+    async with read_session() as db:
+        result = await db.stream_scalars(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+
+        if fmt == "csv":
+            buf = io.StringIO()
+            writer = csv.DictWriter(buf, fieldnames=EXPORT_FIELDS)
+            writer.writeheader()
+            # sent up front, so an empty history is still a valid CSV
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+            async for partition in result.partitions():
+                for tx in partition:
+                    writer.writerow(_export_row(tx))
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        else:
+            async for partition in result.partitions():
+                yield "".join(json.dumps(_export_row(tx)) + "\n" for tx in partition)
@@ -0,0 +1,153 @@
+"""
+Transfer limits: amount per UTC day, transfers per minute (sliding) and
+distinct recipients per UTC day, for the sender's wallet (TRANSFER_LIMIT_*
+settings) and for the API key making the call (ApiKey.limits, set in
+/keys/create). 0 or unset means no limit.
+
+A transfer reserves its usage on the counters (app.core.limits) before it
+runs and gives the amount back if it fails; attempts still count towards
+the per-minute and recipient limits. A scope's counters for a day are
+hydrated from the database the first time that day they are needed: the
+wallet's amount from wallet_daily_stats, recipients and per-key usage from
+that day's outgoing transfers. A restart forgets at most the last minute
+of the per-minute window.
+"""
+import time
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, func, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.core.config import settings
+from app.core.limits import LimitCheck, LimitCounters, get_limit_counters, utc_day
+from app.core.metrics import register_stats
+from app.models.transaction import Transaction, TransactionType
+from app.models.wallet_stats import WalletDailyStats
+
+LIMIT_NAMES = ("daily_amount", "per_minute", "daily_recipients")
+
+limits_metrics = {
+    "checked": 0,
+    "rejected": 0,
+    "hydrated": 0,
+}
+register_stats("transfer_limits", lambda: limits_metrics)
+
+
+def wallet_limits() -> dict:
+    return {
+        "daily_amount": settings.TRANSFER_LIMIT_DAILY_AMOUNT,
+        "per_minute": settings.TRANSFER_LIMIT_PER_MINUTE,
+        "daily_recipients": settings.TRANSFER_LIMIT_DAILY_RECIPIENTS,
+    }
+
+
+def _check(scope: str, limits: Optional[dict], credits: list) -> Optional[LimitCheck]:
+    limits = {name: int((limits or {}).get(name) or 0) for name in LIMIT_NAMES}
+    if not any(limits.values()):
+        return None
+    return LimitCheck(
+        scope=scope,
+        **limits,
+        amount=sum(amount for _, amount in credits),
+        count=len(credits),
+        recipients=sorted({str(wallet_id) for wallet_id, _ in credits}),
+    )
+
+
+def transfer_meta(api_key) -> Optional[dict]:
+    """Transaction.meta for the sending leg; lets per-key usage be recounted."""
+    return {"api_key_id": str(api_key.id)} if api_key is not None else None
+
+
+async def _outgoing_today(db: AsyncSession, wallet_id, day: date) -> list[tuple]:
+    """(amount, meta, recipient wallet id) for the wallet's transfers created on `day`."""
+    tx_in = aliased(Transaction)
+    since = datetime.combine(day, datetime.min.time())
+    rows = await db.execute(
+        select(Transaction.amount, Transaction.meta, tx_in.wallet_id)
+        # both legs share a reference suffix: TR_OUT_<x> / TR_IN_<x>
+        .join(tx_in, and_(
+            tx_in.reference == literal("TR_IN_") + func.substr(Transaction.reference, 8),
+            # lets Postgres prune tx_in to the day's partition too
+            tx_in.created_at >= since,
+        ))
+        .where(
+            Transaction.wallet_id == wallet_id,
+            Transaction.type == TransactionType.transfer_out,
+            Transaction.created_at >= since,
+        )
+    )
+    return list(rows)
+
+
+async def _usage(db: AsyncSession, check: LimitCheck, wallet_id, day: date, outgoing: list) -> tuple[int, list[str]]:
+    if check.scope.startswith("wallet:"):
+        sent = await db.scalar(
+            select(WalletDailyStats.sent).where(WalletDailyStats.wallet_id == wallet_id, WalletDailyStats.day == day)
+        )
+        recipients = {str(recipient) for _, _, recipient in outgoing}
+        return int(sent or 0), sorted(recipients)
+
+    api_key_id = check.scope.split(":", 1)[1]
+    mine = [
+        (amount, recipient) for amount, meta, recipient in outgoing
+        if (meta or {}).get("api_key_id") == api_key_id
+    ]
+    return int(sum(amount for amount, _ in mine)), sorted({str(recipient) for _, recipient in mine})
+
+
+@dataclass
+class Reservation:
+    counters: LimitCounters
+    checks: list[LimitCheck]
+    day: date
+
+    async def release(self) -> None:
+        await self.counters.release(self.checks, self.day)
+
+
+async def reserve_transfer(db: AsyncSession, sender_wallet_id, credits: list, api_key=None) -> Optional[Reservation]:
+    """
+    Check and take `credits` ([(recipient wallet id, amount)]) against every
+    limit that applies; raises 429 naming the limit that refused. Returns
+    None when no limit applies.
+    """
+    checks = [
+        check for check in (
+            _check(f"wallet:{sender_wallet_id}", wallet_limits(), credits),
+            _check(f"key:{api_key.id}", api_key.limits, credits) if api_key is not None else None,
+        )
+        if check is not None
+    ]
+    if not checks:
+        return None
+
+    limits_metrics["checked"] += 1
+    counters = get_limit_counters()
+    now = time.time()
+    day = utc_day(now)
+    result = await counters.reserve(checks, day, now)
+    if result.unhydrated:
+        # only recipients and per-key usage need the day's transfers; the
+        # wallet's amount is one rollup row
+        scan = any(c.scope.startswith("key:") or c.daily_recipients for c in checks if c.scope in result.unhydrated)
+        outgoing = await _outgoing_today(db, sender_wallet_id, day) if scan else []
+        for check in checks:
+            if check.scope in result.unhydrated:
+                amount, recipients = await _usage(db, check, sender_wallet_id, day, outgoing)
+                await counters.hydrate(check.scope, day, amount, recipients)
+                limits_metrics["hydrated"] += 1
+        result = await counters.reserve(checks, day, now)
+
+    if not result.allowed:
+        limits_metrics["rejected"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Transfer limit exceeded: {result.exceeded or 'unavailable'}",
+        )
+    return Reservation(counters, checks, day)
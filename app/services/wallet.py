@@ -1,80 +1,442 @@
+import asyncio
 import random
-from sqlalchemy.orm import Session
+from sqlalchemy import insert, select
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from decimal import Decimal
 from datetime import datetime
 
 from fastapi import HTTPException, status
 
+from app.core.cache import get_cache
+from app.core.config import settings
+from app.core.ids import ulid_string, uuid7
+from app.core.metrics import register_stats
+from app.db.group_commit import GroupCommitter
+from app.db.replicas import is_replica
+from app.db.session import AsyncSessionLocal
 from app.models.wallet import Wallet
-from app.models.transaction import Transaction, TransactionType, TransactionStatus
+from app.models.transaction import Transaction, TransactionReference, TransactionType, TransactionStatus
+from app.services.id_sequences import allocate_wallet_number
+from app.services.idempotency import IdempotencyClaim
+from app.services.ledger import ledger_balance, post_entries, transfer_entries
+from app.services.transfer_limits import reserve_transfer, transfer_meta
+from app.services.wallet_events import (
+    balance_event,
+    discard_wallet_events,
+    publish_wallet_events,
+    queue_wallet_events,
+    transaction_event,
+)
+from app.services.wallet_stats import record_stats, stats_delta
 
+RETRYABLE_SQLSTATES = {"40001", "40P01"}
 
-def generate_wallet_number() -> str:
-    return "".join([str(random.randint(0, 9)) for _ in range(12)])
 
+async def add_wallet(db: AsyncSession, user_id, wallet_number: str | None = None) -> Wallet:
+    """
+    Insert a wallet with a freshly allocated number, inside a savepoint. The
+    caller commits. Allocated numbers never repeat, but numbers issued by the
+    old random generator can still occupy one, so a clash just takes the next.
+    Callers that have already written in this transaction should allocate
+    wallet_number up front: a block refill commits on its own connection.
+    """
+    for _ in range(3):
+        wallet = Wallet(user_id=user_id, wallet_number=wallet_number or await allocate_wallet_number())
+        wallet_number = None
+        try:
+            async with db.begin_nested():
+                db.add(wallet)
+            return wallet
+        except IntegrityError:
+            # or a concurrent request created this user's wallet first
+            existing = await db.scalar(select(Wallet).where(Wallet.user_id == user_id))
+            if existing:
+                return existing
+    raise HTTPException(status_code=500, detail="Could not allocate a wallet number")
 
-def get_or_create_wallet_for_user(db: Session, user_id) -> Wallet:
-    wallet = db.query(Wallet).filter(Wallet.user_id == user_id).first()
+
+async def get_or_create_wallet_for_user(db: AsyncSession, user_id) -> Wallet:
+    wallet = await db.scalar(select(Wallet).where(Wallet.user_id == user_id))
     if wallet:
         return wallet
-    from app.services.wallet import generate_wallet_number
-    wallet = Wallet(user_id=user_id, wallet_number=generate_wallet_number())
-    db.add(wallet)
-    db.commit()
-    db.refresh(wallet)
+    wallet = await add_wallet(db, user_id)
+    await db.commit()
     return wallet
 
 
-def get_wallet_balance(db: Session, wallet: Wallet) -> int:
-    # we store Numeric; convert to int
-    return int(wallet.balance)
+def _balance_key(wallet_id) -> str:
+    return f"wallet:balance:{wallet_id}"
+
+
+async def wallet_id_for_user(db: AsyncSession, user_id):
+    # a user's wallet never changes, so this mapping can be cached for long
+    cache = get_cache()
+    key = f"wallet:user:{user_id}"
+    wallet_id = await cache.get(key)
+    if wallet_id is None:
+        wallet_id = await db.scalar(select(Wallet.id).where(Wallet.user_id == user_id))
+        if wallet_id is not None:
+            await cache.set(key, wallet_id, ttl=settings.WALLET_LOOKUP_CACHE_TTL_SECONDS)
+    return wallet_id
+
+
+async def resolve_wallet_id(db: AsyncSession, wallet_number: str):
+    cache = get_cache()
+    key = f"wallet:number:{wallet_number}"
+    wallet_id = await cache.get(key)
+    if wallet_id is None:
+        wallet_id = await db.scalar(select(Wallet.id).where(Wallet.wallet_number == wallet_number))
+        if wallet_id is not None:
+            await cache.set(key, wallet_id, ttl=settings.WALLET_LOOKUP_CACHE_TTL_SECONDS)
+    return wallet_id
+
+
+def _written_key(wallet_id) -> str:
+    return f"wallet:written:{wallet_id}"
+
+
+async def invalidate_balances(*wallet_ids) -> None:
+    """Call after committing a balance change; evicts the balance on every node."""
+    wallet_ids = set(wallet_ids)
+    cache = get_cache()
+    await cache.delete(*(_balance_key(wallet_id) for wallet_id in wallet_ids))
+    if settings.DATABASE_REPLICA_URLS:
+        # replicas may not have replayed this write yet: read these wallets from
+        # the primary until any usable replica must have caught up
+        ttl = settings.REPLICA_MAX_LAG_SECONDS + settings.REPLICA_CHECK_INTERVAL_SECONDS
+        for wallet_id in wallet_ids:
+            await cache.set(_written_key(wallet_id), True, ttl=ttl)
+
+
+async def get_wallet_balance(db: AsyncSession, wallet_id) -> int:
+    cache = get_cache()
+    balance = await cache.get(_balance_key(wallet_id))
+    if balance is not None:
+        return balance
+
+    if is_replica(db) and await cache.get(_written_key(wallet_id)):
+        async with AsyncSessionLocal() as primary:
+            return await get_wallet_balance(primary, wallet_id)
+
+    if settings.LEDGER_ENABLED:
+        balance = int(await ledger_balance(db, wallet_id))
+    else:
+        # we store Numeric; convert to int
+        balance = int(await db.scalar(select(Wallet.balance).where(Wallet.id == wallet_id)))
+
+    await cache.set(_balance_key(wallet_id), balance, ttl=settings.BALANCE_CACHE_TTL_SECONDS)
+    return balance
+
+
+def _is_retryable(exc: DBAPIError) -> bool:
+    # serialization_failure / deadlock_detected: safe to replay the whole transaction
+    code = getattr(exc.orig, "sqlstate", None) or getattr(exc.orig, "pgcode", None)
+    return code in RETRYABLE_SQLSTATES
+
 
+def _retry_delay(attempt: int) -> float:
+    base = settings.TRANSFER_RETRY_BACKOFF_SECONDS * (2 ** attempt)
+    return min(base, 1.0) * random.uniform(0.5, 1.5)
 
-def perform_transfer(
-    db: Session,
-    sender_wallet: Wallet,
-    recipient_wallet: Wallet,
+
+async def lock_wallets(db: AsyncSession, wallet_ids) -> dict:
+    """
+    SELECT ... FOR UPDATE in Wallet.id order, so two transfers touching the
+    same pair of wallets always queue on the same row first and cannot deadlock.
+    populate_existing refreshes rows the caller may already hold unlocked.
+    """
+    wallets = await db.scalars(
+        select(Wallet)
+        .where(Wallet.id.in_(set(wallet_ids)))
+        .order_by(Wallet.id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    return {w.id: w for w in wallets}
+
+
+class _Postings:
+    """
+    Audit rows, ledger entries, rollups and events for transfers between
+    locked wallets, written with one executemany per table instead of a
+    unit-of-work flush per Transaction object, plus the idempotency outcome
+    of each transfer that has one.
+    """
+
+    def __init__(self) -> None:
+        self.now = datetime.utcnow()
+        self.rows: list[dict] = []
+        self.entries: list[dict] = []
+        self.events: list = []
+        self.wallets: dict = {}
+        self.outcomes: list[tuple[IdempotencyClaim, dict]] = []
+
+    def transfer(
+        self, sender_wallet: Wallet, recipient_wallet: Wallet, amount: int, meta=None, outcome=None
+    ) -> str:
+        """Move `amount` and stage both legs; returns the transfer_out reference."""
+        sender_wallet.balance = sender_wallet.balance - amount
+        recipient_wallet.balance = recipient_wallet.balance + amount
+        self.wallets[sender_wallet.id] = sender_wallet
+        self.wallets[recipient_wallet.id] = recipient_wallet
+
+        # both legs share one time-ordered reference suffix
+        suffix = ulid_string(uuid7())
+        out_id, in_id = uuid7(), uuid7()
+        for tx_id, wallet_id, tx_type, reference, tx_meta in (
+            (out_id, sender_wallet.id, TransactionType.transfer_out, f"TR_OUT_{suffix}", meta),
+            (in_id, recipient_wallet.id, TransactionType.transfer_in, f"TR_IN_{suffix}", None),
+        ):
+            self.rows.append(dict(
+                id=tx_id,
+                wallet_id=wallet_id,
+                type=tx_type,
+                status=TransactionStatus.success,
+                amount=Decimal(amount),
+                reference=reference,
+                meta=tx_meta,
+                created_at=self.now,
+            ))
+            self.events.append(transaction_event(wallet_id, reference, tx_type, TransactionStatus.success, amount))
+        self.entries.extend(transfer_entries(sender_wallet.id, recipient_wallet.id, amount, out_id, in_id))
+        if outcome is not None:
+            self.outcomes.append(outcome)
+        return f"TR_OUT_{suffix}"
+
+    async def write(self, db: AsyncSession) -> None:
+        if not self.rows:
+            return
+        await db.execute(
+            insert(TransactionReference), [dict(reference=row["reference"], created_at=self.now) for row in self.rows]
+        )
+        await db.execute(insert(Transaction), self.rows)
+        await post_entries(db, self.entries)
+        await record_stats(db, (
+            stats_delta(row["wallet_id"], self.now, row["type"], row["status"], row["amount"]) for row in self.rows
+        ))
+        for claim, body in self.outcomes:
+            await claim.store(db, body)
+        # one balance event per wallet, with its balance after every transfer
+        queue_wallet_events(
+            db, *self.events, *(balance_event(wallet.id, wallet.balance) for wallet in self.wallets.values())
+        )
+
+
+async def _apply_transfer(
+    db: AsyncSession, sender_wallet_id, recipient_wallet_id, amount: int, meta=None, outcome=None
+) -> None:
+    wallets = await lock_wallets(db, [sender_wallet_id, recipient_wallet_id])
+    sender_wallet = wallets.get(sender_wallet_id)
+    recipient_wallet = wallets.get(recipient_wallet_id)
+    if not sender_wallet or not recipient_wallet:
+        raise HTTPException(status_code=404, detail="Wallet not found")
+
+    if sender_wallet.balance < amount:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Insufficient balance",
+        )
+
+    postings = _Postings()
+    postings.transfer(sender_wallet, recipient_wallet, amount, meta, outcome)
+    await postings.write(db)
+
+
+async def _run_transfer(db: AsyncSession, apply, *args):
+    """
+    Run apply(db, *args) and commit, replaying the whole transaction on
+    serialization failures / deadlocks.
+    """
+    for attempt in range(settings.TRANSFER_MAX_RETRIES + 1):
+        try:
+            result = await apply(db, *args)
+            await db.commit()
+            return result
+        except HTTPException:
+            await db.rollback()
+            discard_wallet_events(db)
+            raise
+        except DBAPIError as exc:
+            await db.rollback()
+            discard_wallet_events(db)
+            if isinstance(exc, IntegrityError) or not _is_retryable(exc):
+                raise HTTPException(status_code=500, detail="Transfer failed")
+            if attempt == settings.TRANSFER_MAX_RETRIES:
+                raise HTTPException(status_code=503, detail="Transfer conflicted, please retry")
+            await asyncio.sleep(_retry_delay(attempt))
+
+
+async def _apply_transfer_group(db: AsyncSession, transfers: list[tuple]) -> list:
+    """
+    Independent single transfers in one transaction: every wallet is locked
+    once, in id order, and a transfer that cannot apply gets its error as
+    its outcome without touching the others.
+    """
+    wallets = await lock_wallets(db, [
+        wallet_id for sender_wallet_id, recipient_wallet_id, *_ in transfers
+        for wallet_id in (sender_wallet_id, recipient_wallet_id)
+    ])
+    postings = _Postings()
+    outcomes = []
+    for sender_wallet_id, recipient_wallet_id, amount, meta, outcome in transfers:
+        sender_wallet = wallets.get(sender_wallet_id)
+        recipient_wallet = wallets.get(recipient_wallet_id)
+        if not sender_wallet or not recipient_wallet:
+            outcomes.append(HTTPException(status_code=404, detail="Wallet not found"))
+        elif sender_wallet.balance < amount:
+            outcomes.append(HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient balance"))
+        else:
+            postings.transfer(sender_wallet, recipient_wallet, amount, meta, outcome)
+            outcomes.append(None)
+    await postings.write(db)
+    return outcomes
+
+
+async def _commit_transfer_group(transfers: list[tuple]) -> list:
+    async with AsyncSessionLocal() as db:
+        try:
+            outcomes = await _run_transfer(db, _apply_transfer_group, transfers)
+            await publish_wallet_events(db)
+        except HTTPException as exc:
+            if len(transfers) == 1:
+                return [exc]
+            # the group as a whole failed (an integrity error, say): commit
+            # each on its own so only the culprit's caller sees it
+            outcomes = []
+            for transfer in transfers:
+                try:
+                    outcomes.append(await _run_transfer(db, _apply_transfer, *transfer))
+                except HTTPException as item_exc:
+                    outcomes.append(item_exc)
+                await publish_wallet_events(db)
+    await invalidate_balances(*(
+        wallet_id for (sender_wallet_id, recipient_wallet_id, *_), outcome in zip(transfers, outcomes)
+        if outcome is None for wallet_id in (sender_wallet_id, recipient_wallet_id)
+    ))
+    return outcomes
+
+
+_committer: GroupCommitter | None = None
+register_stats("transfer_group_commit", lambda: _committer.stats() if _committer is not None else {})
+
+
+def _transfer_committer() -> GroupCommitter | None:
+    global _committer
+    if settings.TRANSFER_GROUP_COMMIT_MS <= 0:
+        return None
+    if _committer is None:
+        _committer = GroupCommitter(
+            _commit_transfer_group,
+            window=settings.TRANSFER_GROUP_COMMIT_MS / 1000,
+            max_size=settings.TRANSFER_GROUP_COMMIT_MAX,
+        )
+    return _committer
+
+
+async def perform_transfer(
+    db: AsyncSession,
+    sender_wallet_id,
+    recipient_wallet_id,
     amount: int,
+    api_key=None,
+    outcome: tuple[IdempotencyClaim, dict] | None = None,
 ):
+    """
+    api_key: the key making the call, if any; its limits apply on top of the
+    wallet's. outcome: an idempotency claim and the response to store for
+    it, written in the transaction that commits the transfer.
+    """
     if amount <= 0:
         raise HTTPException(status_code=400, detail="Amount must be > 0")
 
-    if sender_wallet.id == recipient_wallet.id:
+    if sender_wallet_id == recipient_wallet_id:
         raise HTTPException(status_code=400, detail="Cannot transfer to self")
 
-    if sender_wallet.balance < amount:
+    reservation = await reserve_transfer(db, sender_wallet_id, [(recipient_wallet_id, amount)], api_key)
+    transfer = (sender_wallet_id, recipient_wallet_id, amount, transfer_meta(api_key), outcome)
+    committer = _transfer_committer()
+    try:
+        if committer is None:
+            await _run_transfer(db, _apply_transfer, *transfer)
+        else:
+            # commits, invalidates and publishes on the group's own session
+            await committer.submit(transfer)
+    except BaseException as exc:
+        # a grouped transfer only gets here without committing if it failed
+        # (HTTPException) or never left the queue (cancelled); an interrupted
+        # group may have committed, so it keeps its reservation
+        if reservation is not None and (
+            committer is None or isinstance(exc, (HTTPException, asyncio.CancelledError))
+        ):
+            await reservation.release()
+        raise
+    if committer is None:
+        await invalidate_balances(sender_wallet_id, recipient_wallet_id)
+        await publish_wallet_events(db)
+
+
+async def _apply_batch_transfer(db: AsyncSession, sender_wallet_id, credits: list, meta=None) -> list[dict]:
+    wallets = await lock_wallets(db, [sender_wallet_id, *(wallet_id for wallet_id, _ in credits)])
+    sender_wallet = wallets.get(sender_wallet_id)
+    if not sender_wallet:
+        raise HTTPException(status_code=404, detail="Wallet not found")
+
+    total = sum(amount for _, amount in credits)
+    if sender_wallet.balance < total:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Insufficient balance",
         )
 
-    # Atomic operation
-    from sqlalchemy.exc import IntegrityError
+    postings = _Postings()
+    results = []
+    for recipient_wallet_id, amount in credits:
+        recipient_wallet = wallets[recipient_wallet_id]
+        results.append({
+            "wallet_number": recipient_wallet.wallet_number,
+            "amount": amount,
+            "status": "success",
+            "reference": postings.transfer(sender_wallet, recipient_wallet, amount, meta),
+        })
+    await postings.write(db)
+    return results
 
-    try:
-        # pessimistic, still simple: rely on single transaction
-        sender_wallet.balance = sender_wallet.balance - amount
-        recipient_wallet.balance = recipient_wallet.balance + amount
 
-        # create transactions
-        tx_out = Transaction(
-            wallet_id=sender_wallet.id,
-            type=TransactionType.transfer_out,
-            status=TransactionStatus.success,
-            amount=Decimal(amount),
-            reference=f"TR_OUT_{sender_wallet.id.hex}_{datetime.utcnow().timestamp()}",
-        )
-        tx_in = Transaction(
-            wallet_id=recipient_wallet.id,
-            type=TransactionType.transfer_in,
-            status=TransactionStatus.success,
-            amount=Decimal(amount),
-            reference=f"TR_IN_{recipient_wallet.id.hex}_{datetime.utcnow().timestamp()}",
-        )
+async def perform_batch_transfer(
+    db: AsyncSession,
+    sender_wallet_id,
+    items: list[tuple[str, int]],
+    api_key=None,
+) -> list[dict]:
+    """
+    One debit, many credits, all-or-nothing: recipients are resolved with a
+    single IN query, every wallet is locked once and the batch commits once.
+    """
+    if not items:
+        raise HTTPException(status_code=400, detail="No transfers given")
+    if any(amount <= 0 for _, amount in items):
+        raise HTTPException(status_code=400, detail="Amount must be > 0")
 
-        db.add(tx_out)
-        db.add(tx_in)
-        db.commit()
-    except IntegrityError:
-        db.rollback()
-        raise HTTPException(status_code=500, detail="Transfer failed")
\ No newline at end of file
+    numbers = {number for number, _ in items}
+    recipients = await db.scalars(select(Wallet).where(Wallet.wallet_number.in_(numbers)))
+    by_number = {w.wallet_number: w for w in recipients}
+
+    missing = sorted(numbers - by_number.keys())
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Recipient wallet not found: {', '.join(missing)}")
+    if any(w.id == sender_wallet_id for w in by_number.values()):
+        raise HTTPException(status_code=400, detail="Cannot transfer to self")
+
+    # plain ids: a retry rolls back and expires the loaded rows
+    credits = [(by_number[number].id, amount) for number, amount in items]
+    reservation = await reserve_transfer(db, sender_wallet_id, credits, api_key)
+    try:
+        results = await _run_transfer(db, _apply_batch_transfer, sender_wallet_id, credits, transfer_meta(api_key))
+    except BaseException:
+        if reservation is not None:
+            await reservation.release()
+        raise
+    await invalidate_balances(sender_wallet_id, *(wallet_id for wallet_id, _ in credits))
+    await publish_wallet_events(db)
+    return results
@@ -0,0 +1,66 @@
+"""
+Wallet events for GET /wallet/events. Writers queue them on the session while
+the transaction is open and publish them once it has committed, so clients
+never see a change that was rolled back.
+"""
+import json
+from typing import AsyncIterator
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.events import Subscription, get_event_hub
+
+_PENDING = "wallet_events"
+
+
+def balance_event(wallet_id, balance) -> tuple[str, dict]:
+    return str(wallet_id), {"type": "balance", "balance": int(balance)}
+
+
+def transaction_event(wallet_id, reference: str, tx_type, tx_status, amount) -> tuple[str, dict]:
+    return str(wallet_id), {
+        "type": "transaction",
+        "reference": reference,
+        "tx_type": tx_type.value,
+        "status": tx_status.value,
+        "amount": int(amount),
+    }
+
+
+def queue_wallet_events(db: AsyncSession, *events: tuple[str, dict]) -> None:
+    db.info.setdefault(_PENDING, []).extend(events)
+
+
+def discard_wallet_events(db: AsyncSession) -> None:
+    db.info.pop(_PENDING, None)
+
+
+async def publish_wallet_events(db: AsyncSession) -> None:
+    """Call after committing."""
+    events = db.info.pop(_PENDING, None)
+    if events:
+        await get_event_hub().publish(events)
+
+
+def subscribe_wallet(wallet_id) -> Subscription:
+    return get_event_hub().subscribe(str(wallet_id))
+
+
+def _sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def stream_wallet_events(subscription: Subscription, balance: int) -> AsyncIterator[str]:
+    """
+    Server-sent events: the balance snapshot, then whatever the hub delivers.
+    The subscription is taken before the snapshot is read, so no change can
+    fall between the two. Comment lines keep idle proxies from closing it.
+    """
+    try:
+        yield _sse({"type": "balance", "balance": balance})
+        while True:
+            event = await subscription.get(settings.EVENTS_HEARTBEAT_SECONDS)
+            yield _sse(event) if event is not None else ": keepalive\n\n"
+    finally:
+        subscription.close()
@@ -0,0 +1,89 @@
+"""
+Per-wallet daily rollups (wallet_daily_stats). Writers add their deltas in
+the transaction that settles the money, while holding the wallet's row lock,
+so a range query reads one row per active day instead of every transaction.
+`python -m app.workers.wallet_stats backfill` rebuilds them from transactions.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterable, Literal, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.upsert import dialect_insert
+from app.models.transaction import TransactionStatus, TransactionType
+from app.models.wallet_stats import WalletDailyStats
+
+# (type, status) a transaction is counted under -> (amount column, count column)
+STAT_COLUMNS = {
+    (TransactionType.deposit, TransactionStatus.success): ("deposited", "deposit_count"),
+    (TransactionType.transfer_out, TransactionStatus.success): ("sent", "sent_count"),
+    (TransactionType.transfer_in, TransactionStatus.success): ("received", "received_count"),
+    (TransactionType.deposit, TransactionStatus.failed): ("failed", "failed_count"),
+}
+COUNTERS = [column for pair in STAT_COLUMNS.values() for column in pair]
+
+
+def stats_delta(wallet_id, created_at: datetime, tx_type, tx_status, amount, count: int = 1) -> Optional[tuple]:
+    """What one transaction adds to its day; count=-1 takes it back out."""
+    columns = STAT_COLUMNS.get((tx_type, tx_status))
+    if columns is None:
+        return None
+    return wallet_id, created_at.date(), columns, Decimal(amount) * count, count
+
+
+async def record_stats(db: AsyncSession, deltas: Iterable[Optional[tuple]]) -> None:
+    """Upsert the deltas in the caller's transaction: one statement, one row per wallet and day."""
+    rows: dict[tuple, dict] = {}
+    for delta in deltas:
+        if delta is None:
+            continue
+        wallet_id, day, (amount_column, count_column), amount, count = delta
+        row = rows.get((wallet_id, day))
+        if row is None:
+            row = rows[(wallet_id, day)] = dict(wallet_id=wallet_id, day=day, **dict.fromkeys(COUNTERS, 0))
+        row[amount_column] += amount
+        row[count_column] += count
+    if not rows:
+        return
+
+    # in wallet id order, like the wallet locks, so concurrent upserts queue the same way
+    stmt = dialect_insert(db, WalletDailyStats).values([rows[key] for key in sorted(rows)])
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=["wallet_id", "day"],
+        set_={
+            **{column: getattr(WalletDailyStats, column) + stmt.excluded[column] for column in COUNTERS},
+            "updated_at": datetime.utcnow(),
+        },
+    ))
+
+
+async def daily_stats(db: AsyncSession, wallet_id, start: date, end: date) -> list[WalletDailyStats]:
+    """Rollup rows for [start, end]: a primary key range scan, one row per day with activity."""
+    return list(await db.scalars(
+        select(WalletDailyStats)
+        .where(
+            WalletDailyStats.wallet_id == wallet_id,
+            WalletDailyStats.day >= start,
+            WalletDailyStats.day <= end,
+        )
+        .order_by(WalletDailyStats.day)
+    ))
+
+
+def summarize(rows: list[WalletDailyStats], group_by: Literal["day", "month", "total"]) -> tuple[dict, list[dict]]:
+    """(totals, periods) with integer amounts; periods are keyed by their first day."""
+    totals = dict.fromkeys(COUNTERS, 0)
+    periods: dict[date, dict] = {}
+    for row in rows:
+        values = {column: int(getattr(row, column)) for column in COUNTERS}
+        for column, value in values.items():
+            totals[column] += value
+        if group_by == "total":
+            continue
+        start = row.day if group_by == "day" else row.day.replace(day=1)
+        period = periods.setdefault(start, dict(start=start, **dict.fromkeys(COUNTERS, 0)))
+        for column, value in values.items():
+            period[column] += value
+    return totals, list(periods.values())
@@ -0,0 +1,147 @@
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import and_, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import observe_webhook_lag, register_stats
+from app.db.upsert import dialect_insert
+from app.models.paystack_event import PaystackEvent, PaystackEventStatus
+from app.models.transaction import Transaction, TransactionReference
+from app.services.paystack import apply_paystack_event
+from app.services.wallet import invalidate_balances, lock_wallets
+from app.services.wallet_events import publish_wallet_events
+
+# depth and lag are refreshed by the inbox workers once per poll interval
+inbox_metrics = {
+    "depth": 0,
+    "lag_seconds": 0.0,
+    "processed": 0,
+    "failed": 0,
+    "retried": 0,
+}
+register_stats("paystack_inbox", lambda: inbox_metrics)
+
+
+def paystack_event_key(payload: dict) -> str:
+    data = payload.get("data") or {}
+    return f"{payload.get('event')}:{data.get('reference') or data.get('id')}"
+
+
+async def enqueue_paystack_event(db: AsyncSession, payload: dict) -> None:
+    """
+    Persist a verified webhook and return; Paystack retries of the same
+    event collapse onto the existing row.
+    """
+    data = payload.get("data") or {}
+    if not data.get("reference"):
+        raise HTTPException(status_code=400, detail="Missing reference")
+
+    stmt = (
+        dialect_insert(db, PaystackEvent)
+        .values(
+            event_key=paystack_event_key(payload),
+            event=payload.get("event"),
+            reference=data.get("reference"),
+            payload=payload,
+        )
+        .on_conflict_do_nothing(index_elements=["event_key"])
+    )
+    await db.execute(stmt)
+    await db.commit()
+
+
+def _retry_at(attempts: int) -> datetime:
+    return datetime.utcnow() + timedelta(seconds=min(2 ** attempts, 300))
+
+
+async def _lock_batch(db: AsyncSession, events: list[PaystackEvent]) -> None:
+    """
+    Take every lock the batch will need up front: the deposits by reference,
+    then their wallets in Wallet.id order, as transfers take them. Locks are
+    held until the batch commits, so taking them event by event could hold
+    one wallet while waiting on another that a transfer holds.
+    """
+    references = sorted({
+        (event.payload.get("data") or {}).get("reference") for event in events
+    } - {None})
+    if not references:
+        return
+    wallet_ids = await db.scalars(
+        select(Transaction.wallet_id)
+        .join(TransactionReference, and_(
+            TransactionReference.reference == Transaction.reference,
+            TransactionReference.created_at == Transaction.created_at,
+        ))
+        .where(TransactionReference.reference.in_(references))
+        .order_by(Transaction.reference)
+        .with_for_update(of=Transaction)
+    )
+    await lock_wallets(db, list(wallet_ids))
+
+
+async def process_inbox_batch(db: AsyncSession, batch_size: int) -> int:
+    """
+    Claim up to batch_size due events with FOR UPDATE SKIP LOCKED, so any
+    number of workers across machines can drain the inbox without blocking
+    each other, lock what they credit (_lock_batch), apply each in its own
+    savepoint and commit once.
+    """
+    now = datetime.utcnow()
+    events = list(await db.scalars(
+        select(PaystackEvent)
+        .where(
+            PaystackEvent.status == PaystackEventStatus.pending,
+            PaystackEvent.available_at <= now,
+        )
+        .order_by(PaystackEvent.available_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ))
+    await _lock_batch(db, events)
+
+    credited = []
+    for event in events:
+        event.attempts += 1
+        try:
+            async with db.begin_nested():
+                wallet_id = await apply_paystack_event(db, event.payload)
+        except HTTPException as exc:
+            # 4xx: the event can never apply (unknown reference etc.)
+            event.status = PaystackEventStatus.failed
+            event.last_error = str(exc.detail)[:512]
+            inbox_metrics["failed"] += 1
+            continue
+        except Exception as exc:
+            event.last_error = repr(exc)[:512]
+            if event.attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+                event.status = PaystackEventStatus.failed
+                inbox_metrics["failed"] += 1
+            else:
+                event.available_at = _retry_at(event.attempts)
+                inbox_metrics["retried"] += 1
+            continue
+
+        event.status = PaystackEventStatus.processed
+        event.processed_at = datetime.utcnow()
+        inbox_metrics["processed"] += 1
+        observe_webhook_lag("queue", (event.processed_at - event.received_at).total_seconds())
+        if wallet_id:
+            credited.append(wallet_id)
+
+    await db.commit()
+    await invalidate_balances(*credited)
+    await publish_wallet_events(db)
+    return len(events)
+
+
+async def get_inbox_stats(db: AsyncSession) -> dict:
+    depth, oldest = (await db.execute(
+        select(func.count(), func.min(PaystackEvent.received_at))
+        .where(PaystackEvent.status == PaystackEventStatus.pending)
+    )).one()
+    lag = (datetime.utcnow() - oldest).total_seconds() if oldest else 0.0
+    inbox_metrics["depth"] = depth
+    inbox_metrics["lag_seconds"] = lag
+    return {"depth": depth, "lag_seconds": lag}
@@ -0,0 +1,17 @@
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.services.api_keys import expire_api_keys
+from app.workers.base import BackgroundWorker
+
+
+async def sweep_expired_keys() -> int:
+    async with AsyncSessionLocal() as db:
+        return await expire_api_keys(db, settings.API_KEY_SWEEP_BATCH_SIZE)
+
+
+def build_api_key_sweeper() -> BackgroundWorker:
+    return BackgroundWorker(
+        name="api-key-expiry",
+        job=sweep_expired_keys,
+        interval=settings.API_KEY_SWEEP_INTERVAL_SECONDS,
+    )
@@ -0,0 +1,52 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundWorker:
+    """
+    Runs `job` in a loop on `concurrency` asyncio tasks. A job returns a
+    truthy value when it did work and is called again straight away;
+    otherwise the task sleeps `interval` seconds before polling again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        job: Callable[[], Awaitable[object]],
+        interval: float,
+        concurrency: int = 1,
+    ) -> None:
+        self.name = name
+        self.job = job
+        self.interval = interval
+        self.concurrency = concurrency
+        self._tasks: list[asyncio.Task] = []
+        self._stopping = asyncio.Event()
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                did_work = await self.job()
+            except Exception:
+                logger.exception("background worker %s failed", self.name)
+                did_work = False
+            if not did_work:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def start(self) -> None:
+        self._stopping.clear()
+        self._tasks = [
+            asyncio.create_task(self._run(), name=f"{self.name}-{i}")
+            for i in range(self.concurrency)
+        ]
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
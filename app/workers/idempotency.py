@@ -0,0 +1,17 @@
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.services.idempotency import purge_expired_keys
+from app.workers.base import BackgroundWorker
+
+
+async def sweep_idempotency_keys() -> int:
+    async with AsyncSessionLocal() as db:
+        return await purge_expired_keys(db)
+
+
+def build_idempotency_sweeper() -> BackgroundWorker:
+    return BackgroundWorker(
+        name="idempotency-sweeper",
+        job=sweep_idempotency_keys,
+        interval=settings.IDEMPOTENCY_SWEEP_INTERVAL_SECONDS,
+    )
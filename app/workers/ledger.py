@@ -0,0 +1,232 @@
+"""
+Incremental ledger jobs.
+
+Both jobs walk ledger_entries by id from their own checkpoint, so each run
+costs O(new entries) regardless of how large the ledger has grown:
+
+- snapshot: folds new entries into balance_snapshots
+- reconcile: compares Wallet.balance with the ledger for wallets touched
+  since the last run and logs any drift
+
+    python -m app.workers.ledger open-balances   # once, when turning LEDGER_ENABLED on
+    python -m app.workers.ledger snapshot
+    python -m app.workers.ledger reconcile
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+
+from sqlalchemy import exists, func, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import register_stats
+from app.db.session import AsyncSessionLocal
+from app.db.upsert import dialect_insert
+from app.models.ledger import BalanceSnapshot, LedgerAccount, LedgerCheckpoint, LedgerEntry
+from app.models.wallet import Wallet
+from app.services.ledger import compare_balances
+from app.workers.base import BackgroundWorker
+
+logger = logging.getLogger(__name__)
+
+ledger_metrics = {
+    "snapshot_entry_id": 0,
+    "reconciled_entry_id": 0,
+    "drift_wallets": 0,
+}
+register_stats("ledger", lambda: ledger_metrics)
+
+WATERMARK_POLL_SECONDS = 0.05
+
+
+async def _lock_checkpoint(db: AsyncSession, name: str) -> LedgerCheckpoint:
+    # the row lock also keeps two machines from running the same job at once
+    await db.execute(
+        dialect_insert(db, LedgerCheckpoint)
+        .values(name=name, last_entry_id=0)
+        .on_conflict_do_nothing(index_elements=["name"])
+    )
+    return await db.scalar(
+        select(LedgerCheckpoint).where(LedgerCheckpoint.name == name).with_for_update()
+    )
+
+
+async def _committed_watermark(db: AsyncSession) -> int | None:
+    """
+    The highest entry id at or below which every entry has committed or
+    rolled back, or None if that could not be settled in time. Ids come
+    from a sequence when the row is inserted, so an entry can commit after
+    one with a higher id is already visible. Ending the read transaction
+    first keeps this job from waiting on itself.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        # one writer at a time: whatever is visible is final
+        return await db.scalar(select(func.max(LedgerEntry.id)))
+    xmax, upper = (await db.execute(text(
+        "SELECT pg_snapshot_xmax(pg_current_snapshot())::text::bigint, (SELECT max(id) FROM ledger_entries)"
+    ))).one()
+    await db.commit()
+    # every entry visible now got its id before this snapshot, so once every
+    # transaction older than its xmax has finished, nothing below `upper` can appear
+    deadline = asyncio.get_running_loop().time() + settings.LEDGER_WATERMARK_TIMEOUT_SECONDS
+    while await db.scalar(text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")) < xmax:
+        await db.commit()
+        if asyncio.get_running_loop().time() > deadline:
+            logger.warning("ledger watermark not settled: a transaction older than xid %s is still open", xmax)
+            return None
+        await asyncio.sleep(WATERMARK_POLL_SECONDS)
+    await db.commit()
+    return upper
+
+
+async def _scan_upper_bound(db: AsyncSession, after_id: int, watermark: int | None) -> int | None:
+    if watermark is None or watermark <= after_id:
+        return None
+    # a batch by count rather than by id range, so gaps left by rollbacks are skipped
+    batch = (
+        select(LedgerEntry.id)
+        .where(LedgerEntry.id > after_id, LedgerEntry.id <= watermark)
+        .order_by(LedgerEntry.id)
+        .limit(settings.LEDGER_JOB_BATCH_SIZE)
+        .subquery()
+    )
+    return await db.scalar(select(func.max(batch.c.id)))
+
+
+async def snapshot_balances(db: AsyncSession) -> int:
+    watermark = await _committed_watermark(db)
+    checkpoint = await _lock_checkpoint(db, "snapshot")
+    upper = await _scan_upper_bound(db, checkpoint.last_entry_id, watermark)
+    if upper is None:
+        await db.commit()
+        return 0
+
+    deltas = (await db.execute(
+        select(LedgerEntry.wallet_id, func.sum(LedgerEntry.amount))
+        .where(
+            LedgerEntry.id > checkpoint.last_entry_id,
+            LedgerEntry.id <= upper,
+            LedgerEntry.account == LedgerAccount.wallet,
+        )
+        .group_by(LedgerEntry.wallet_id)
+    )).all()
+
+    if deltas:
+        stmt = dialect_insert(db, BalanceSnapshot).values(
+            [dict(wallet_id=wallet_id, balance=delta, last_entry_id=upper) for wallet_id, delta in deltas]
+        )
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=["wallet_id"],
+            set_={
+                "balance": BalanceSnapshot.balance + stmt.excluded.balance,
+                "last_entry_id": stmt.excluded.last_entry_id,
+                "updated_at": datetime.utcnow(),
+            },
+        ))
+
+    checkpoint.last_entry_id = upper
+    await db.commit()
+    ledger_metrics["snapshot_entry_id"] = upper
+    return len(deltas)
+
+
+async def reconcile(db: AsyncSession) -> list[tuple]:
+    watermark = await _committed_watermark(db)
+    checkpoint = await _lock_checkpoint(db, "reconcile")
+    upper = await _scan_upper_bound(db, checkpoint.last_entry_id, watermark)
+    if upper is None:
+        await db.commit()
+        return []
+
+    touched = await db.scalars(
+        select(LedgerEntry.wallet_id)
+        .where(
+            LedgerEntry.id > checkpoint.last_entry_id,
+            LedgerEntry.id <= upper,
+            LedgerEntry.account == LedgerAccount.wallet,
+        )
+        .distinct()
+    )
+    drift = [
+        (wallet_id, balance, ledger)
+        for wallet_id, balance, ledger in await compare_balances(db, touched)
+        if balance != ledger
+    ]
+    for wallet_id, balance, ledger in drift:
+        logger.warning("ledger drift wallet=%s balance=%s ledger=%s", wallet_id, balance, ledger)
+
+    checkpoint.last_entry_id = upper
+    await db.commit()
+    ledger_metrics["reconciled_entry_id"] = upper
+    ledger_metrics["drift_wallets"] += len(drift)
+    return drift
+
+
+async def open_balances(db: AsyncSession, batch_size: int = 1000) -> int:
+    """
+    Post an opening entry for every wallet without one, covering whatever
+    part of Wallet.balance predates the ledger. Run once before (or right
+    after) turning LEDGER_ENABLED on.
+    """
+    opened = 0
+    last_id = None
+    while True:
+        stmt = (
+            select(Wallet.id)
+            .where(~exists().where(
+                LedgerEntry.wallet_id == Wallet.id,
+                LedgerEntry.transaction_id.is_(None),
+            ))
+            .order_by(Wallet.id)
+            .limit(batch_size)
+        )
+        if last_id is not None:
+            stmt = stmt.where(Wallet.id > last_id)
+        wallet_ids = list(await db.scalars(stmt))
+        if not wallet_ids:
+            return opened
+
+        rows = []
+        for wallet_id, balance, ledger in await compare_balances(db, wallet_ids):
+            if balance != ledger:
+                rows.append(dict(account=LedgerAccount.opening_balance, wallet_id=None, amount=ledger - balance))
+                rows.append(dict(account=LedgerAccount.wallet, wallet_id=wallet_id, amount=balance - ledger))
+        if rows:
+            await db.execute(insert(LedgerEntry), rows)
+        await db.commit()
+        opened += len(rows) // 2
+        last_id = wallet_ids[-1]
+
+
+async def run_ledger_jobs() -> bool:
+    async with AsyncSessionLocal() as db:
+        snapshotted = await snapshot_balances(db)
+    async with AsyncSessionLocal() as db:
+        await reconcile(db)
+    return snapshotted > 0
+
+
+def build_ledger_worker() -> BackgroundWorker:
+    return BackgroundWorker(
+        name="ledger",
+        job=run_ledger_jobs,
+        interval=settings.LEDGER_JOB_INTERVAL_SECONDS,
+    )
+
+
+async def _main(command: str) -> None:
+    async with AsyncSessionLocal() as db:
+        if command == "open-balances":
+            print(f"opened {await open_balances(db)} wallets")
+        elif command == "snapshot":
+            print(f"snapshotted {await snapshot_balances(db)} wallets")
+        else:
+            print(f"{len(await reconcile(db))} wallets drifted")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["open-balances", "snapshot", "reconcile"])
+    asyncio.run(_main(parser.parse_args().command))
@@ -0,0 +1,13 @@
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.services.paystack_reconcile import DepositReconciler
+from app.workers.base import BackgroundWorker
+
+
+def build_reconciler() -> BackgroundWorker:
+    reconciler = DepositReconciler(AsyncSessionLocal, settings.PAYSTACK_RECONCILE_BATCH_SIZE)
+    return BackgroundWorker(
+        name="paystack-reconcile",
+        job=reconciler.run_once,
+        interval=settings.PAYSTACK_RECONCILE_INTERVAL_SECONDS,
+    )
@@ -0,0 +1,154 @@
+"""
+Partition upkeep for `transactions` on Postgres:
+
+- ensure: creates the monthly partitions TRANSACTIONS_PARTITION_MONTHS_AHEAD
+  months ahead, so inserts never hit a month without one
+- archive: with TRANSACTIONS_ARCHIVE_AFTER_MONTHS set, moves the oldest
+  month older than that to a Parquet file, one month per run
+
+    python -m app.workers.transaction_partitions ensure
+    python -m app.workers.transaction_partitions archive [--before 2025-01]
+
+Archiving a month takes a SHARE lock on its partition (cold months take no
+writes), exports it, then records the file in transaction_archives and
+detaches and drops the partition in the same transaction. Anything that
+fails before the commit leaves the partition where it was. Archives are
+written to local disk: point TRANSACTIONS_ARCHIVE_DIR at a volume every
+machine serving history can read.
+"""
+import argparse
+import asyncio
+import logging
+import os
+from datetime import date, datetime, time
+from typing import Optional
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.partitions import (
+    add_months,
+    ensure_partitions,
+    is_partitioned,
+    list_partitions,
+    lock_partitions,
+    month_start,
+    partition_name,
+)
+from app.db.session import AsyncSessionLocal, async_engine
+from app.models.transaction import Transaction
+from app.models.transaction_archive import TransactionArchive
+from app.services.transaction_archive import ArchiveWriter
+from app.workers.base import BackgroundWorker
+
+logger = logging.getLogger(__name__)
+
+TABLE = "transactions"
+EXPORT_BATCH_SIZE = 10_000
+
+
+async def ensure_transaction_partitions() -> list[date]:
+    async with async_engine.begin() as conn:
+        created = await conn.run_sync(ensure_partitions, TABLE, settings.TRANSACTIONS_PARTITION_MONTHS_AHEAD)
+    for month in created:
+        logger.info("created partition %s", partition_name(TABLE, month))
+    return created
+
+
+async def archive_partition(db: AsyncSession, month: date) -> int:
+    """Export one month, then detach and drop its partition; commits. Returns the rows archived."""
+    name = partition_name(TABLE, month)
+    path = os.path.join(settings.TRANSACTIONS_ARCHIVE_DIR, f"{name}.parquet")
+    start = datetime.combine(month, time())
+    end = datetime.combine(add_months(month, 1), time())
+
+    await db.execute(text(f"SET LOCAL lock_timeout = {int(settings.MIGRATION_LOCK_TIMEOUT_SECONDS * 1000)}"))
+    await db.execute(text(f"LOCK TABLE {name} IN SHARE MODE"))
+    rows = Transaction.__table__
+    writer = await asyncio.to_thread(ArchiveWriter, path)
+    try:
+        result = await db.stream(
+            select(rows)
+            .where(rows.c.created_at >= start, rows.c.created_at < end)
+            .order_by(rows.c.wallet_id, rows.c.created_at, rows.c.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        async for batch in result.partitions():
+            await asyncio.to_thread(writer.write, batch)
+        await asyncio.to_thread(writer.close)
+    except BaseException:
+        await asyncio.to_thread(writer.abort)
+        raise
+
+    db.add(TransactionArchive(
+        partition=name, range_start=start, range_end=end, path=path, row_count=writer.rows
+    ))
+    await db.flush()
+    await db.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {name}"))
+    await db.execute(text(f"DROP TABLE {name}"))
+    await db.commit()
+    logger.info("archived partition %s: %s rows to %s", name, writer.rows, path)
+    return writer.rows
+
+
+async def archive_next_partition(before: Optional[date] = None) -> Optional[str]:
+    """
+    Archive the oldest partition older than `before` (default: the
+    TRANSACTIONS_ARCHIVE_AFTER_MONTHS cutoff); returns its name, or None
+    when there is nothing to archive.
+    """
+    if before is None:
+        if settings.TRANSACTIONS_ARCHIVE_AFTER_MONTHS <= 0:
+            return None
+        before = add_months(month_start(datetime.utcnow().date()), -settings.TRANSACTIONS_ARCHIVE_AFTER_MONTHS)
+    # the current month still takes inserts
+    before = min(before, month_start(datetime.utcnow().date()))
+
+    async with AsyncSessionLocal() as db:
+        conn = await db.connection()
+        if not await conn.run_sync(is_partitioned, TABLE):
+            return None
+        # held until archive_partition commits
+        await conn.run_sync(lock_partitions, TABLE)
+        months = [month for month in await conn.run_sync(list_partitions, TABLE) if month < before]
+        if not months:
+            await db.rollback()
+            return None
+        await archive_partition(db, months[0])
+        return partition_name(TABLE, months[0])
+
+
+async def maintain_partitions() -> bool:
+    await ensure_transaction_partitions()
+    return await archive_next_partition() is not None
+
+
+def build_partition_worker() -> BackgroundWorker:
+    return BackgroundWorker(
+        name="transaction-partitions",
+        job=maintain_partitions,
+        interval=settings.TRANSACTIONS_PARTITION_INTERVAL_SECONDS,
+    )
+
+
+async def _main(command: str, before: Optional[date]) -> None:
+    if command == "ensure":
+        print(f"created {len(await ensure_transaction_partitions())} partitions")
+        return
+    archived = 0
+    while await archive_next_partition(before):
+        archived += 1
+    print(f"archived {archived} partitions")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["ensure", "archive"])
+    parser.add_argument(
+        "--before",
+        type=lambda value: datetime.strptime(value, "%Y-%m").date(),
+        help="archive months before this one (YYYY-MM); default: TRANSACTIONS_ARCHIVE_AFTER_MONTHS",
+    )
+    args = parser.parse_args()
+    asyncio.run(_main(args.command, args.before))
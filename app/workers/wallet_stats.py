@@ -0,0 +1,82 @@
+"""
+Rebuild wallet_daily_stats from transactions, a batch of wallets at a time:
+
+    python -m app.workers.wallet_stats backfill [--batch-size 500]
+
+Safe to run against live traffic. Each batch locks its wallet rows, the same
+locks every rollup write takes, then replaces those wallets' rollups with
+an INSERT ... SELECT over their transactions, so nothing crosses the wire
+and no change can land between the delete and the re-count.
+"""
+import argparse
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import and_, case, delete, func, insert, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import AsyncSessionLocal
+from app.models.transaction import Transaction
+from app.models.transaction_archive import TransactionArchive
+from app.models.wallet import Wallet
+from app.models.wallet_stats import WalletDailyStats
+from app.services.wallet_stats import COUNTERS, STAT_COLUMNS
+
+
+def _rollup_query(wallet_ids: list, since=None):
+    totals = []
+    for (tx_type, tx_status), (amount_column, count_column) in STAT_COLUMNS.items():
+        counted = and_(Transaction.type == tx_type, Transaction.status == tx_status)
+        totals.append(func.coalesce(func.sum(case((counted, Transaction.amount), else_=0)), 0).label(amount_column))
+        totals.append(func.count(case((counted, 1))).label(count_column))
+    day = func.date(Transaction.created_at)
+    stmt = (
+        select(Transaction.wallet_id, day, *totals, literal(datetime.utcnow()))
+        .where(
+            Transaction.wallet_id.in_(wallet_ids),
+            Transaction.status.in_({status for _, status in STAT_COLUMNS}),
+        )
+        .group_by(Transaction.wallet_id, day)
+    )
+    if since is not None:
+        stmt = stmt.where(Transaction.created_at >= since)
+    return stmt
+
+
+async def rebuild_stats(db: AsyncSession, after=None, batch_size: int = 500) -> list:
+    """Rebuild the next batch of wallets after `after` and commit; returns their ids."""
+    stmt = select(Wallet.id).order_by(Wallet.id).limit(batch_size).with_for_update()
+    if after is not None:
+        stmt = stmt.where(Wallet.id > after)
+    wallet_ids = list(await db.scalars(stmt))
+    if wallet_ids:
+        # archived months are no longer in transactions; their rollups stay as they are
+        archived_until = await db.scalar(select(func.max(TransactionArchive.range_end)))
+        stale = delete(WalletDailyStats).where(WalletDailyStats.wallet_id.in_(wallet_ids))
+        if archived_until is not None:
+            stale = stale.where(WalletDailyStats.day >= archived_until.date())
+        await db.execute(stale)
+        await db.execute(
+            insert(WalletDailyStats).from_select(
+                ["wallet_id", "day", *COUNTERS, "updated_at"], _rollup_query(wallet_ids, archived_until)
+            )
+        )
+    await db.commit()
+    return wallet_ids
+
+
+async def backfill(batch_size: int) -> int:
+    rebuilt, after = 0, None
+    async with AsyncSessionLocal() as db:
+        while wallet_ids := await rebuild_stats(db, after, batch_size):
+            rebuilt += len(wallet_ids)
+            after = wallet_ids[-1]
+    return rebuilt
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    print(f"rebuilt stats for {asyncio.run(backfill(args.batch_size))} wallets")
@@ -0,0 +1,30 @@
+import time
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.services.webhook_inbox import get_inbox_stats, process_inbox_batch
+from app.workers.base import BackgroundWorker
+
+_stats_refreshed_at = 0.0
+
+
+async def drain_inbox() -> int:
+    global _stats_refreshed_at
+    async with AsyncSessionLocal() as db:
+        claimed = await process_inbox_batch(db, settings.WEBHOOK_BATCH_SIZE)
+        # depth / lag gauges matter most during a backlog, when polls claim
+        # events back to back; refresh them once per poll interval either way
+        now = time.monotonic()
+        if now - _stats_refreshed_at >= settings.WEBHOOK_POLL_INTERVAL_SECONDS:
+            _stats_refreshed_at = now
+            await get_inbox_stats(db)
+        return claimed
+
+
+def build_inbox_worker() -> BackgroundWorker:
+    return BackgroundWorker(
+        name="paystack-inbox",
+        job=drain_inbox,
+        interval=settings.WEBHOOK_POLL_INTERVAL_SECONDS,
+        concurrency=settings.WEBHOOK_WORKERS,
+    )
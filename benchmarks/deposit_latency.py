@@ -0,0 +1,111 @@
+"""
+/wallet/deposit latency with and without outbound connection reuse.
+
+Runs the app in-process against DATABASE_URL and a local Paystack stub.
+"fresh_connection" disables keep-alive, which is what the old
+client-per-call code paid on every deposit; "pooled" uses the shared client
+as configured. Loopback has no TLS, so real-world savings are larger.
+
+    python -m benchmarks.deposit_latency --requests 500 --concurrency 20
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+import uuid
+
+import httpx
+
+from main import app
+from app.core.config import settings
+from app.core.http import close_http_clients, start_http_clients
+from app.core.ids import WALLET_NUMBER_BODY_DIGITS, wallet_number_from_sequence
+from app.core.security import create_access_token
+from app.db.base import Base
+from app.db.session import SessionLocal, engine
+from app.models.user import User
+from app.models.wallet import Wallet
+from benchmarks.stubs import StubServer, paystack_stub
+
+
+def seed_users(n: int) -> list[str]:
+    Base.metadata.create_all(bind=engine)
+    tokens = []
+    with SessionLocal() as db:
+        for _ in range(n):
+            tag = uuid.uuid4().hex[:10]
+            user = User(google_sub=f"bench-{tag}", email=f"bench-{tag}@example.com")
+            db.add(user)
+            db.flush()
+            number = wallet_number_from_sequence(random.randrange(10 ** WALLET_NUMBER_BODY_DIGITS))
+            db.add(Wallet(user_id=user.id, wallet_number=number))
+            tokens.append(create_access_token(str(user.id)))
+        db.commit()
+    return tokens
+
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def run_mode(mode: str, tokens: list[str], concurrency: int) -> dict:
+    overrides = {}
+    if mode == "fresh_connection":
+        overrides["limits"] = httpx.Limits(max_keepalive_connections=0)
+    await close_http_clients()
+    await start_http_clients(**overrides)
+
+    latencies: list = []
+    queue: asyncio.Queue = asyncio.Queue()
+    for token in tokens:
+        queue.put_nowait(token)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+
+        async def worker():
+            while not queue.empty():
+                token = queue.get_nowait()
+                started = time.perf_counter()
+                resp = await client.post(
+                    "/wallet/deposit",
+                    json={"amount": 100},
+                    headers={"Authorization": f"Bearer {token}"},
+                )
+                resp.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    await close_http_clients()
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="seconds added by the Paystack stub")
+    args = parser.parse_args()
+
+    with StubServer(paystack_stub(latency=args.stub_latency)) as stub:
+        settings.PAYSTACK_BASE_URL = stub.url
+        report = {
+            mode: asyncio.run(run_mode(mode, seed_users(args.requests), args.concurrency))
+            for mode in ("fresh_connection", "pooled")
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Transaction rows inserted per second by concurrent single transfers.
+
+"orm" replays the old write path: two Transaction objects added to the
+session and flushed by the unit of work. "bulk" is perform_transfer as it
+is now, one executemany per table; "group" adds group commit
+(TRANSFER_GROUP_COMMIT_MS), so concurrent transfers share a commit. The
+balance check at the end needs Postgres; SQLite has no row locks.
+
+    DATABASE_URL=postgresql://... python -m benchmarks.insert_throughput --transfers 2000 --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime
+from decimal import Decimal
+
+from fastapi import HTTPException
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.core.ids import ulid_string, uuid7
+from app.db.session import AsyncSessionLocal
+from app.models.transaction import Transaction, TransactionReference, TransactionStatus, TransactionType
+from app.models.wallet import Wallet
+from app.services.ledger import post_entries, transfer_entries
+from app.services.wallet import perform_transfer
+from app.services.wallet_stats import record_stats, stats_delta
+from benchmarks.transfer_stress import cleanup, seed
+
+
+async def orm_transfer(sender_wallet_id, recipient_wallet_id, amount: int) -> None:
+    async with AsyncSessionLocal() as db:
+        wallets = {
+            w.id: w for w in await db.scalars(
+                select(Wallet)
+                .where(Wallet.id.in_([sender_wallet_id, recipient_wallet_id]))
+                .order_by(Wallet.id)
+                .with_for_update()
+            )
+        }
+        sender, recipient = wallets[sender_wallet_id], wallets[recipient_wallet_id]
+        if sender.balance < amount:
+            raise HTTPException(status_code=400, detail="Insufficient balance")
+        sender.balance = sender.balance - amount
+        recipient.balance = recipient.balance + amount
+
+        suffix = ulid_string(uuid7())
+        now = datetime.utcnow()
+        tx_out = Transaction(
+            id=uuid7(), wallet_id=sender.id, type=TransactionType.transfer_out, status=TransactionStatus.success,
+            amount=Decimal(amount), reference=f"TR_OUT_{suffix}", created_at=now,
+        )
+        tx_in = Transaction(
+            id=uuid7(), wallet_id=recipient.id, type=TransactionType.transfer_in, status=TransactionStatus.success,
+            amount=Decimal(amount), reference=f"TR_IN_{suffix}", created_at=now,
+        )
+        db.add_all([tx_out, tx_in])
+        db.add_all([TransactionReference(reference=tx.reference, created_at=now) for tx in (tx_out, tx_in)])
+        await post_entries(db, transfer_entries(sender.id, recipient.id, amount, tx_out.id, tx_in.id))
+        await record_stats(db, [stats_delta(tx.wallet_id, now, tx.type, tx.status, amount) for tx in (tx_out, tx_in)])
+        await db.commit()
+
+
+async def bulk_transfer(sender_wallet_id, recipient_wallet_id, amount: int) -> None:
+    async with AsyncSessionLocal() as db:
+        await perform_transfer(db, sender_wallet_id, recipient_wallet_id, amount)
+
+
+async def run_mode(transfer, wallet_ids: list, transfers: int, concurrency: int, max_amount: int) -> dict:
+    outcomes: dict = {}
+    queue = iter(range(transfers))
+
+    async def worker():
+        for _ in queue:
+            sender, recipient = random.sample(wallet_ids, 2)
+            try:
+                await transfer(sender, recipient, random.randint(1, max_amount))
+                outcome = "ok"
+            except HTTPException as exc:
+                outcome = f"http_{exc.status_code}"
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "outcomes": outcomes,
+        "elapsed_s": round(elapsed, 3),
+        "transfers_per_s": round(outcomes.get("ok", 0) / elapsed, 1),
+        # two audit rows per transfer
+        "inserts_per_s": round(2 * outcomes.get("ok", 0) / elapsed, 1),
+    }
+
+
+async def total_balance(wallet_ids: list) -> Decimal:
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(func.sum(Wallet.balance)).where(Wallet.id.in_(wallet_ids)))
+
+
+async def main_async(args) -> dict:
+    wallet_ids = seed(args.wallets, args.balance)
+    expected = Decimal(args.wallets * args.balance)
+    report = {}
+    try:
+        for mode in args.modes:
+            settings.TRANSFER_GROUP_COMMIT_MS = args.window_ms if mode == "group" else 0
+            transfer = orm_transfer if mode == "orm" else bulk_transfer
+            report[mode] = await run_mode(transfer, wallet_ids, args.transfers, args.concurrency, args.max_amount)
+        report["conserved"] = await total_balance(wallet_ids) == expected
+    finally:
+        if not args.keep:
+            cleanup(wallet_ids)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modes", nargs="+", choices=["orm", "bulk", "group"], default=["orm", "bulk", "group"])
+    parser.add_argument("--wallets", type=int, default=200)
+    parser.add_argument("--balance", type=int, default=1_000_000)
+    parser.add_argument("--transfers", type=int, default=1000, help="per mode")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--max-amount", type=int, default=500)
+    parser.add_argument("--window-ms", type=float, default=5.0, help="group commit window for 'group'")
+    parser.add_argument("--keep", action="store_true", help="keep seeded rows")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+    print(json.dumps(report, indent=2))
+    raise SystemExit(0 if report["conserved"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+Mixed-traffic load test.
+
+Runs the app in-process (with its lifespan, so background workers run too)
+against DATABASE_URL, with local stubs standing in for Paystack and Google.
+Seeded users fire a weighted mix of balance reads, transfers, deposits,
+signed webhooks and Google logins. The report is JSON with RPS, latency
+percentiles and SQL statements per endpoint, so runs can be diffed between
+commits:
+
+    DATABASE_URL=postgresql://... python -m benchmarks.loadtest \\
+        --requests 5000 --concurrency 50 --mix balance=60,transfer=25,deposit=8,webhook=5,login=2 \\
+        --output before.json
+"""
+import argparse
+import asyncio
+import contextvars
+import hashlib
+import hmac
+import json
+import random
+import statistics
+import subprocess
+import time
+import uuid
+from collections import Counter, defaultdict, deque
+from datetime import datetime
+from decimal import Decimal
+
+import httpx
+from sqlalchemy import event
+
+from main import app
+from app.core.config import settings
+from app.core.ids import WALLET_NUMBER_BODY_DIGITS, wallet_number_from_sequence
+from app.core.security import create_access_token
+from app.db.base import Base
+from app.db.session import SessionLocal, async_engine, engine
+from app.models.transaction import Transaction, TransactionReference, TransactionStatus, TransactionType
+from app.models.user import User
+from app.models.wallet import Wallet
+from benchmarks.stubs import StubServer, google_stub, paystack_stub
+
+DEFAULT_MIX = "balance=60,transfer=25,deposit=8,webhook=5,login=2"
+DEPOSIT_AMOUNT = 100
+
+# endpoint of the request being served, for attributing SQL statements
+_current = contextvars.ContextVar("loadtest_endpoint", default=None)
+_queries: Counter = Counter()
+
+
+@event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    _queries[_current.get() or "background"] += 1
+
+
+class State:
+    def __init__(self, tokens: list[str], wallet_numbers: list[str], pending: list[str]) -> None:
+        self.tokens = tokens
+        self.wallet_numbers = wallet_numbers
+        # deposit references waiting for their charge.success webhook
+        self.pending = deque(pending)
+
+
+def seed(users: int, balance: int, pending_deposits: int) -> State:
+    Base.metadata.create_all(bind=engine)
+    tokens, numbers, pending = [], [], []
+    with SessionLocal() as db:
+        wallets = []
+        for _ in range(users):
+            tag = uuid.uuid4().hex[:10]
+            user = User(google_sub=f"bench-{tag}", email=f"bench-{tag}@example.com")
+            db.add(user)
+            db.flush()
+            number = wallet_number_from_sequence(random.randrange(10 ** WALLET_NUMBER_BODY_DIGITS))
+            wallet = Wallet(user_id=user.id, wallet_number=number, balance=Decimal(balance))
+            db.add(wallet)
+            wallets.append(wallet)
+            tokens.append(create_access_token(str(user.id)))
+            numbers.append(wallet.wallet_number)
+        db.flush()
+        for _ in range(pending_deposits):
+            reference = f"DEP_bench_{uuid.uuid4().hex}"
+            now = datetime.utcnow()
+            db.add(TransactionReference(reference=reference, created_at=now))
+            db.add(Transaction(
+                wallet_id=random.choice(wallets).id,
+                type=TransactionType.deposit,
+                status=TransactionStatus.pending,
+                amount=Decimal(DEPOSIT_AMOUNT),
+                reference=reference,
+                created_at=now,
+            ))
+            pending.append(reference)
+        db.commit()
+    return State(tokens, numbers, pending)
+
+
+def _auth(state: State) -> dict:
+    return {"Authorization": f"Bearer {random.choice(state.tokens)}"}
+
+
+async def op_balance(client: httpx.AsyncClient, state: State) -> httpx.Response:
+    return await client.get("/wallet/balance", headers=_auth(state))
+
+
+async def op_transfer(client: httpx.AsyncClient, state: State) -> httpx.Response:
+    sender, recipient = random.sample(range(len(state.tokens)), 2)
+    return await client.post(
+        "/wallet/transfer",
+        headers={"Authorization": f"Bearer {state.tokens[sender]}"},
+        json={"wallet_number": state.wallet_numbers[recipient], "amount": random.randint(1, 50)},
+    )
+
+
+async def op_deposit(client: httpx.AsyncClient, state: State) -> httpx.Response:
+    resp = await client.post("/wallet/deposit", headers=_auth(state), json={"amount": DEPOSIT_AMOUNT})
+    if resp.status_code == 200:
+        state.pending.append(resp.json()["reference"])
+    return resp
+
+
+async def op_webhook(client: httpx.AsyncClient, state: State) -> httpx.Response:
+    # once the pending pool runs dry, replay a reference: exercises the duplicate path
+    reference = state.pending.popleft() if state.pending else f"DEP_bench_{uuid.uuid4().hex}"
+    body = json.dumps({
+        "event": "charge.success",
+        "data": {"reference": reference, "status": "success", "amount": DEPOSIT_AMOUNT * 100},
+    }).encode()
+    signature = hmac.new(settings.PAYSTACK_SECRET_KEY.encode(), body, hashlib.sha512).hexdigest()
+    return await client.post(
+        "/wallet/paystack/webhook",
+        content=body,
+        headers={"x-paystack-signature": signature, "content-type": "application/json"},
+    )
+
+
+async def op_login(client: httpx.AsyncClient, state: State) -> httpx.Response:
+    # the Google stub treats the code as the user's sub, so each login is a new user
+    return await client.get(
+        "/auth/google/callback",
+        params={"code": f"bench-login-{uuid.uuid4().hex[:12]}", "state": "bench"},
+    )
+
+
+OPS = {
+    "balance": ("GET /wallet/balance", op_balance),
+    "transfer": ("POST /wallet/transfer", op_transfer),
+    "deposit": ("POST /wallet/deposit", op_deposit),
+    "webhook": ("POST /wallet/paystack/webhook", op_webhook),
+    "login": ("GET /auth/google/callback", op_login),
+}
+
+
+def parse_mix(spec: str) -> dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPS:
+            raise SystemExit(f"unknown operation {name!r}, expected one of {', '.join(OPS)}")
+        mix[name] = float(weight or 1)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def run(state: State, mix: dict[str, float], requests: int, concurrency: int) -> tuple[dict, float]:
+    names, weights = list(mix), list(mix.values())
+    latencies: dict[str, list] = defaultdict(list)
+    statuses: dict[str, Counter] = defaultdict(Counter)
+    remaining = requests
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+
+            async def worker():
+                nonlocal remaining
+                while remaining > 0:
+                    remaining -= 1
+                    name = random.choices(names, weights)[0]
+                    endpoint, op = OPS[name]
+                    token = _current.set(endpoint)
+                    started = time.perf_counter()
+                    try:
+                        resp = await op(client, state)
+                        status = str(resp.status_code)
+                    except Exception as exc:
+                        status = type(exc).__name__
+                    finally:
+                        _current.reset(token)
+                    latencies[endpoint].append(time.perf_counter() - started)
+                    statuses[endpoint][status] += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started
+
+    endpoints = {}
+    for endpoint, samples in sorted(latencies.items()):
+        endpoints[endpoint] = {
+            "requests": len(samples),
+            "errors": sum(n for code, n in statuses[endpoint].items() if not code.startswith("2")),
+            "status_codes": dict(statuses[endpoint]),
+            "rps": round(len(samples) / elapsed, 1),
+            "p50_ms": round(statistics.median(samples) * 1000, 2),
+            "p95_ms": round(percentile(samples, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(samples, 0.99) * 1000, 2),
+            "db_queries": _queries[endpoint],
+            "db_queries_per_request": round(_queries[endpoint] / len(samples), 2),
+        }
+    return endpoints, elapsed
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--balance", type=int, default=1_000_000)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="comma-separated op=weight pairs")
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="seconds added by each upstream stub call")
+    parser.add_argument("--rate-limit", action="store_true", help="keep API rate limiting on")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for a repeatable mix")
+    parser.add_argument("--output", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    mix = parse_mix(args.mix)
+    settings.RATE_LIMIT_ENABLED = args.rate_limit
+
+    webhook_share = mix.get("webhook", 0) / sum(mix.values())
+    state = seed(args.users, args.balance, pending_deposits=int(args.requests * webhook_share) + 10)
+
+    with StubServer(paystack_stub(latency=args.stub_latency)) as paystack, \
+            StubServer(google_stub(latency=args.stub_latency)) as google:
+        settings.PAYSTACK_BASE_URL = paystack.url
+        settings.GOOGLE_TOKEN_URL = f"{google.url}/token"
+        settings.GOOGLE_USERINFO_URL = f"{google.url}/userinfo"
+        endpoints, elapsed = asyncio.run(run(state, mix, args.requests, args.concurrency))
+
+    total = sum(e["requests"] for e in endpoints.values())
+    report = {
+        "commit": git_commit(),
+        "config": {
+            "database": async_engine.dialect.name,
+            "webhook_mode": settings.PAYSTACK_WEBHOOK_MODE,
+            "cache_backend": settings.CACHE_BACKEND,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "users": args.users,
+            "mix": mix,
+            "stub_latency": args.stub_latency,
+            "rate_limit": args.rate_limit,
+        },
+        "total": {
+            "requests": total,
+            "elapsed_s": round(elapsed, 3),
+            "rps": round(total / elapsed, 1),
+            "db_queries": sum(_queries.values()),
+            "background_db_queries": _queries["background"],
+        },
+        "endpoints": endpoints,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Cold-start profile: import cost per module and time from boot to first response.
+
+Every run is a fresh interpreter, the way a machine scaled to zero boots.
+Each run measures importing app.main, create_app(), the lifespan startup
+and the first request (a JWT-authenticated /wallet/balance by default, so
+auth and a DB round-trip are included). A second interpreter per run
+imports the app under `-X importtime` for the per-module breakdown; its
+numbers carry the tracer's overhead and are for ranking, not for adding up.
+
+    python -m benchmarks.startup --runs 5 --top 25 --output startup.json
+
+Run it against the DATABASE_URL you deploy with; Postgres drivers import more
+than SQLite's. Delete __pycache__ directories first to include bytecode
+compilation, as on a machine booted from a fresh image.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+
+PHASES = ("import", "create_app", "startup", "first_request", "total")
+
+
+def child(path: str) -> None:
+    started = time.perf_counter()
+    from app.main import create_app
+    imported = time.perf_counter()
+    app = create_app()
+    created = time.perf_counter()
+
+    import httpx
+    from app.core.security import create_access_token
+
+    async def boot_and_request() -> tuple[float, float, int]:
+        async with app.router.lifespan_context(app):
+            ready = time.perf_counter()
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://startup") as client:
+                # an unknown user: authenticates, looks the user up, answers 401
+                headers = {"Authorization": f"Bearer {create_access_token(str(uuid.uuid4()))}"}
+                resp = await client.get(path, headers=headers)
+            return ready, time.perf_counter(), resp.status_code
+
+    ready, answered, status = asyncio.run(boot_and_request())
+    print(json.dumps({
+        "import": imported - started,
+        "create_app": created - imported,
+        "startup": ready - created,
+        "first_request": answered - ready,
+        "total": answered - started,
+        "status": status,
+    }))
+
+
+def run_child(path: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--child", "--path", path],
+        check=True, capture_output=True, text=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def import_times() -> dict[str, tuple[int, int]]:
+    """module -> (self_us, cumulative_us), parsed from -X importtime."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        check=True, capture_output=True, text=True,
+    )
+    times = {}
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        times[module.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def summarize(samples: list[float]) -> dict:
+    ms = [s * 1000 for s in samples]
+    return {
+        "p50_ms": round(statistics.median(ms), 1),
+        "min_ms": round(min(ms), 1),
+        "max_ms": round(max(ms), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=25, help="modules listed by cumulative import time")
+    parser.add_argument("--path", default="/wallet/balance", help="first request path")
+    parser.add_argument("--output", help="also write the JSON report here")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.path)
+        return
+
+    runs = [run_child(args.path) for _ in range(args.runs)]
+    imports = [import_times() for _ in range(args.runs)]
+
+    modules = defaultdict(lambda: ([], []))
+    for times in imports:
+        for module, (self_us, cumulative_us) in times.items():
+            modules[module][0].append(self_us)
+            modules[module][1].append(cumulative_us)
+    per_module = {
+        module: (statistics.median(s), statistics.median(c)) for module, (s, c) in modules.items()
+    }
+    # self time summed per top-level package: what each dependency costs
+    packages = defaultdict(float)
+    for module, (self_us, _) in per_module.items():
+        packages[module.split(".")[0]] += self_us
+
+    report = {
+        "python": sys.version.split()[0],
+        "database_url_scheme": os.environ.get("DATABASE_URL", "").split(":", 1)[0],
+        "runs": args.runs,
+        "first_request": {"path": args.path, "status": runs[-1]["status"]},
+        "phases": {phase: summarize([r[phase] for r in runs]) for phase in PHASES},
+        "import_total_ms": round(per_module.get("app.main", (0, 0))[1] / 1000, 1),
+        "packages": [
+            {"package": name, "self_ms": round(us / 1000, 1)}
+            for name, us in sorted(packages.items(), key=lambda kv: -kv[1])[: args.top]
+        ],
+        "modules": [
+            {"module": name, "self_ms": round(s / 1000, 1), "cumulative_ms": round(c / 1000, 1)}
+            for name, (s, c) in sorted(per_module.items(), key=lambda kv: -kv[1][1])[: args.top]
+        ],
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
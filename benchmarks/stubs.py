@@ -0,0 +1,131 @@
+"""
+Local stand-ins for the upstream APIs the service calls, for benchmarks.
+Each stub is a small ASGI app served by uvicorn on a background thread.
+"""
+import asyncio
+import socket
+import threading
+import time
+import urllib.parse
+from datetime import datetime, timezone
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def paystack_stub(latency: float = 0.0, charge_status: str = "success") -> FastAPI:
+    """
+    Initialize, verify and list. Every initialized charge is recorded in
+    stub.state.charges (reference -> charge) with `charge_status`; edit the
+    entries to play out payments, failures or abandoned checkouts.
+    """
+    stub = FastAPI()
+    charges: dict[str, dict] = {}
+    stub.state.charges = charges
+
+    @stub.post("/transaction/initialize")
+    async def initialize(request: Request):
+        body = await request.json()
+        if latency:
+            await asyncio.sleep(latency)
+        now = _now_iso()
+        charges[body["reference"]] = {
+            "reference": body["reference"],
+            "amount": body["amount"],
+            "status": charge_status,
+            "createdAt": now,
+            "paid_at": now if charge_status == "success" else None,
+        }
+        return {
+            "status": True,
+            "data": {
+                "authorization_url": f"https://checkout.paystack.test/{body['reference']}",
+                "reference": body["reference"],
+            },
+        }
+
+    @stub.get("/transaction/verify/{reference}")
+    async def verify(reference: str):
+        if latency:
+            await asyncio.sleep(latency)
+        if reference not in charges:
+            return JSONResponse({"status": False, "message": "Transaction reference not found"}, status_code=400)
+        return {"status": True, "data": charges[reference]}
+
+    @stub.get("/transaction")
+    async def list_transactions(request: Request):
+        params = request.query_params
+        page = int(params.get("page", 1))
+        per_page = int(params.get("perPage", 50))
+        if latency:
+            await asyncio.sleep(latency)
+        start = datetime.fromisoformat(params.get("from", "0001-01-01T00:00:00Z"))
+        end = datetime.fromisoformat(params.get("to", "9999-12-31T00:00:00Z"))
+        matching = [
+            charge for charge in charges.values()
+            if start <= datetime.fromisoformat(charge["createdAt"]) <= end
+        ]
+        matching.sort(key=lambda charge: charge["createdAt"], reverse=True)
+        return {
+            "status": True,
+            "data": matching[(page - 1) * per_page:page * per_page],
+            "meta": {
+                "total": len(matching),
+                "perPage": per_page,
+                "page": page,
+                "pageCount": max(1, -(-len(matching) // per_page)),
+            },
+        }
+
+    return stub
+
+
+def google_stub(latency: float = 0.0) -> FastAPI:
+    """Token exchange and userinfo; the code doubles as the user's Google sub."""
+    stub = FastAPI()
+
+    @stub.post("/token")
+    async def token(request: Request):
+        form = urllib.parse.parse_qs((await request.body()).decode())
+        if latency:
+            await asyncio.sleep(latency)
+        return {"access_token": f"stub-{form['code'][0]}", "token_type": "Bearer", "expires_in": 3600}
+
+    @stub.get("/userinfo")
+    async def userinfo(request: Request):
+        sub = request.headers["authorization"].removeprefix("Bearer stub-")
+        if latency:
+            await asyncio.sleep(latency)
+        return {"sub": sub, "email": f"{sub}@example.com", "name": f"Stub {sub}"}
+
+    return stub
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class StubServer:
+    def __init__(self, app: FastAPI) -> None:
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        config = uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def __enter__(self) -> "StubServer":
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.should_exit = True
+        self._thread.join()
@@ -0,0 +1,143 @@
+"""
+Concurrent transfer stress test.
+
+Runs many concurrent transfers on one event loop, each on its own
+connection, between a small set of hot wallets. At the end the sum of
+balances must equal the seeded total and no wallet may be negative. One
+loop because perform_transfer reaches process-wide singletons (the group
+committer's engine, limit counters, the cache) that are bound to the loop
+that first used them.
+
+Needs Postgres (SQLite has no row locks):
+
+    DATABASE_URL=postgresql://... python -m benchmarks.transfer_stress --concurrency 64 --transfers 200
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from collections import Counter
+from decimal import Decimal
+
+from fastapi import HTTPException
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+from app.db.base import Base
+from app.db.session import SessionLocal, engine, to_async_url
+from app.models.ledger import BalanceSnapshot, LedgerEntry
+from app.models.transaction import Transaction, TransactionReference
+from app.models.user import User
+from app.models.wallet import Wallet
+from app.models.wallet_stats import WalletDailyStats
+from app.services.wallet import perform_transfer
+
+
+def seed(n_wallets: int, balance: int) -> list:
+    Base.metadata.create_all(bind=engine)
+    tag = uuid.uuid4().hex[:8]
+    with SessionLocal() as db:
+        users = [User(google_sub=f"bench-{tag}-{i}", email=f"bench-{tag}-{i}@example.com") for i in range(n_wallets)]
+        db.add_all(users)
+        db.flush()
+        wallets = [
+            Wallet(user_id=u.id, wallet_number=f"9{random.randint(0, 999):03d}{i:08d}", balance=Decimal(balance))
+            for i, u in enumerate(users)
+        ]
+        db.add_all(wallets)
+        db.commit()
+        return [w.id for w in wallets]
+
+
+def cleanup(wallet_ids: list) -> None:
+    with SessionLocal() as db:
+        user_ids = db.scalars(select(Wallet.user_id).where(Wallet.id.in_(wallet_ids))).all()
+        db.execute(delete(LedgerEntry).where(LedgerEntry.wallet_id.in_(wallet_ids)))
+        db.execute(delete(BalanceSnapshot).where(BalanceSnapshot.wallet_id.in_(wallet_ids)))
+        db.execute(delete(WalletDailyStats).where(WalletDailyStats.wallet_id.in_(wallet_ids)))
+        references = select(Transaction.reference).where(Transaction.wallet_id.in_(wallet_ids))
+        db.execute(delete(TransactionReference).where(TransactionReference.reference.in_(references)))
+        db.execute(delete(Transaction).where(Transaction.wallet_id.in_(wallet_ids)))
+        db.execute(delete(Wallet).where(Wallet.id.in_(wallet_ids)))
+        db.execute(delete(User).where(User.id.in_(user_ids)))
+        db.commit()
+
+
+def totals(wallet_ids: list) -> tuple[Decimal, Decimal]:
+    with SessionLocal() as db:
+        total, lowest = db.execute(
+            select(func.sum(Wallet.balance), func.min(Wallet.balance)).where(Wallet.id.in_(wallet_ids))
+        ).one()
+        return total, lowest
+
+
+async def run(
+    wallet_ids: list, concurrency: int, transfers: int, max_amount: int, outcomes: Counter, latencies: list
+) -> None:
+    async_engine = create_async_engine(
+        to_async_url(settings.DATABASE_URL.unicode_string()), pool_size=concurrency, max_overflow=0
+    )
+    Session = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    async def worker():
+        for _ in range(transfers):
+            sender, recipient = random.sample(wallet_ids, 2)
+            started = time.perf_counter()
+            async with Session() as db:
+                try:
+                    await perform_transfer(db, sender, recipient, random.randint(1, max_amount))
+                    outcome = "ok"
+                except HTTPException as exc:
+                    outcome = f"http_{exc.status_code}"
+            outcomes[outcome] += 1
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--wallets", type=int, default=4, help="number of hot wallets")
+    parser.add_argument("--balance", type=int, default=10_000)
+    parser.add_argument("--concurrency", type=int, default=32, help="transfers in flight at once")
+    parser.add_argument("--transfers", type=int, default=100, help="transfers per concurrent worker")
+    parser.add_argument("--max-amount", type=int, default=500)
+    parser.add_argument("--keep", action="store_true", help="keep seeded rows")
+    args = parser.parse_args()
+
+    wallet_ids = seed(args.wallets, args.balance)
+    expected = Decimal(args.wallets * args.balance)
+    outcomes: Counter = Counter()
+    latencies: list = []
+
+    started = time.perf_counter()
+    asyncio.run(run(wallet_ids, args.concurrency, args.transfers, args.max_amount, outcomes, latencies))
+    elapsed = time.perf_counter() - started
+
+    total, lowest = totals(wallet_ids)
+    latencies.sort()
+    report = {
+        "attempted": len(latencies),
+        "outcomes": dict(outcomes),
+        "elapsed_s": round(elapsed, 3),
+        "transfers_per_s": round(outcomes["ok"] / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 2),
+        "expected_total": str(expected),
+        "actual_total": str(total),
+        "lowest_balance": str(lowest),
+        "conserved": total == expected and lowest >= 0,
+    }
+    if not args.keep:
+        cleanup(wallet_ids)
+
+    print(json.dumps(report, indent=2))
+    raise SystemExit(0 if report["conserved"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,3 @@
-from fastapi import FastAPI
-from app.routes import auth, keys, wallet
-from app.core.config import settings
-from app.db.base import Base
-from app.db.session import engine
+from app.main import create_app
 
-# create tables (for dev; in prod use Alembic)
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI(title=settings.PROJECT_NAME)
-
-app.include_router(auth.router)
-app.include_router(keys.router)
-app.include_router(wallet.router)
\ No newline at end of file
+app = create_app()
@@ -0,0 +1,50 @@
+import asyncio
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import pool
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.config import settings
+from app.db.base import Base
+from app.db.session import to_async_url
+# register every table on Base.metadata for autogenerate
+from app.models import api_key, id_sequence, idempotency, ledger, paystack_event, transaction, transaction_archive, user, wallet, wallet_stats  # noqa: F401
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+url = settings.DATABASE_URL.unicode_string()
+
+
+def run_migrations_offline() -> None:
+    context.configure(url=url, target_metadata=target_metadata, literal_binds=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection: Connection) -> None:
+    if connection.dialect.name == "postgresql":
+        # DDL that can't get its lock quickly fails instead of queueing every
+        # write on the table behind it; re-run the release to retry
+        timeout_ms = int(settings.MIGRATION_LOCK_TIMEOUT_SECONDS * 1000)
+        connection.exec_driver_sql(f"SET lock_timeout = {timeout_ms}")
+    context.configure(connection=connection, target_metadata=target_metadata)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_migrations_online() -> None:
+    engine = create_async_engine(to_async_url(url), poolclass=pool.NullPool)
+    async with engine.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+    await engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    asyncio.run(run_migrations_online())
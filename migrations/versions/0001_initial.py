@@ -0,0 +1,96 @@
+"""initial schema: users, wallets, transactions, api_keys
+
+Databases created by the old create_all-at-startup code already have these
+tables, so each is only created when it isn't there yet: the first
+`alembic upgrade head` (the Fly release command) adopts them as they are.
+
+Revision ID: 0001
+Revises:
+Create Date: 2025-12-10
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.db.migration_ops import has_table
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if not has_table("users"):
+        op.create_table(
+            "users",
+            sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+            sa.Column("google_sub", sa.String(128), nullable=False),
+            sa.Column("email", sa.String(255), nullable=False),
+            sa.Column("full_name", sa.String(255), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+        )
+        op.create_index("ix_users_google_sub", "users", ["google_sub"], unique=True)
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    if not has_table("wallets"):
+        op.create_table(
+            "wallets",
+            sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+            sa.Column(
+                "user_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id"), nullable=False, unique=True
+            ),
+            sa.Column("wallet_number", sa.String(32), nullable=False),
+            sa.Column("balance", sa.Numeric(18, 2), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+        )
+        op.create_index("ix_wallets_wallet_number", "wallets", ["wallet_number"], unique=True)
+
+    if not has_table("transactions"):
+        op.create_table(
+            "transactions",
+            sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+            sa.Column("wallet_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("wallets.id"), nullable=False),
+            sa.Column(
+                "type",
+                sa.Enum("deposit", "transfer_out", "transfer_in", name="transactiontype"),
+                nullable=False,
+            ),
+            sa.Column(
+                "status",
+                sa.Enum("pending", "success", "failed", name="transactionstatus"),
+                nullable=False,
+            ),
+            sa.Column("amount", sa.Numeric(18, 2), nullable=False),
+            sa.Column("reference", sa.String(128), nullable=False),
+            sa.Column("meta", sa.JSON(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+            sa.UniqueConstraint("reference", name="uq_transactions_reference"),
+        )
+        op.create_index("ix_transactions_reference", "transactions", ["reference"], unique=True)
+
+    if not has_table("api_keys"):
+        op.create_table(
+            "api_keys",
+            sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+            sa.Column("user_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("name", sa.String(128), nullable=False),
+            sa.Column("key_hash", sa.String(128), nullable=False, unique=True),
+            sa.Column("permissions", sa.String(256), nullable=False),
+            sa.Column("expires_at", sa.DateTime(), nullable=False),
+            sa.Column("revoked", sa.Boolean(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("revoked_at", sa.DateTime(), nullable=True),
+        )
+        op.create_index("ix_api_keys_user_id", "api_keys", ["user_id"])
+
+
+def downgrade() -> None:
+    op.drop_table("api_keys")
+    op.drop_table("transactions")
+    op.drop_table("wallets")
+    op.drop_table("users")
+    sa.Enum(name="transactionstatus").drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name="transactiontype").drop(op.get_bind(), checkfirst=True)
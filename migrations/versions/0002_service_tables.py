@@ -0,0 +1,124 @@
+"""webhook inbox, ledger, idempotency keys and id sequences
+
+create_all used to add these on startup, so each table is only created when
+it isn't there yet.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2025-12-10
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.db.migration_ops import has_table
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+# BIGSERIAL on Postgres; SQLite only autoincrements INTEGER PRIMARY KEY
+EntryId = sa.BigInteger().with_variant(sa.Integer(), "sqlite")
+PENDING = sa.text("status = 'pending'")
+
+
+def upgrade() -> None:
+    if not has_table("paystack_events"):
+        op.create_table(
+            "paystack_events",
+            sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+            sa.Column("event_key", sa.String(255), nullable=False, unique=True),
+            sa.Column("event", sa.String(64), nullable=True),
+            sa.Column("reference", sa.String(128), nullable=True),
+            sa.Column("payload", sa.JSON(), nullable=False),
+            sa.Column(
+                "status",
+                sa.Enum("pending", "processed", "failed", name="paystackeventstatus"),
+                nullable=False,
+            ),
+            sa.Column("attempts", sa.Integer(), nullable=False),
+            sa.Column("last_error", sa.String(512), nullable=True),
+            sa.Column("received_at", sa.DateTime(), nullable=False),
+            sa.Column("available_at", sa.DateTime(), nullable=False),
+            sa.Column("processed_at", sa.DateTime(), nullable=True),
+        )
+        op.create_index("ix_paystack_events_reference", "paystack_events", ["reference"])
+        op.create_index(
+            "ix_paystack_events_pending",
+            "paystack_events",
+            ["available_at"],
+            postgresql_where=PENDING,
+            sqlite_where=PENDING,
+        )
+
+    if not has_table("ledger_entries"):
+        op.create_table(
+            "ledger_entries",
+            sa.Column("id", EntryId, primary_key=True, autoincrement=True),
+            sa.Column(
+                "account",
+                sa.Enum("wallet", "paystack_clearing", "opening_balance", name="ledgeraccount"),
+                nullable=False,
+            ),
+            sa.Column("wallet_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("wallets.id"), nullable=True),
+            sa.Column(
+                "transaction_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("transactions.id"), nullable=True
+            ),
+            sa.Column("amount", sa.Numeric(18, 2), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+        )
+        op.create_index("ix_ledger_entries_wallet_id_id", "ledger_entries", ["wallet_id", "id"])
+
+    if not has_table("balance_snapshots"):
+        op.create_table(
+            "balance_snapshots",
+            sa.Column("wallet_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("wallets.id"), primary_key=True),
+            sa.Column("balance", sa.Numeric(18, 2), nullable=False),
+            sa.Column("last_entry_id", EntryId, nullable=False),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+        )
+
+    if not has_table("ledger_checkpoints"):
+        op.create_table(
+            "ledger_checkpoints",
+            sa.Column("name", sa.String(64), primary_key=True),
+            sa.Column("last_entry_id", EntryId, nullable=False),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+        )
+
+    if not has_table("idempotency_keys"):
+        op.create_table(
+            "idempotency_keys",
+            sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+            sa.Column("scope", sa.String(128), nullable=False),
+            sa.Column("key", sa.String(255), nullable=False),
+            sa.Column("request_hash", sa.String(64), nullable=False),
+            sa.Column("status_code", sa.Integer(), nullable=True),
+            sa.Column("response_body", sa.JSON(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("expires_at", sa.DateTime(), nullable=False),
+            sa.UniqueConstraint("scope", "key", name="uq_idempotency_keys_scope_key"),
+        )
+        op.create_index("ix_idempotency_keys_expires_at", "idempotency_keys", ["expires_at"])
+
+    if not has_table("id_sequences"):
+        op.create_table(
+            "id_sequences",
+            sa.Column("name", sa.String(64), primary_key=True),
+            sa.Column("next_value", sa.BigInteger(), nullable=False),
+        )
+
+
+def downgrade() -> None:
+    for table in (
+        "id_sequences",
+        "idempotency_keys",
+        "ledger_checkpoints",
+        "balance_snapshots",
+        "ledger_entries",
+        "paystack_events",
+    ):
+        op.drop_table(table)
+    sa.Enum(name="ledgeraccount").drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name="paystackeventstatus").drop(op.get_bind(), checkfirst=True)
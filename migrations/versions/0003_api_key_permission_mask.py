@@ -0,0 +1,68 @@
+"""api_keys: permission bitmask and revoked_reason
+
+Replaces the comma-separated permissions column with permission_mask
+(app.core.permissions). Existing "transfer" and "read" keys keep access to
+batch transfers and export. The bit values are frozen here rather than
+imported so this revision keeps meaning the same thing.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2025-12-10
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.migration_ops import has_column, is_postgres
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+LEGACY_BITS = {"deposit": 1, "transfer": 2 | 8, "read": 4 | 16}
+NAMES = {"deposit": 1, "transfer": 2, "read": 4, "transfer:batch": 8, "export": 16}
+
+revoked_reason = sa.Enum("revoked", "expired", "rolled_over", name="apikeyrevokedreason")
+
+
+def _legacy_mask(value: str) -> int:
+    mask = 0
+    for name in (p.strip() for p in (value or "").split(",")):
+        mask |= LEGACY_BITS.get(name, 0)
+    return mask
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if not has_column("api_keys", "permission_mask"):
+        # constant default: no table rewrite on Postgres 11+
+        op.add_column("api_keys", sa.Column("permission_mask", sa.Integer(), nullable=False, server_default="0"))
+
+    if has_column("api_keys", "permissions"):
+        # a handful of distinct strings, so one UPDATE per combination
+        for (value,) in bind.execute(sa.text("SELECT DISTINCT permissions FROM api_keys")).all():
+            bind.execute(
+                sa.text("UPDATE api_keys SET permission_mask = :mask WHERE permissions = :value"),
+                {"mask": _legacy_mask(value), "value": value},
+            )
+        op.drop_column("api_keys", "permissions")
+
+    if not has_column("api_keys", "revoked_reason"):
+        if is_postgres():
+            revoked_reason.create(bind, checkfirst=True)
+        op.add_column("api_keys", sa.Column("revoked_reason", revoked_reason, nullable=True))
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    op.drop_column("api_keys", "revoked_reason")
+    if is_postgres():
+        revoked_reason.drop(bind, checkfirst=True)
+
+    op.add_column("api_keys", sa.Column("permissions", sa.String(256), nullable=False, server_default=""))
+    for (mask,) in bind.execute(sa.text("SELECT DISTINCT permission_mask FROM api_keys")).all():
+        bind.execute(
+            sa.text("UPDATE api_keys SET permissions = :value WHERE permission_mask = :mask"),
+            {"value": ",".join(name for name, bit in NAMES.items() if mask & bit), "mask": mask},
+        )
+    op.drop_column("api_keys", "permission_mask")
@@ -0,0 +1,40 @@
+"""transaction history and active API key indexes, built concurrently
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2025-12-10
+"""
+import sqlalchemy as sa
+
+from app.db.migration_ops import create_index_concurrently, drop_index_concurrently
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+ACTIVE = sa.text("revoked = false")
+
+
+def upgrade() -> None:
+    create_index_concurrently(
+        "ix_transactions_wallet_created_id",
+        "transactions",
+        ["wallet_id", sa.text("created_at DESC"), sa.text("id DESC")],
+    )
+    create_index_concurrently("ix_api_keys_user_permission_mask", "api_keys", ["user_id", "permission_mask"])
+    create_index_concurrently("ix_api_keys_active_user", "api_keys", ["user_id"], where=ACTIVE)
+    create_index_concurrently("ix_api_keys_active_expires_at", "api_keys", ["expires_at"], where=ACTIVE)
+    # the (user_id, permission_mask) index covers user_id lookups
+    drop_index_concurrently("ix_api_keys_user_id", "api_keys")
+
+
+def downgrade() -> None:
+    create_index_concurrently("ix_api_keys_user_id", "api_keys", ["user_id"])
+    for name in (
+        "ix_api_keys_active_expires_at",
+        "ix_api_keys_active_user",
+        "ix_api_keys_user_permission_mask",
+    ):
+        drop_index_concurrently(name, "api_keys")
+    drop_index_concurrently("ix_transactions_wallet_created_id", "transactions")
@@ -0,0 +1,29 @@
+"""pending deposit index for the Paystack reconciler
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2025-12-11
+"""
+import sqlalchemy as sa
+
+from app.db.migration_ops import create_index_concurrently, drop_index_concurrently
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+PENDING_DEPOSIT = sa.text("status = 'pending' AND type = 'deposit'")
+
+
+def upgrade() -> None:
+    create_index_concurrently(
+        "ix_transactions_pending_deposits",
+        "transactions",
+        ["created_at", "id"],
+        where=PENDING_DEPOSIT,
+    )
+
+
+def downgrade() -> None:
+    drop_index_concurrently("ix_transactions_pending_deposits", "transactions")
@@ -0,0 +1,47 @@
+"""per-wallet daily rollups
+
+Fill them once after upgrading, with writes already maintaining them:
+
+    python -m app.workers.wallet_stats backfill
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2025-12-12
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.db.migration_ops import has_table
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+COUNTERS = [
+    ("deposited", "deposit_count"),
+    ("sent", "sent_count"),
+    ("received", "received_count"),
+    ("failed", "failed_count"),
+]
+
+
+def upgrade() -> None:
+    if has_table("wallet_daily_stats"):
+        return
+    columns = []
+    for amount_column, count_column in COUNTERS:
+        columns.append(sa.Column(amount_column, sa.Numeric(18, 2), nullable=False, server_default="0"))
+        columns.append(sa.Column(count_column, sa.Integer(), nullable=False, server_default="0"))
+    op.create_table(
+        "wallet_daily_stats",
+        sa.Column("wallet_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("wallets.id"), primary_key=True),
+        sa.Column("day", sa.Date(), primary_key=True),
+        *columns,
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("wallet_daily_stats")
@@ -0,0 +1,25 @@
+"""transfer limits on API keys
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2025-12-13
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.migration_ops import has_column
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # nullable with no default: a catalog-only change on Postgres
+    if not has_column("api_keys", "limits"):
+        op.add_column("api_keys", sa.Column("limits", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("api_keys", "limits")
@@ -0,0 +1,264 @@
+"""partition transactions by month; transaction references and archive catalog
+
+On Postgres the live table is partitioned in place, without copying it or
+blocking writes for longer than a catalog change: it becomes
+transactions_legacy, the first partition of a new RANGE (created_at)
+partitioned table, covering everything before the month after next, and
+monthly partitions follow from there. Its new keys are built with CREATE
+INDEX CONCURRENTLY and a NOT VALID range check is validated before the
+ATTACH, so the attach itself scans nothing. The primary key becomes
+(id, created_at) and the unique index on reference alone is dropped. A
+partitioned table cannot enforce a unique reference on its own, so the new
+transaction_references table (reference primary key) keeps references
+globally unique and tells lookups which partition to read; a trigger on
+transactions_legacy fills it for rows written by machines still running the
+previous release. ledger_entries loses its foreign key to transactions,
+which a partitioned table's (id, created_at) key cannot serve. SQLite gets
+the same keys without partitioning.
+
+Downgrading copies the live rows back into a plain table, blocking writes
+while it runs; archived months stay in their Parquet files.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2025-12-14
+"""
+from datetime import datetime
+
+from alembic import context, op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.core.config import settings
+from app.db.migration_ops import create_index_concurrently, has_table, is_postgres
+from app.db.partitions import (
+    add_months,
+    create_partition_sql,
+    is_partitioned,
+    legacy_partition_name,
+    month_start,
+)
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+PENDING_DEPOSIT = sa.text("status = 'pending' AND type = 'deposit'")
+COLUMNS = "id, wallet_id, type, status, amount, reference, meta, created_at, updated_at"
+LEGACY = legacy_partition_name("transactions")
+LEGACY_CHECK = f"{LEGACY}_created_at_check"
+HISTORY_INDEXES = ("ix_transactions_wallet_created_id", "ix_transactions_pending_deposits")
+
+LEGACY_REFERENCES = """
+CREATE OR REPLACE FUNCTION transactions_legacy_reference() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO transaction_references (reference, created_at) VALUES (NEW.reference, NEW.created_at)
+        ON CONFLICT (reference) DO NOTHING;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql
+"""
+
+
+def _columns() -> list:
+    return [
+        sa.Column("id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("wallet_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("wallets.id"), nullable=False),
+        sa.Column(
+            "type",
+            postgresql.ENUM("deposit", "transfer_out", "transfer_in", name="transactiontype", create_type=False),
+            nullable=False,
+        ),
+        sa.Column(
+            "status",
+            postgresql.ENUM("pending", "success", "failed", name="transactionstatus", create_type=False),
+            nullable=False,
+        ),
+        sa.Column("amount", sa.Numeric(18, 2), nullable=False),
+        sa.Column("reference", sa.String(128), nullable=False),
+        sa.Column("meta", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    ]
+
+
+def _create_wallet_history_index() -> None:
+    op.create_index(
+        "ix_transactions_wallet_created_id",
+        "transactions",
+        ["wallet_id", sa.text("created_at DESC"), sa.text("id DESC")],
+    )
+
+
+def _rebuild_wallet_history_index() -> None:
+    # batch mode copies indexes by column name only, without DESC
+    op.drop_index("ix_transactions_wallet_created_id", "transactions")
+    _create_wallet_history_index()
+
+
+def _create_history_indexes() -> None:
+    # the table is new and not yet visible to anyone, so no CONCURRENTLY
+    _create_wallet_history_index()
+    op.create_index(
+        "ix_transactions_pending_deposits", "transactions", ["created_at", "id"], postgresql_where=PENDING_DEPOSIT
+    )
+
+
+def _partitioned(offline: bool) -> bool:
+    # --sql output assumes the database is at the revision being left
+    if context.is_offline_mode():
+        return offline
+    return is_partitioned(op.get_bind(), "transactions")
+
+
+def _partition_in_place() -> None:
+    """
+    Only the final swap runs in the migration transaction, and it only
+    touches the catalog; the backfill, index builds and check validation
+    before it each commit on their own and don't block writes.
+    """
+    # a month boundary the migration cannot outrun: rows written while it
+    # runs must still satisfy the range check
+    end = add_months(month_start(datetime.utcnow().date()), 2)
+    migration = op.get_context()
+
+    with migration.autocommit_block():
+        op.execute(LEGACY_REFERENCES)
+        op.execute("DROP TRIGGER IF EXISTS transactions_legacy_reference ON transactions")
+        op.execute(
+            "CREATE TRIGGER transactions_legacy_reference AFTER INSERT ON transactions "
+            "FOR EACH ROW EXECUTE FUNCTION transactions_legacy_reference()"
+        )
+        # after the trigger, so no row falls between the two
+        op.execute(
+            "INSERT INTO transaction_references (reference, created_at) "
+            "SELECT reference, created_at FROM transactions ON CONFLICT (reference) DO NOTHING"
+        )
+    create_index_concurrently(f"{LEGACY}_pkey", "transactions", ["id", "created_at"], unique=True)
+    create_index_concurrently(
+        f"uq_{LEGACY}_reference_created_at", "transactions", ["reference", "created_at"], unique=True
+    )
+    with migration.autocommit_block():
+        op.execute(f"ALTER TABLE transactions DROP CONSTRAINT IF EXISTS {LEGACY_CHECK}")
+        op.execute(f"ALTER TABLE transactions ADD CONSTRAINT {LEGACY_CHECK} CHECK (created_at < '{end}') NOT VALID")
+        op.execute(f"ALTER TABLE transactions VALIDATE CONSTRAINT {LEGACY_CHECK}")
+
+    op.execute("ALTER TABLE ledger_entries DROP CONSTRAINT IF EXISTS ledger_entries_transaction_id_fkey")
+    # ATTACH adopts matching unique indexes only when they back constraints
+    op.execute("ALTER TABLE transactions DROP CONSTRAINT transactions_pkey")
+    op.execute(f"ALTER TABLE transactions ADD CONSTRAINT {LEGACY}_pkey PRIMARY KEY USING INDEX {LEGACY}_pkey")
+    op.execute(
+        f"ALTER TABLE transactions ADD CONSTRAINT uq_{LEGACY}_reference_created_at "
+        f"UNIQUE USING INDEX uq_{LEGACY}_reference_created_at"
+    )
+    op.execute("ALTER TABLE transactions DROP CONSTRAINT IF EXISTS uq_transactions_reference")
+    op.execute("DROP INDEX IF EXISTS ix_transactions_reference")
+    # index names are schema-wide; the new table's indexes adopt these on ATTACH
+    for name in HISTORY_INDEXES:
+        op.execute(f"ALTER INDEX IF EXISTS {name} RENAME TO {name}_legacy")
+    op.rename_table("transactions", LEGACY)
+
+    op.create_table(
+        "transactions",
+        *_columns(),
+        sa.PrimaryKeyConstraint("id", "created_at", name="transactions_pkey"),
+        sa.UniqueConstraint("reference", "created_at", name="uq_transactions_reference_created_at"),
+        postgresql_partition_by="RANGE (created_at)",
+    )
+    _create_history_indexes()
+    op.execute(f"ALTER TABLE transactions ATTACH PARTITION {LEGACY} FOR VALUES FROM (MINVALUE) TO ('{end}')")
+    # the partition bound enforces it now
+    op.execute(f"ALTER TABLE {LEGACY} DROP CONSTRAINT {LEGACY_CHECK}")
+    month = end
+    while month <= add_months(month_start(datetime.utcnow().date()), int(settings.TRANSACTIONS_PARTITION_MONTHS_AHEAD)):
+        op.execute(create_partition_sql("transactions", month))
+        month = add_months(month, 1)
+
+
+def upgrade() -> None:
+    if not has_table("transaction_archives"):
+        op.create_table(
+            "transaction_archives",
+            sa.Column("partition", sa.String(64), primary_key=True),
+            sa.Column("range_start", sa.DateTime(), nullable=False),
+            sa.Column("range_end", sa.DateTime(), nullable=False),
+            sa.Column("path", sa.String(512), nullable=False),
+            sa.Column("row_count", sa.Integer(), nullable=False),
+            sa.Column("archived_at", sa.DateTime(), nullable=False),
+        )
+        op.create_index("ix_transaction_archives_range_end", "transaction_archives", ["range_end"])
+
+    backfill = not has_table("transaction_references")
+    if backfill:
+        op.create_table(
+            "transaction_references",
+            sa.Column("reference", sa.String(128), primary_key=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+        )
+
+    if not is_postgres():
+        if backfill:
+            # references are still unique on transactions at this point
+            op.execute(
+                "INSERT INTO transaction_references (reference, created_at) "
+                "SELECT reference, created_at FROM transactions"
+            )
+        # the copy picks up created_at as a second primary key column
+        with op.batch_alter_table(
+            "transactions",
+            recreate="always",
+            reflect_args=[sa.Column("created_at", sa.DateTime(), primary_key=True, nullable=False)],
+        ) as batch:
+            batch.drop_index("ix_transactions_reference")
+            batch.drop_constraint("uq_transactions_reference", type_="unique")
+            batch.create_unique_constraint("uq_transactions_reference_created_at", ["reference", "created_at"])
+        _rebuild_wallet_history_index()
+        return
+
+    if _partitioned(offline=False):
+        # created by create_all with the partitioned model already
+        op.execute("ALTER TABLE ledger_entries DROP CONSTRAINT IF EXISTS ledger_entries_transaction_id_fkey")
+        return
+    _partition_in_place()
+
+
+def downgrade() -> None:
+    if not is_postgres():
+        with op.batch_alter_table("transactions", recreate="always") as batch:
+            batch.drop_constraint("uq_transactions_reference_created_at", type_="unique")
+            batch.create_unique_constraint("uq_transactions_reference", ["reference"])
+            batch.create_index("ix_transactions_reference", ["reference"], unique=True)
+            batch.create_primary_key("transactions_pkey", ["id"])
+        _rebuild_wallet_history_index()
+        op.drop_table("transaction_references")
+        op.drop_table("transaction_archives")
+        return
+
+    if _partitioned(offline=True):
+        op.rename_table("transactions", "transactions_partitioned")
+        for name in HISTORY_INDEXES:
+            op.execute(f"DROP INDEX IF EXISTS {name}")
+        op.execute(
+            "ALTER TABLE transactions_partitioned DROP CONSTRAINT IF EXISTS uq_transactions_reference_created_at"
+        )
+        op.execute("ALTER TABLE transactions_partitioned RENAME CONSTRAINT transactions_pkey TO transactions_partitioned_pkey")
+        op.create_table(
+            "transactions",
+            *_columns(),
+            sa.PrimaryKeyConstraint("id", name="transactions_pkey"),
+            sa.UniqueConstraint("reference", name="uq_transactions_reference"),
+        )
+        op.execute(f"INSERT INTO transactions ({COLUMNS}) SELECT {COLUMNS} FROM transactions_partitioned")
+        # drops every partition with it, transactions_legacy and its trigger too
+        op.drop_table("transactions_partitioned")
+        op.execute("DROP FUNCTION IF EXISTS transactions_legacy_reference()")
+        op.create_index("ix_transactions_reference", "transactions", ["reference"], unique=True)
+        _create_history_indexes()
+
+    # NOT VALID: entries of archived months point at rows that are gone
+    op.execute(
+        "ALTER TABLE ledger_entries ADD CONSTRAINT ledger_entries_transaction_id_fkey "
+        "FOREIGN KEY (transaction_id) REFERENCES transactions (id) NOT VALID"
+    )
+    op.drop_table("transaction_references")
+    op.drop_table("transaction_archives")
@@ -0,0 +1,13 @@
+import os
+
+# Settings requires these; the tests never reach the services they configure
+for name, value in {
+    "DATABASE_URL": "sqlite:///./test.sqlite",
+    "JWT_SECRET_KEY": "test",
+    "GOOGLE_CLIENT_ID": "test",
+    "GOOGLE_CLIENT_SECRET": "test",
+    "GOOGLE_REDIRECT_URI": "http://localhost/callback",
+    "PAYSTACK_SECRET_KEY": "sk_test",
+    "PAYSTACK_PUBLIC_KEY": "pk_test",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,198 @@
+import asyncio
+import time
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from uuid import uuid4
+
+from app.core.cache import INVALIDATE_CHANNEL, MemoryCacheBackend, RedisCacheBackend, dumps
+
+
+class FakeRedisServer:
+    """The parts of one Redis server the cache uses: strings with expiry and pub/sub."""
+
+    def __init__(self) -> None:
+        self.data: dict[str, tuple[float, str]] = {}
+        self.subscribers: dict[str, list[asyncio.Queue]] = defaultdict(list)
+
+
+class FakePubSub:
+    def __init__(self, server: FakeRedisServer) -> None:
+        self.server = server
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    async def subscribe(self, channel: str) -> None:
+        self.server.subscribers[channel].append(self.queue)
+
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+
+    async def aclose(self) -> None:
+        for queues in self.server.subscribers.values():
+            if self.queue in queues:
+                queues.remove(self.queue)
+
+
+class FakeRedis:
+    """One client connection to a FakeRedisServer, like redis.asyncio.Redis."""
+
+    def __init__(self, server: FakeRedisServer) -> None:
+        self.server = server
+        self.gets = 0
+
+    async def get(self, key: str):
+        self.gets += 1
+        entry = self.server.data.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1].encode()
+
+    async def set(self, key: str, value: str, px: int) -> None:
+        self.server.data[key] = (time.monotonic() + px / 1000, value)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self.server.data.pop(key, None)
+
+    async def publish(self, channel: str, message: str) -> None:
+        for queue in self.server.subscribers[channel]:
+            queue.put_nowait({"type": "message", "channel": channel.encode(), "data": message.encode()})
+
+    def pubsub(self) -> FakePubSub:
+        return FakePubSub(self.server)
+
+    async def aclose(self) -> None:
+        pass
+
+
+def _redis_node(server: FakeRedisServer, local_ttl_seconds: float = 60.0) -> RedisCacheBackend:
+    node = RedisCacheBackend("redis://localhost", local_max_entries=100, local_ttl_seconds=local_ttl_seconds)
+    node.redis = FakeRedis(server)
+    return node
+
+
+async def _settle() -> None:
+    # let the listener tasks deliver what has been published
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_memory_get_set_delete():
+    async def run():
+        cache = MemoryCacheBackend(max_entries=100, ttl_seconds=60)
+        assert await cache.get("k") is None
+        await cache.set("k", {"n": 1}, ttl=60)
+        assert await cache.get("k") == {"n": 1}
+        await cache.delete("k", "missing")
+        assert await cache.get("k") is None
+
+    asyncio.run(run())
+
+
+def test_memory_entries_expire():
+    async def run():
+        cache = MemoryCacheBackend(max_entries=100, ttl_seconds=60)
+        await cache.set("k", 1, ttl=0.01)
+        await asyncio.sleep(0.02)
+        assert await cache.get("k") is None
+        # a zero TTL disables caching
+        await cache.set("k", 1, ttl=0)
+        assert await cache.get("k") is None
+
+    asyncio.run(run())
+
+
+def test_memory_evicts_least_recently_used():
+    async def run():
+        cache = MemoryCacheBackend(max_entries=2, ttl_seconds=60)
+        await cache.set("a", 1, ttl=60)
+        await cache.set("b", 2, ttl=60)
+        await cache.get("a")
+        await cache.set("c", 3, ttl=60)
+        assert await cache.get("b") is None
+        assert await cache.get("a") == 1
+        assert cache.stats()["evictions"] == 1
+
+    asyncio.run(run())
+
+
+def test_memory_publish_subscribe():
+    async def run():
+        cache = MemoryCacheBackend(max_entries=100, ttl_seconds=60)
+        received = []
+
+        async def handler(message):
+            received.append(message)
+
+        await cache.subscribe("events", handler)
+        wallet_id, at = uuid4(), datetime(2025, 1, 2, 3, 4, 5)
+        await cache.publish("events", {"wallet": wallet_id, "at": at, "amount": Decimal("1.50")})
+        await cache.publish("other", {"ignored": True})
+        # delivered as Redis would deliver it: through the JSON encoding
+        assert received == [{"wallet": wallet_id, "at": at, "amount": Decimal("1.50")}]
+
+    asyncio.run(run())
+
+
+def test_redis_get_fills_near_cache():
+    async def run():
+        server = FakeRedisServer()
+        node = _redis_node(server)
+        await node.set("k", {"n": 1}, ttl=60)
+        node.local.clear()
+        assert await node.get("k") == {"n": 1}
+        assert await node.get("k") == {"n": 1}
+        # the second read came from the near-cache
+        assert node.redis.gets == 1
+        await node.close()
+
+    asyncio.run(run())
+
+
+def test_redis_delete_invalidates_other_nodes():
+    async def run():
+        server = FakeRedisServer()
+        a, b = _redis_node(server), _redis_node(server)
+        await a.start()
+        await b.start()
+
+        await a.set("balance", 100, ttl=60)
+        assert await b.get("balance") == 100
+        assert b.local.get("balance") == 100
+
+        await a.delete("balance")
+        await _settle()
+        assert b.local.get("balance") is None
+        assert await b.get("balance") is None
+
+        await a.close()
+        await b.close()
+
+    asyncio.run(run())
+
+
+def test_redis_invalidation_message_format():
+    async def run():
+        server = FakeRedisServer()
+        node = _redis_node(server)
+        await node.start()
+        node.local.set("x", 1)
+        node.local.set("y", 2)
+        # what another node publishes when it deletes keys
+        await FakeRedis(server).publish(INVALIDATE_CHANNEL, dumps(["x"]))
+        await _settle()
+        assert node.local.get("x") is None
+        assert node.local.get("y") == 2
+        await node.close()
+
+    asyncio.run(run())
+
+
+def test_memory_backend_warns_on_fly(monkeypatch, caplog):
+    from app.core import cache
+
+    monkeypatch.setattr(cache.settings, "CACHE_BACKEND", "memory")
+    monkeypatch.setenv("FLY_APP_NAME", "wallet")
+    cache._check_backend()
+    assert "CACHE_BACKEND=memory on Fly" in caplog.text